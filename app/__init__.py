@@ -4,12 +4,15 @@ from flask import Flask
 from .config import load_config
 from . import extensions
 from .middleware.error_handlers import register_error_handlers
+from .db.request_scope import init_request_scope
+from .db.loading import init_strict_loading
 
 # Import blueprints
 from .blueprints.face.routes import face_bp
 from .blueprints.absensi.routes import absensi_bp
 from .blueprints.location.routes import location_bp
 from .blueprints.notifications.routes import notif_bp
+from .blueprints.storage.routes import storage_bp
 
 def create_app():
     app = Flask(__name__)
@@ -18,11 +21,16 @@ def create_app():
     # Initialize extensions (Celery binding, Supabase, Firebase, etc.)
     extensions.init_app(app)
 
+    # Session DB per request / per task Celery (ditutup di teardown_appcontext)
+    init_request_scope(app)
+    init_strict_loading(app)
+
     # Register blueprints DENGAN url_prefix yang jelas
     app.register_blueprint(face_bp, url_prefix="/api/face")
     app.register_blueprint(absensi_bp, url_prefix="/api/absensi")
     app.register_blueprint(location_bp, url_prefix="/api/location")
     app.register_blueprint(notif_bp, url_prefix="/api/notifications")
+    app.register_blueprint(storage_bp, url_prefix="/api/storage")
 
     # Error handlers
     register_error_handlers(app)
@@ -30,11 +38,22 @@ def create_app():
     @app.get("/health")
     def health():
         from .extensions import get_supabase
+        from .services.storage.supabase_storage import storage_health
+        from .db.replicas import replicas_snapshot
         return {
             "ok": True,
             "engine": app.config.get("MODEL_NAME"),
             "supabase": bool(get_supabase()),
             "bucket": app.config.get("SUPABASE_BUCKET"),
+            "storage_backend": app.config.get("STORAGE_BACKEND"),
+            "storage_breaker": storage_health(),
+            "db_replicas": replicas_snapshot(),
         }
 
+    @app.get("/metrics")
+    def metrics():
+        from .db.pool_metrics import pool_metrics_snapshot
+        from .db.request_scope import request_stats_snapshot
+        return {"db_pool": pool_metrics_snapshot(), "db_scope": request_stats_snapshot()}
+
     return app
@@ -2,20 +2,44 @@
 
 from __future__ import annotations
 
-from datetime import datetime, date as _date, timezone
-from flask import Blueprint, request, current_app
+import uuid
+import posixpath
+from datetime import datetime, date as _date, timezone, timedelta
+from flask import Blueprint, Response, request, current_app, stream_with_context
+from sqlalchemy import select
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import joinedload
 
 from ...utils.responses import ok, error
 from ...utils.geo import haversine_m
 from ...utils.timez import now_local, today_local_date
+from ...utils.idempotency import idempotent
+from ...utils.auth_utils import roles_required
 from ...services.face_service import verify_user
 from ...services.notification_service import send_notification
-from ...db import get_session
+from ...services.today_state import get_today_state, refresh_today_state
+from ...services.roster import get_roster
+from ...services.attendance_summary import add_to_summary, get_summary
+from ...services.presence import dashboard as presence_dashboard, record_transition
+from ...services.attendance_export import parquet_available, stream_csv, stream_parquet
+from ...services.task_results import remember_task, task_owner, wait_for_task, stream_task
+from ...services.storage.supabase_storage import (
+    build_catatan_path,
+    signed_upload_url,
+    stat_object,
+    delete_objects,
+)
+from ...services.storage.resilience import StorageUnavailable
+from ...db.request_scope import (
+    request_session,
+    get_user,
+    get_location,
+    get_absensi_today,
+)
+from ...db.replicas import mark_user_write
+from ...db.loading import lean
 from ...db.models import (
     Location,
-    Absensi,
     AbsensiStatus,
     AgendaKerja,
     AbsensiReportRecipient,
@@ -24,9 +48,9 @@ from ...db.models import (
     Role,
     User,
     Catatan,
-    ShiftKerja,
-    PolaKerja,
     Istirahat,
+    LampiranUpload,
+    UploadStatus,
 )
 
 # >>> Import Celery tasks (ABSOLUTE import, stabil)
@@ -34,6 +58,8 @@ from app.blueprints.absensi.tasks import (
     process_checkin_task_v2,
     process_checkout_task_v2,
 )
+from app.tasks.roster_tasks import roster_refresh_task
+from app.tasks.summary_tasks import rebuild_monthly_summary_task
 
 absensi_bp = Blueprint("absensi", __name__)
 
@@ -150,16 +176,32 @@ def _link_agendas_to_absensi(session, user_id: str, absensi_id: str, agenda_ids:
 
 def _agendas_payload_for_absensi(session, absensi_id: str, id_only: bool = False) -> list:
     """Ambil semua agenda_kerja yang sudah tertaut ke absensi tertentu."""
+    if id_only:
+        return list(
+            session.execute(
+                select(AgendaKerja.id_agenda_kerja)
+                .where(AgendaKerja.id_absensi == absensi_id)
+                .order_by(AgendaKerja.created_at.asc())
+            ).scalars()
+        )
+
     rows = (
         session.query(AgendaKerja)
+        .options(
+            *lean(
+                AgendaKerja.id_agenda_kerja,
+                AgendaKerja.id_agenda,
+                AgendaKerja.deskripsi_kerja,
+                AgendaKerja.start_date,
+                AgendaKerja.end_date,
+                AgendaKerja.status,
+            )
+        )
         .filter(AgendaKerja.id_absensi == absensi_id)
         .order_by(AgendaKerja.created_at.asc())
         .all()
     )
 
-    if id_only:
-        return [r.id_agenda_kerja for r in rows]
-
     out: list[dict] = []
     for r in rows:
         out.append(
@@ -178,10 +220,12 @@ def _agendas_payload_for_absensi(session, absensi_id: str, id_only: bool = False
 # ---------- routes absensi (checkin/checkout/status) ----------
 
 @absensi_bp.post("/checkin")
+@idempotent("absensi.checkin")
 def checkin():
     """
     Verifikasi cepat + enqueue Celery task, balas 202.
     Client dapat mem-poll /api/absensi/status untuk progres hasil.
+    Check-in ganda pada hari yang sama menghasilkan task berstatus "already_checked_in".
     """
     user_id = (request.form.get("user_id") or "").strip()
     loc_id = (request.form.get("location_id") or "").strip()
@@ -202,9 +246,9 @@ def checkin():
     if f is None:
         return error("field 'image' wajib ada", 400)
 
-    with get_session() as s:
+    with request_session():
         # Validasi lokasi & geofence (ringan)
-        loc = s.get(Location, loc_id) if loc_id else None
+        loc = get_location(loc_id) if loc_id else None
         if loc_id and loc is None:
             return error("Lokasi tidak ditemukan", 404)
 
@@ -221,18 +265,14 @@ def checkin():
             v = verify_user(user_id, f, metric=metric, threshold=threshold)
             if not v.get("match", False):
                 return error("Verifikasi wajah gagal. Tidak dapat check-in.", 400)
+        except StorageUnavailable as e:
+            return error(f"Layanan verifikasi wajah sedang tidak tersedia: {str(e)}", 503)
         except Exception as e:
             return error(f"Gagal melakukan verifikasi wajah: {str(e)}", 500)
 
-        # Precheck duplikat agar balasan cepat bila sudah check-in
+        # Duplikat tidak diprecheck di sini: worker mengandalkan unique key (id_user, tanggal)
+        # dan mengembalikan status "already_checked_in" pada hasil task.
         today = today_local_date()
-        already = (
-            s.query(Absensi)
-            .filter(Absensi.id_user == user_id, Absensi.tanggal == today)
-            .one_or_none()
-        )
-        if already:
-            return error("Check-in duplikat untuk tanggal ini (sudah check-in).", 409)
 
     # Susun payload untuk background task
     payload = {
@@ -251,11 +291,15 @@ def checkin():
     }
 
     # Enqueue Celery task (pakai v2)
-    async_res = process_checkin_task_v2.delay(payload)
+    # Pemilik task dicatat sebelum enqueue: tanpa catatan ini hasilnya tidak bisa diambil klien
+    task_id = str(uuid.uuid4())
+    if not remember_task(task_id, user_id):
+        return error("Layanan antrian sementara tidak tersedia, coba lagi", 503)
+    process_checkin_task_v2.apply_async(args=(payload,), task_id=task_id)
     return (
         ok(
             accepted=True,
-            task_id=async_res.id,
+            task_id=task_id,
             message="Check-in diterima, diproses di background",
             distanceMeters=(int(dist) if dist is not None else None),
             **v,  # propagasi info verifikasi wajah (mis. score/distance)
@@ -265,6 +309,7 @@ def checkin():
 
 
 @absensi_bp.post("/checkout")
+@idempotent("absensi.checkout")
 def checkout():
     """
     Verifikasi cepat + enqueue Celery task, balas 202.
@@ -289,18 +334,14 @@ def checkout():
     if f is None:
         return error("field 'image' wajib ada", 400)
 
-    with get_session() as s:
+    with request_session():
         today = today_local_date()
-        rec = (
-            s.query(Absensi)
-            .filter(Absensi.id_user == user_id, Absensi.tanggal == today)
-            .one_or_none()
-        )
+        rec = get_absensi_today(user_id, today)
 
         if rec is None:
             return error("Belum ada check-in untuk hari ini.", 404)
 
-        loc = s.get(Location, loc_id) if loc_id else None
+        loc = get_location(loc_id) if loc_id else None
         if loc_id and loc is None:
             return error("Lokasi tidak ditemukan", 404)
 
@@ -316,6 +357,8 @@ def checkout():
             v = verify_user(user_id, f, metric=metric, threshold=threshold)
             if not v.get("match", False):
                 return error("Verifikasi wajah gagal. Tidak dapat check-out.", 400)
+        except StorageUnavailable as e:
+            return error(f"Layanan verifikasi wajah sedang tidak tersedia: {str(e)}", 503)
         except Exception as e:
             return error(f"Gagal melakukan verifikasi wajah: {str(e)}", 500)
 
@@ -338,11 +381,15 @@ def checkout():
         "catatan_entries": catatan_entries  # worker akan upsert urutannya
     }
 
-    async_res = process_checkout_task_v2.delay(payload)
+    # Pemilik task dicatat sebelum enqueue: tanpa catatan ini hasilnya tidak bisa diambil klien
+    task_id = str(uuid.uuid4())
+    if not remember_task(task_id, user_id):
+        return error("Layanan antrian sementara tidak tersedia, coba lagi", 503)
+    process_checkout_task_v2.apply_async(args=(payload,), task_id=task_id)
     return (
         ok(
             accepted=True,
-            task_id=async_res.id,
+            task_id=task_id,
             message="Check-out diterima, diproses di background",
             distanceMeters=(int(dist) if dist is not None else None),
             **v,
@@ -357,40 +404,199 @@ def absensi_status():
     if not user_id:
         return error("user_id wajib ada", 400)
 
-    with get_session() as s:
+    with request_session(readonly=True, user_id=user_id) as s:
         today = today_local_date()
-        rec = (
-            s.query(Absensi)
-            .filter(Absensi.id_user == user_id, Absensi.tanggal == today)
-            .one_or_none()
+        state = get_today_state(s, user_id, today)
+        return ok(
+            mode=state["mode"],
+            today=str(today),
+            jam_masuk=state["jam_masuk"],
+            jam_pulang=state["jam_pulang"],
+            linked_agenda_ids=state["linked_agenda_ids"],
         )
 
-        if rec is None:
-            return ok(mode="checkin", today=str(today), jam_masuk=None, jam_pulang=None, linked_agenda_ids=[])
 
-        linked_ids = _agendas_payload_for_absensi(s, rec.id_absensi, id_only=True)
+# --- HASIL TASK CHECK-IN / CHECK-OUT ---
 
-        if rec.jam_pulang is None:
-            return ok(
-                mode="checkout",
-                today=str(today),
-                jam_masuk=rec.jam_masuk.isoformat() if rec.jam_masuk else None,
-                jam_pulang=None,
-                linked_agenda_ids=linked_ids,
-            )
+def _owned_task_or_error(task_id: str):
+    user_id = (request.args.get("user_id") or "").strip()
+    if not user_id:
+        return error("user_id wajib ada", 400)
+    try:
+        owner = task_owner(task_id)
+    except Exception:
+        return error("Status task sementara tidak tersedia", 503)
+    if owner is None or owner != user_id:
+        return error("Task tidak ditemukan atau sudah kedaluwarsa", 404)
+    return None
 
-        return ok(
-            mode="done",
-            today=str(today),
-            jam_masuk=rec.jam_masuk.isoformat() if rec.jam_masuk else None,
-            jam_pulang=rec.jam_pulang.isoformat() if rec.jam_pulang else None,
-            linked_agenda_ids=linked_ids,
-        )
+
+@absensi_bp.get("/task/<task_id>")
+def task_result(task_id: str):
+    """
+    Status task dari result backend. `wait` (detik, maks TASK_RESULT_MAX_WAIT) = long-poll:
+    respons dikirim begitu task selesai atau saat waktu tunggu habis (ready=false).
+    """
+    err = _owned_task_or_error(task_id)
+    if err is not None:
+        return err
+
+    max_wait = float(current_app.config.get("TASK_RESULT_MAX_WAIT", 5))
+    wait = min(max(request.args.get("wait", default=0.0, type=float) or 0.0, 0.0), max_wait)
+    return ok(**wait_for_task(task_id, wait))
+
+
+@absensi_bp.get("/task/<task_id>/stream")
+def task_result_stream(task_id: str):
+    """Server-Sent Events: satu event "result" saat task selesai (opsional, TASK_RESULT_SSE_ENABLED)."""
+    if not current_app.config.get("TASK_RESULT_SSE_ENABLED", False):
+        return error("SSE tidak diaktifkan", 404)
+    err = _owned_task_or_error(task_id)
+    if err is not None:
+        return err
+
+    cfg = current_app.config
+    gen = stream_task(
+        task_id,
+        timeout=float(cfg.get("TASK_RESULT_SSE_TIMEOUT", 60)),
+        heartbeat=float(cfg.get("TASK_RESULT_SSE_HEARTBEAT", 15)),
+    )
+    return Response(
+        stream_with_context(gen),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# --- EXPORT ---
+
+# Role yang boleh memakai endpoint admin (export, rebuild rekap, refresh roster)
+_ADMIN_ROLES = (Role.HR, Role.DIREKTUR, Role.SUPERADMIN)
+
+@absensi_bp.get("/export")
+@roles_required(*_ADMIN_ROLES)
+def export_absensi():
+    """
+    Export absensi (termasuk bulan yang sudah diarsip) untuk rentang ?start=&end= (YYYY-MM-DD).
+    format=csv (default) atau parquet (butuh pyarrow). Respons di-stream per batch.
+    """
+    try:
+        start = _date.fromisoformat((request.args.get("start") or "").strip())
+        end = _date.fromisoformat((request.args.get("end") or "").strip())
+    except ValueError:
+        return error("start dan end wajib berformat YYYY-MM-DD", 400)
+    if end < start:
+        return error("end tidak boleh sebelum start", 400)
+    max_days = int(current_app.config.get("EXPORT_MAX_DAYS", 366))
+    if (end - start).days + 1 > max_days:
+        return error(f"Rentang export maksimal {max_days} hari", 400)
+
+    fmt = (request.args.get("format") or "csv").strip().lower()
+    batch_size = int(current_app.config.get("EXPORT_BATCH_SIZE", 1000))
+    filename = f"absensi_{start.isoformat()}_{end.isoformat()}"
+
+    if fmt == "csv":
+        body, mimetype, filename = stream_csv(start, end, batch_size), "text/csv", filename + ".csv"
+    elif fmt == "parquet":
+        if not parquet_available():
+            return error("Format parquet membutuhkan pyarrow di server", 501)
+        body, mimetype, filename = stream_parquet(start, end, batch_size), "application/vnd.apache.parquet", filename + ".parquet"
+    else:
+        return error("format harus csv atau parquet", 400)
+
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
+# --- DASHBOARD KEHADIRAN ---
+
+@absensi_bp.get("/presence")
+def presence():
+    """Counter in/late/on_break/out per kantor & departemen (?tanggal=YYYY-MM-DD&location_id=)."""
+    raw_day = (request.args.get("tanggal") or "").strip()
+    try:
+        day = _date.fromisoformat(raw_day) if raw_day else today_local_date()
+    except ValueError:
+        return error("tanggal harus berformat YYYY-MM-DD", 400)
+    location_id = (request.args.get("location_id") or "").strip() or None
+
+    with request_session(readonly=True) as s:
+        return ok(**presence_dashboard(s, day, location_id))
+
+
+# --- REKAP BULANAN ---
+
+def _tahun_bulan(src) -> tuple[int, int]:
+    today = today_local_date()
+    tahun = int(src.get("tahun") or today.year)
+    bulan = int(src.get("bulan") or today.month)
+    if not 1 <= bulan <= 12 or not 2000 <= tahun <= 2100:
+        raise ValueError
+    return tahun, bulan
+
+
+@absensi_bp.get("/rekap")
+def rekap_bulanan():
+    """Rekap bulanan satu karyawan (?user_id=&tahun=&bulan=, default bulan berjalan)."""
+    user_id = (request.args.get("user_id") or "").strip()
+    if not user_id:
+        return error("user_id wajib ada", 400)
+    try:
+        tahun, bulan = _tahun_bulan(request.args)
+    except ValueError:
+        return error("tahun/bulan tidak valid", 400)
+
+    with request_session(readonly=True, user_id=user_id) as s:
+        return ok(rekap=get_summary(s, user_id, tahun, bulan))
+
+
+@absensi_bp.post("/rekap/rebuild")
+@roles_required(*_ADMIN_ROLES)
+def rekap_rebuild():
+    """Hitung ulang rekap satu bulan di background: {"tahun": 2025, "bulan": 1}."""
+    payload = request.get_json(silent=True) or {}
+    try:
+        tahun, bulan = _tahun_bulan(payload)
+    except (TypeError, ValueError):
+        return error("tahun/bulan tidak valid", 400)
+
+    async_res = rebuild_monthly_summary_task.delay(tahun, bulan)
+    return ok(accepted=True, task_id=async_res.id, tahun=tahun, bulan=bulan), 202
+
+
+# --- ROSTER ---
+
+@absensi_bp.post("/roster/refresh")
+@roles_required(*_ADMIN_ROLES)
+def roster_refresh():
+    """
+    Dipanggil setelah shift_kerja berubah: {"user_ids": [...], "start": "YYYY-MM-DD", "end": "YYYY-MM-DD"}.
+    Tanpa user_ids = materialisasi ulang penuh. Diproses di background.
+    """
+    payload = request.get_json(silent=True) or {}
+    user_ids = payload.get("user_ids") or []
+    if not isinstance(user_ids, list) or not all(isinstance(u, str) and u.strip() for u in user_ids):
+        return error("user_ids harus berupa list id_user", 400)
+    try:
+        start = _date.fromisoformat(payload["start"]).isoformat() if payload.get("start") else None
+        end = _date.fromisoformat(payload["end"]).isoformat() if payload.get("end") else None
+    except ValueError:
+        return error("start/end harus berformat YYYY-MM-DD", 400)
+
+    async_res = roster_refresh_task.delay([u.strip() for u in user_ids] or None, start, end)
+    return ok(accepted=True, task_id=async_res.id), 202
 
 
 # --- FITUR ISTIRAHAT ---
 
 @absensi_bp.post("/istirahat/start")
+@idempotent("absensi.istirahat_start")
 def start_istirahat():
     user_id = (request.form.get("user_id") or "").strip()
     lat = request.form.get("start_istirahat_latitude", type=float)
@@ -401,14 +607,10 @@ def start_istirahat():
     if lat is None or lng is None:
         return error("Koordinat latitude dan longitude wajib ada", 400)
 
-    with get_session() as s:
+    with request_session() as s:
         try:
             today = today_local_date()
-            absensi = (
-                s.query(Absensi)
-                .filter(Absensi.id_user == user_id, Absensi.tanggal == today)
-                .one_or_none()
-            )
+            absensi = get_absensi_today(user_id, today)
 
             if absensi is None or absensi.jam_masuk is None:
                 return error("Anda harus check-in terlebih dahulu sebelum memulai istirahat", 400)
@@ -426,22 +628,12 @@ def start_istirahat():
             now_local_dt = now_local()
             now_dt = now_local_dt.replace(tzinfo=None)
 
-            jadwal_kerja = (
-                s.query(ShiftKerja)
-                .join(PolaKerja)
-                .filter(
-                    ShiftKerja.id_user == user_id,
-                    ShiftKerja.tanggal_mulai <= today,
-                    ShiftKerja.tanggal_selesai >= today,
-                )
-                .first()
-            )
+            jadwal_kerja = get_roster(s, user_id, today)
 
-            if jadwal_kerja and jadwal_kerja.polaKerja:
-                pola = jadwal_kerja.polaKerja
-                if pola.jam_istirahat_mulai and pola.jam_istirahat_selesai:
-                    jam_mulai_seharusnya = pola.jam_istirahat_mulai.time()
-                    jam_selesai_seharusnya = pola.jam_istirahat_selesai.time()
+            if jadwal_kerja:
+                if jadwal_kerja["jam_istirahat_mulai"] and jadwal_kerja["jam_istirahat_selesai"]:
+                    jam_mulai_seharusnya = jadwal_kerja["jam_istirahat_mulai"]
+                    jam_selesai_seharusnya = jadwal_kerja["jam_istirahat_selesai"]
                     jam_sekarang = now_local_dt.time()
 
                     if not (jam_mulai_seharusnya <= jam_sekarang <= jam_selesai_seharusnya):
@@ -459,8 +651,12 @@ def start_istirahat():
                 start_istirahat_longitude=lng,
             )
             s.add(new_break)
+            lokasi_id = absensi.id_lokasi_datang
             s.commit()
+            mark_user_write(user_id)
             s.refresh(new_break)
+            refresh_today_state(s, user_id, today)
+            record_transition(today, user_id, lokasi_id, {"in": -1, "on_break": 1})
 
             return ok(
                 message="Sesi istirahat dimulai",
@@ -474,6 +670,7 @@ def start_istirahat():
 
 
 @absensi_bp.post("/istirahat/end")
+@idempotent("absensi.istirahat_end")
 def end_istirahat():
     user_id = (request.form.get("user_id") or "").strip()
     lat = request.form.get("end_istirahat_latitude", type=float)
@@ -484,14 +681,10 @@ def end_istirahat():
     if lat is None or lng is None:
         return error("Koordinat latitude dan longitude wajib ada", 400)
 
-    with get_session() as s:
+    with request_session() as s:
         try:
             today = today_local_date()
-            absensi = (
-                s.query(Absensi)
-                .filter(Absensi.id_user == user_id, Absensi.tanggal == today)
-                .one_or_none()
-            )
+            absensi = get_absensi_today(user_id, today)
 
             if absensi is None:
                 return error("Absensi hari ini tidak ditemukan", 404)
@@ -509,8 +702,21 @@ def end_istirahat():
             current_break.end_istirahat = now_dt
             current_break.end_istirahat_latitude = lat
             current_break.end_istirahat_longitude = lng
+            add_to_summary(
+                s,
+                user_id,
+                current_break.tanggal_istirahat,
+                total_istirahat_detik=max(0, int((now_dt - current_break.start_istirahat).total_seconds())),
+            )
+
+            # Istirahat yang ditutup setelah checkout tidak mengubah state ("out")
+            lokasi_id, masih_hadir = absensi.id_lokasi_datang, absensi.jam_pulang is None
 
             s.commit()
+            mark_user_write(user_id)
+            refresh_today_state(s, user_id, today)
+            if masih_hadir:
+                record_transition(today, user_id, lokasi_id, {"on_break": -1, "in": 1})
 
             return ok(
                 message="Sesi istirahat selesai",
@@ -529,53 +735,135 @@ def istirahat_status():
     if not user_id:
         return error("user_id wajib ada", 400)
 
-    with get_session() as s:
-        today = today_local_date()
+    with request_session(readonly=True, user_id=user_id) as s:
+        state = get_today_state(s, user_id, today_local_date())
+        return ok(
+            status="active" if state["active_break"] else "inactive",
+            active_break=state["active_break"],
+            history=state["breaks"],
+            total_duration_seconds=state["total_break_seconds"],
+        )
 
-        def serialize_istirahat(b: Istirahat):
-            data = {
-                "id_istirahat": b.id_istirahat,
-                "tanggal_istirahat": b.tanggal_istirahat.isoformat(),
-                "start_istirahat": b.start_istirahat.isoformat(),
-                "start_istirahat_latitude": float(b.start_istirahat_latitude) if b.start_istirahat_latitude is not None else None,
-                "start_istirahat_longitude": float(b.start_istirahat_longitude) if b.start_istirahat_longitude is not None else None,
-                "end_istirahat": None,
-                "end_istirahat_latitude": None,
-                "end_istirahat_longitude": None,
-                "duration_seconds": None,
-            }
-            if b.end_istirahat:
-                data["end_istirahat"] = b.end_istirahat.isoformat()
-                data["end_istirahat_latitude"] = float(b.end_istirahat_latitude) if b.end_istirahat_latitude is not None else None
-                data["end_istirahat_longitude"] = float(b.end_istirahat_longitude) if b.end_istirahat_longitude is not None else None
-                data["duration_seconds"] = int((b.end_istirahat - b.start_istirahat).total_seconds())
-            return data
-
-        all_breaks_today = (
-            s.query(Istirahat)
-            .join(Absensi)
-            .filter(Absensi.id_user == user_id, Istirahat.tanggal_istirahat == today)
-            .order_by(Istirahat.start_istirahat.asc())
-            .all()
+
+
+# --- LAMPIRAN CATATAN (upload langsung ke storage) ---
+
+@absensi_bp.post("/catatan/lampiran/upload-url")
+def lampiran_upload_url():
+    """
+    Terbitkan signed upload URL di bawah lampiran-catatan/<user_id>/.
+    Klien melakukan PUT file langsung ke storage, lalu memanggil /catatan/lampiran/finalize.
+    """
+    payload = request.get_json(silent=True) or request.form
+    user_id = (payload.get("user_id") or "").strip()
+    filename = (payload.get("filename") or "").strip()
+    content_type = (payload.get("content_type") or "").strip().lower()
+
+    if not user_id:
+        return error("user_id wajib ada", 400)
+    if not filename:
+        return error("filename wajib ada", 400)
+
+    allowed = current_app.config.get("CATATAN_LAMPIRAN_ALLOWED_TYPES") or ()
+    if allowed and content_type not in allowed:
+        return error(f"content_type '{content_type}' tidak diizinkan", 415)
+
+    max_bytes = int(current_app.config.get("CATATAN_LAMPIRAN_MAX_BYTES", 10 * 1024 * 1024))
+    declared = payload.get("size")
+    try:
+        if declared is not None and int(declared) > max_bytes:
+            return error(f"Ukuran file melebihi batas {max_bytes} bytes", 413)
+    except (TypeError, ValueError):
+        return error("size harus berupa angka", 400)
+
+    expires_in = int(current_app.config.get("CATATAN_UPLOAD_URL_EXPIRES", 600))
+    path = build_catatan_path(user_id, filename)
+
+    with request_session() as s:
+        if get_user(user_id) is None:
+            return error(f"User dengan id_user '{user_id}' tidak ditemukan.", 404)
+        try:
+            upload_url = signed_upload_url(path, expires_in)
+        except Exception as e:
+            current_app.logger.error(f"Gagal membuat signed upload URL: {e}", exc_info=True)
+            return error("Gagal membuat URL upload", 502)
+
+        rec = LampiranUpload(
+            id_user=user_id,
+            path=path,
+            content_type=content_type or None,
+            status=UploadStatus.pending,
+            expires_at=now_local().replace(tzinfo=None) + timedelta(seconds=expires_in),
         )
+        s.add(rec)
+        s.commit()
 
-        active_break = None
-        history = []
-        total_duration = 0
+        return ok(
+            id_lampiran_upload=rec.id_lampiran_upload,
+            path=path,
+            upload_url=upload_url,
+            method="PUT",
+            headers={"content-type": content_type} if content_type else {},
+            expires_in=expires_in,
+            max_bytes=max_bytes,
+        )
 
-        for b in all_breaks_today:
-            serialized = serialize_istirahat(b)
-            history.append(serialized)
-            if b.end_istirahat is None:
-                active_break = serialized
-            else:
-                total_duration += serialized["duration_seconds"]
 
-        status = "active" if active_break else "inactive"
+@absensi_bp.post("/catatan/lampiran/finalize")
+def lampiran_finalize():
+    """
+    Pastikan object hasil upload langsung benar-benar ada, lalu catat ukuran & content type.
+    Path yang dikembalikan dipakai sebagai 'lampiran_url' saat check-in/check-out.
+    """
+    payload = request.get_json(silent=True) or request.form
+    user_id = (payload.get("user_id") or "").strip()
+    path = (payload.get("path") or "").strip()
+
+    if not user_id or not path:
+        return error("user_id dan path wajib ada", 400)
+    prefix = f"lampiran-catatan/{user_id}/"
+    if not posixpath.normpath(path).startswith(prefix):
+        return error("Path lampiran bukan milik user ini", 403)
+
+    with request_session() as s:
+        rec = (
+            s.query(LampiranUpload)
+            .filter(LampiranUpload.path == path, LampiranUpload.id_user == user_id)
+            .one_or_none()
+        )
+        if rec is None:
+            return error("Upload lampiran tidak ditemukan", 404)
+
+        if rec.status != UploadStatus.finalized:
+            # Upload boleh selesai tepat sebelum URL kedaluwarsa; beri jeda untuk panggilan finalize
+            grace = int(current_app.config.get("CATATAN_FINALIZE_GRACE", 120))
+            if now_local().replace(tzinfo=None) > rec.expires_at + timedelta(seconds=grace):
+                delete_objects([path])
+                s.delete(rec)
+                s.commit()
+                return error("Upload lampiran sudah kedaluwarsa. Minta URL upload baru.", 410)
+
+            info = stat_object(path)
+            if info is None:
+                return error("File belum ada di storage. Upload terlebih dahulu.", 404)
+
+            max_bytes = int(current_app.config.get("CATATAN_LAMPIRAN_MAX_BYTES", 10 * 1024 * 1024))
+            if int(info.get("size") or 0) > max_bytes:
+                delete_objects([path])
+                s.delete(rec)
+                s.commit()
+                return error(f"Ukuran file melebihi batas {max_bytes} bytes", 413)
+
+            rec.size_bytes = int(info.get("size") or 0)
+            rec.content_type = info.get("content_type") or rec.content_type
+            rec.status = UploadStatus.finalized
+            rec.finalized_at = now_local().replace(tzinfo=None)
+            s.commit()
 
         return ok(
-            status=status,
-            active_break=active_break,
-            history=history,
-            total_duration_seconds=total_duration,
+            id_lampiran_upload=rec.id_lampiran_upload,
+            path=rec.path,
+            lampiran_url=rec.path,
+            size=rec.size_bytes,
+            content_type=rec.content_type,
         )
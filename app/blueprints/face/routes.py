@@ -8,15 +8,18 @@ from sqlalchemy.exc import IntegrityError
 
 from ...utils.responses import ok, error
 from ...services.face_service import verify_user, enroll_user_task
-from ...services.storage.supabase_storage import list_objects, signed_url
-from ...db import get_session
-from ...db.models import Device, User
+from ...services.storage.supabase_storage import list_objects, signed_urls
+from ...services.storage.resilience import StorageUnavailable
+from ...db.request_scope import request_session, get_user
+from ...db.models import Device
 from ...utils.timez import now_local
+from ...utils.idempotency import idempotent
 
 # Blueprint TANPA prefix di sini; prefix ditaruh saat register_blueprint di create_app()
 face_bp = Blueprint("face", __name__)
 
 @face_bp.post("/enroll")
+@idempotent("face.enroll")
 def enroll():
     """Daftarkan wajah pengguna (enqueue Celery) + catat/perbarui perangkat."""
     current_app.logger.info("Menerima permintaan baru di POST /api/face/enroll")
@@ -50,16 +53,16 @@ def enroll():
         return error("Semua file 'images' kosong/invalid", 400)
 
     try:
-        with get_session() as s:
+        with request_session() as s:
             # Validasi user
-            user = s.execute(select(User).where(User.id_user == user_id)).scalar_one_or_none()
+            user = get_user(user_id)
             if user is None:
                 return error(f"User dengan id_user '{user_id}' tidak ditemukan.", 404)
 
             user_name = user.nama_pengguna or "User"
 
             # Enqueue task Celery (non-blocking)
-            enroll_user_task.delay(user_id, user_name, images_data)
+            async_res = enroll_user_task.delay(user_id, user_name, images_data)
 
             # Catat / update device
             now_naive_utc = now_local().replace(tzinfo=None)
@@ -102,7 +105,12 @@ def enroll():
                 current_app.logger.warning(f"Gagal menyimpan device untuk user {user_id}: {e}")
 
         # Respon cepat; proses heavy dikerjakan Celery
-        return ok(message="Registrasi wajah berhasil di proses sistem", user_id=user_id, images=len(images_data))
+        return ok(
+            message="Registrasi wajah berhasil di proses sistem",
+            user_id=user_id,
+            images=len(images_data),
+            task_id=async_res.id,
+        )
 
     except Exception as e:
         current_app.logger.error(f"Kesalahan tidak terduga pada endpoint enroll: {e}", exc_info=True)
@@ -126,6 +134,8 @@ def verify():
         return ok(**data)
     except FileNotFoundError as e:
         return error(str(e), 404)
+    except StorageUnavailable as e:
+        return error(str(e), 503)
     except Exception as e:
         current_app.logger.error(f"Kesalahan di verify: {e}", exc_info=True)
         return error(str(e), 500)
@@ -139,14 +149,21 @@ def get_face_data(user_id: str):
     prefix = f"face_detection/{user_id}"
     try:
         items = list_objects(prefix)
-        files = []
+        paths = []
         for it in items:
             name = it.get("name") or it.get("path") or ""
-            path = f"{prefix}/{name}" if not name.startswith(prefix) else name
-            url = signed_url(path)
-            files.append({"name": name.split("/")[-1], "path": path, "signed_url": url})
+            paths.append(f"{prefix}/{name}" if not name.startswith(prefix) else name)
+
+        # Satu panggilan bulk (atau nol bila semua masih ada di cache)
+        urls = signed_urls(paths)
+        files = [
+            {"name": path.split("/")[-1], "path": path, "signed_url": urls.get(path)}
+            for path in paths
+        ]
 
         return ok(user_id=user_id, prefix=prefix, count=len(files), items=files)
+    except StorageUnavailable as e:
+        return error(str(e), 503)
     except Exception as e:
         current_app.logger.error(f"Kesalahan tidak terduga pada endpoint get_face_data: {e}", exc_info=True)
         return error(str(e), 500)
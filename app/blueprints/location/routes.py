@@ -4,8 +4,9 @@ from __future__ import annotations
 from flask import Blueprint, request, current_app
 from ...utils.responses import ok, error
 from ...utils.geo import haversine_m
-from ...db import get_session
-from ...db.models import Location, User
+from ...db.request_scope import request_session, get_user, get_location
+from ...db.models import Location
+from ...db.loading import LOCATION_GEO
 
 # Penting: JANGAN menaruh prefix "/api/location" di sini.
 # Prefix akan dipasang saat register_blueprint() di create_app():
@@ -32,8 +33,8 @@ def list_locations():
     page = 1 if not page or page < 1 else page
     page_size = 20 if not page_size or page_size < 1 else min(page_size, 100)
 
-    with get_session() as s:
-        qry = s.query(Location).filter(Location.deleted_at.is_(None))
+    with request_session(readonly=True) as s:
+        qry = s.query(Location).options(*LOCATION_GEO).filter(Location.deleted_at.is_(None))
         if q:
             like = f"%{q}%"
             # ILIKE untuk PostgreSQL; untuk MySQL bisa diakali dengan lower()
@@ -49,9 +50,9 @@ def list_locations():
 
 
 @location_bp.get("/<loc_id>")
-def get_location(loc_id: str):
-    with get_session() as s:
-        loc = s.get(Location, loc_id)
+def location_detail(loc_id: str):
+    with request_session(readonly=True):
+        loc = get_location(loc_id)
         if loc is None or loc.deleted_at is not None:
             return error("Lokasi tidak ditemukan", 404)
         return ok(**_serialize(loc))
@@ -68,8 +69,8 @@ def nearest_location():
     if lat is None or lng is None:
         return error("lat & lng wajib ada", 400)
 
-    with get_session() as s:
-        locs = s.query(Location).filter(Location.deleted_at.is_(None)).all()
+    with request_session(readonly=True) as s:
+        locs = s.query(Location).options(*LOCATION_GEO).filter(Location.deleted_at.is_(None)).all()
         pairs = []
         for l in locs:
             d = haversine_m(lng, lat, float(l.longitude), float(l.latitude))
@@ -90,11 +91,11 @@ def my_location():
     user_id = (request.args.get("user_id") or "").strip()
     if not user_id:
         return error("user_id wajib ada", 400)
-    with get_session() as s:
-        u = s.get(User, user_id)
+    with request_session(readonly=True):
+        u = get_user(user_id)
         if u is None or not u.id_location:
             return ok(item=None)
-        loc = s.get(Location, u.id_location)
+        loc = get_location(u.id_location)
         if loc is None or loc.deleted_at is not None:
             return ok(item=None)
         return ok(item=_serialize(loc))
@@ -2,14 +2,21 @@
 
 from __future__ import annotations
 
+import base64
+import binascii
+from datetime import datetime
+
 from flask import Blueprint, request, current_app
-from sqlalchemy import select
+from sqlalchemy import and_, func, or_, select, update
 
-from ...db import get_session
-from ...db.models import Device, Notification
+from ...db.request_scope import request_session
+from ...db.replicas import mark_user_write
+from ...db.models import Device, Notification, NotificationStatus
+from ...db.loading import NOTIFICATION_LIST
 from ...utils.responses import ok, error
 from ...utils.auth_utils import token_required, get_user_id_from_auth
 from ...utils.timez import now_local
+from ...services.notification_counter import get_unread_count, adjust_unread
 
 # Penting: JANGAN menaruh prefix "/api/notifications" di sini.
 # Prefix dipasang saat register_blueprint() di create_app():
@@ -36,7 +43,7 @@ def register_device():
     if not fcm_token:
         return error("Field 'fcm_token' wajib ada", 400)
 
-    with get_session() as s:
+    with request_session() as s:
         device = None
         if device_identifier:
             device = (
@@ -78,29 +85,109 @@ def register_device():
             msg = "Perangkat berhasil didaftarkan"
 
         s.commit()
+        mark_user_write(user_id)
         s.refresh(device)
 
         return ok(message=msg, device_id=device.id_device)
 
 
+def encode_cursor(created_at: datetime, id_notification: str) -> str:
+    raw = f"{created_at.isoformat()}|{id_notification}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, str]:
+    """Raise ValueError bila cursor rusak."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        ts, nid = raw.split("|", 1)
+        return datetime.fromisoformat(ts), nid
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise ValueError("cursor tidak valid") from e
+
+
+def _parse_status_filter(raw: str) -> list[NotificationStatus]:
+    out = []
+    for part in (raw or "").split(","):
+        part = part.strip()
+        if part:
+            out.append(NotificationStatus(part))  # ValueError bila tidak dikenal
+    return out
+
+
+def _extract_ids(payload: dict) -> list[str]:
+    ids = payload.get("ids") or []
+    if not isinstance(ids, list):
+        raise ValueError("ids harus berupa list")
+    seen, cleaned = set(), []
+    for x in ids:
+        x = str(x or "").strip()
+        if x and x not in seen:
+            cleaned.append(x)
+            seen.add(x)
+    max_ids = int(current_app.config.get("NOTIF_BULK_MAX_IDS", 500))
+    if len(cleaned) > max_ids:
+        raise ValueError(f"Maksimal {max_ids} ids per permintaan")
+    return cleaned
+
+
+def _at_or_before_cursor(created_at: datetime, id_notification: str):
+    """Notifikasi pada posisi cursor dan semua yang lebih lama."""
+    return or_(
+        Notification.created_at < created_at,
+        and_(Notification.created_at == created_at, Notification.id_notification <= id_notification),
+    )
+
+
+def _before_cursor(created_at: datetime, id_notification: str):
+    """Kondisi keyset untuk urutan (created_at DESC, id_notification DESC)."""
+    return or_(
+        Notification.created_at < created_at,
+        and_(Notification.created_at == created_at, Notification.id_notification < id_notification),
+    )
+
+
 @notif_bp.get("/")
 @token_required
 def get_notifications():
     """
-    Mengambil daftar notifikasi untuk pengguna yang terautentikasi.
-    Endpoint akhir: GET /api/notifications
+    Mengambil daftar notifikasi untuk pengguna yang terautentikasi (keyset pagination).
+    Endpoint akhir: GET /api/notifications?limit=&cursor=&status=unread,read
+    Urutan (created_at DESC, id_notification DESC); halaman berikutnya pakai `next_cursor`.
     """
     user_id = get_user_id_from_auth()
-    with get_session() as s:
-        notifications = (
-            s.execute(
-                select(Notification)
-                .where(Notification.id_user == user_id)
-                .order_by(Notification.created_at.desc())
-            )
-            .scalars()
-            .all()
+    default_limit = int(current_app.config.get("NOTIF_PAGE_SIZE", 20))
+    max_limit = int(current_app.config.get("NOTIF_PAGE_SIZE_MAX", 100))
+    limit = request.args.get("limit", type=int, default=default_limit)
+    limit = default_limit if not limit or limit < 1 else min(limit, max_limit)
+
+    try:
+        statuses = _parse_status_filter(request.args.get("status", ""))
+    except ValueError:
+        allowed = ", ".join(s.value for s in NotificationStatus)
+        return error(f"status tidak dikenal (pilihan: {allowed})", 400)
+
+    cursor = (request.args.get("cursor") or "").strip()
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        return error(str(e), 400)
+
+    with request_session(readonly=True, user_id=user_id) as s:
+        stmt = (
+            select(Notification)
+            .options(*NOTIFICATION_LIST)
+            .where(Notification.id_user == user_id, Notification.deleted_at.is_(None))
         )
+        if statuses:
+            stmt = stmt.where(Notification.status.in_(statuses))
+        if after:
+            stmt = stmt.where(_before_cursor(*after))
+        stmt = stmt.order_by(Notification.created_at.desc(), Notification.id_notification.desc()).limit(limit + 1)
+
+        rows = s.execute(stmt).scalars().all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
 
         def to_dict(n: Notification):
             return {
@@ -108,11 +195,26 @@ def get_notifications():
                 "title": n.title,
                 "body": n.body,
                 "created_at": n.created_at.isoformat(),
+                "seen_at": n.seen_at.isoformat() if n.seen_at else None,
                 "read_at": n.read_at.isoformat() if n.read_at else None,
                 "status": n.status.value if n.status else None,
             }
 
-        return ok(items=[to_dict(n) for n in notifications])
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id_notification) if has_more else None
+        return ok(items=[to_dict(n) for n in rows], next_cursor=next_cursor, has_more=has_more)
+
+
+@notif_bp.get("/unread-count")
+@token_required
+def unread_count():
+    """
+    Jumlah notifikasi unread untuk badge aplikasi (counter Redis, fallback COUNT).
+    Endpoint akhir: GET /api/notifications/unread-count
+    """
+    user_id = get_user_id_from_auth()
+    # Primary: bila counter Redis kosong, hasil COUNT disimpan sebagai seed
+    with request_session() as s:
+        return ok(unread=get_unread_count(s, user_id))
 
 
 @notif_bp.put("/<string:notification_id>/read")
@@ -123,7 +225,7 @@ def mark_as_read(notification_id: str):
     Endpoint akhir: PUT /api/notifications/<notification_id>/read
     """
     user_id = get_user_id_from_auth()
-    with get_session() as s:
+    with request_session() as s:
         result = (
             s.query(Notification)
             .filter(
@@ -137,6 +239,7 @@ def mark_as_read(notification_id: str):
             return error("Notifikasi tidak ditemukan atau Anda tidak punya akses", 404)
 
         if not result.read_at:
+            was_unread = result.status == NotificationStatus.unread
             result.read_at = now_local().replace(tzinfo=None)
             # Jika kolom status bertipe Enum, pastikan assignment sesuai tipe Enum
             try:
@@ -145,5 +248,97 @@ def mark_as_read(notification_id: str):
                 # fallback bila status berupa string
                 result.status = "read"  # type: ignore
             s.commit()
+            mark_user_write(user_id)
+            if was_unread:
+                adjust_unread(user_id, -1)
 
         return ok(message="Notifikasi ditandai sebagai sudah dibaca")
+
+
+@notif_bp.post("/read")
+@token_required
+def mark_many_as_read():
+    """
+    Tandai banyak notifikasi sebagai 'read' dalam satu UPDATE.
+    Endpoint akhir: POST /api/notifications/read
+    Body (JSON), salah satu:
+      { "ids": [id_notification, ...] }
+      { "cursor": "<cursor dari GET /api/notifications>" }  -> posisi cursor & semua yang lebih lama
+      { "all": true }
+    """
+    user_id = get_user_id_from_auth()
+    payload = request.get_json(silent=True) or {}
+
+    try:
+        ids = _extract_ids(payload)
+        cursor = (payload.get("cursor") or "").strip()
+        upto = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        return error(str(e), 400)
+    if not ids and upto is None and payload.get("all") is not True:
+        return error("Isi salah satu: ids, cursor, atau all=true", 400)
+
+    now_dt = now_local().replace(tzinfo=None)
+    # status = unread di WHERE: setiap baris yang cocok memang berubah, sehingga rowcount
+    # (yang pada MySQL/PyMySQL menghitung baris 'matched') tepat sama dengan jumlah unread yang berkurang.
+    stmt = (
+        update(Notification)
+        .where(
+            Notification.id_user == user_id,
+            Notification.status == NotificationStatus.unread,
+            Notification.deleted_at.is_(None),
+        )
+        .values(
+            status=NotificationStatus.read,
+            read_at=now_dt,
+            seen_at=func.coalesce(Notification.seen_at, now_dt),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if ids:
+        stmt = stmt.where(Notification.id_notification.in_(ids))
+    if upto is not None:
+        stmt = stmt.where(_at_or_before_cursor(*upto))
+
+    with request_session() as s:
+        updated = s.execute(stmt).rowcount
+        s.commit()
+
+    mark_user_write(user_id)
+    adjust_unread(user_id, -updated)
+    return ok(message="Notifikasi ditandai sebagai sudah dibaca", updated=updated)
+
+
+@notif_bp.post("/seen")
+@token_required
+def mark_many_as_seen():
+    """
+    Catat notifikasi yang sudah ditampilkan aplikasi (seen_at), tanpa mengubah status.
+    Endpoint akhir: POST /api/notifications/seen
+    Body (JSON): { "ids": [id_notification, ...] }
+    """
+    user_id = get_user_id_from_auth()
+    payload = request.get_json(silent=True) or {}
+    try:
+        ids = _extract_ids(payload)
+    except ValueError as e:
+        return error(str(e), 400)
+    if not ids:
+        return error("Field 'ids' wajib ada", 400)
+
+    stmt = (
+        update(Notification)
+        .where(
+            Notification.id_user == user_id,
+            Notification.id_notification.in_(ids),
+            Notification.seen_at.is_(None),
+        )
+        .values(seen_at=now_local().replace(tzinfo=None))
+        .execution_options(synchronize_session=False)
+    )
+    with request_session() as s:
+        updated = s.execute(stmt).rowcount
+        s.commit()
+
+    mark_user_write(user_id)
+    return ok(message="Notifikasi ditandai sudah dilihat", updated=updated)
@@ -0,0 +1,60 @@
+# app/blueprints/storage/routes.py
+from __future__ import annotations
+
+import os
+import time
+
+from flask import Blueprint, request, send_file, current_app
+
+from ...utils.responses import ok, error
+from ...services.storage.backend import get_storage_backend
+
+# Penting: JANGAN menaruh prefix "/api/storage" di sini.
+# Prefix dipasang saat register_blueprint() di create_app():
+# app.register_blueprint(storage_bp, url_prefix="/api/storage")
+storage_bp = Blueprint("storage", __name__)
+
+
+@storage_bp.get("/<path:path>")
+def get_object(path: str):
+    """
+    Sajikan object dari backend filesystem lewat signed URL (HMAC).
+    Hanya aktif bila STORAGE_BACKEND=local; send_file -> os.sendfile di gunicorn.
+    """
+    backend = get_storage_backend()
+    if backend.name != "local":
+        return error("Not Found", 404)
+
+    expires = request.args.get("expires", type=int)
+    sig = request.args.get("sig") or ""
+    if expires is None or not backend.verify_signature(path, expires, sig):
+        return error("Signed URL tidak valid atau kedaluwarsa", 403)
+
+    try:
+        full = backend.local_path(path)
+    except ValueError as e:
+        return error(str(e), 400)
+    if not os.path.isfile(full):
+        return error("Object tidak ditemukan", 404)
+
+    return send_file(full, conditional=True, max_age=max(0, expires - int(time.time())))
+
+
+@storage_bp.put("/<path:path>")
+def put_object(path: str):
+    """Terima upload langsung dari klien lewat signed upload URL (backend lokal)."""
+    backend = get_storage_backend()
+    if backend.name != "local":
+        return error("Not Found", 404)
+
+    expires = request.args.get("expires", type=int)
+    sig = request.args.get("sig") or ""
+    if expires is None or not backend.verify_signature(path, expires, sig, method="PUT"):
+        return error("Signed URL tidak valid atau kedaluwarsa", 403)
+
+    max_bytes = int(current_app.config.get("CATATAN_LAMPIRAN_MAX_BYTES", 10 * 1024 * 1024))
+    try:
+        size = backend.write_stream(path, request.stream, max_bytes)
+    except ValueError as e:
+        return error(str(e), 413)
+    return ok(path=path, size=size)
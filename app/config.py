@@ -6,9 +6,36 @@ from dotenv import load_dotenv
 # Panggil load_dotenv() di awal untuk memuat file .env
 load_dotenv()
 
+# Default pool DB per peran proses. Worker Celery (--pool=solo) cukup sedikit koneksi;
+# web (beberapa worker gunicorn x thread) butuh lebih banyak tapi tetap dibatasi
+# agar total koneksi ke MySQL tidak meledak.
+DB_POOL_DEFAULTS = {
+    "web": {"DB_POOL_SIZE": 5, "DB_MAX_OVERFLOW": 10, "DB_POOL_TIMEOUT": 10},
+    "worker": {"DB_POOL_SIZE": 2, "DB_MAX_OVERFLOW": 3, "DB_POOL_TIMEOUT": 30},
+}
+
 class BaseConfig:
     # Nilai default atau placeholder
     DATABASE_URL = ''
+    APP_ROLE = "web"
+    DB_POOL_SIZE = 5
+    DB_MAX_OVERFLOW = 10
+    DB_POOL_TIMEOUT = 10
+    DB_POOL_RECYCLE = 1800
+    DB_POOL_PRE_PING = True
+
+    # Read replica (kosong = semua baca ke primary)
+    DATABASE_REPLICA_URLS = ()
+    DB_REPLICA_COOLDOWN = 30
+    DB_READ_YOUR_WRITES_SECONDS = 0
+
+    # Instrumentasi SQL per request/task
+    DB_SLOW_QUERY_MS = 200
+    DB_EXPLAIN_SLOW = True
+    DB_NPLUS1_THRESHOLD = 10
+    DB_INSTRUMENT_HEADERS = False
+    # true: semua lazy load relationship ORM menjadi error (untuk test/dev)
+    DB_STRICT_LOADING = False
     TIMEZONE = 'Asia/Makassar'
     DEFAULT_GEOFENCE_RADIUS = 100
     SUPABASE_URL = ""
@@ -16,13 +43,119 @@ class BaseConfig:
     SUPABASE_BUCKET = "e-hrm"
     MODEL_NAME = "buffalo_l"
     SIGNED_URL_EXPIRES = 604800
+    # Signed URL dipakai ulang sampai MARGIN detik sebelum kedaluwarsa
+    SIGNED_URL_CACHE_MARGIN = 3600
+    SIGNED_URL_CACHE_SIZE = 5000
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024
+
+    # Lampiran catatan: upload langsung ke storage lewat signed URL
+    CATATAN_UPLOAD_URL_EXPIRES = 600
+    CATATAN_LAMPIRAN_MAX_BYTES = 10 * 1024 * 1024
+    CATATAN_LAMPIRAN_ALLOWED_TYPES = ("image/jpeg", "image/png", "application/pdf")
+    # Finalize masih diterima sampai GRACE detik setelah URL kedaluwarsa; sisanya dibersihkan job
+    CATATAN_FINALIZE_GRACE = 120
+    CATATAN_UPLOAD_CLEANUP_MINUTES = 30
+    CATATAN_UPLOAD_CLEANUP_CHUNK = 200
+
+    # Baseline wajah: crop berpusat di wajah, resolusi & kualitas dibatasi
+    FACE_BASELINE_MAX_SIDE = 640
+    FACE_BASELINE_JPEG_QUALITY = 85
+    FACE_BASELINE_CROP_MARGIN = 0.35
+    FACE_THUMBNAIL_SIZE = 160
+    FACE_THUMBNAIL_JPEG_QUALITY = 75
+    FACE_BASELINE_KEEP_SETS = 2
+    # Baseline format lama (satu <ts> per gambar) yang berjarak <= GAP detik = satu enrollment
+    FACE_BASELINE_SET_GAP = 120
+    FACE_BASELINE_PRUNE_HOUR = 4
+    FACE_BASELINE_PRUNE_MINUTE = 0
     JSON_SORT_KEYS = False
+
+    # Backend storage: 'supabase' atau 'local' (filesystem NVMe/NFS)
+    STORAGE_BACKEND = "supabase"
+    STORAGE_LOCAL_ROOT = ""
+    STORAGE_LOCAL_SIGNING_KEY = ""
+    STORAGE_LOCAL_BASE_URL = "/api/storage"
+
+    # Pool HTTP untuk Supabase Storage (per proses, dibuat lazy setelah fork)
+    STORAGE_POOL_MAXSIZE = 20
+    STORAGE_POOL_KEEPALIVE = 10
+    STORAGE_KEEPALIVE_EXPIRY = 30.0
+    STORAGE_CONNECT_TIMEOUT = 3.0
+    STORAGE_READ_TIMEOUT = 15.0
+
+    # Ketahanan storage: deadline per operasi, retry baca, circuit breaker
+    STORAGE_DEADLINE_READ = 5.0
+    STORAGE_DEADLINE_WRITE = 15.0
+    STORAGE_RETRY_ATTEMPTS = 3
+    STORAGE_RETRY_BASE_DELAY = 0.1
+    STORAGE_BREAKER_FAILURES = 5
+    STORAGE_BREAKER_RESET = 30.0
+
+    # Cache disk untuk download storage (kosong = nonaktif)
+    STORAGE_CACHE_DIR = ""
+    STORAGE_CACHE_MAX_BYTES = 512 * 1024 * 1024
+    STORAGE_CACHE_MAX_AGE = 3600
+    STORAGE_CACHE_PREFIXES = ("face_detection/",)
     
     # Konfigurasi Celery
     CELERY_BROKER_URL = 'redis://localhost:6379/0'
     CELERY_RESULT_BACKEND = 'redis://localhost:6379/0'
 
+    # Notifikasi: ukuran halaman & TTL counter unread di Redis
+    NOTIF_PAGE_SIZE = 20
+    NOTIF_PAGE_SIZE_MAX = 100
+    NOTIF_UNREAD_COUNTER_TTL = 300
+    NOTIF_BULK_MAX_IDS = 500
+
+    # Retensi notifikasi (job celery beat harian)
+    NOTIF_RETENTION_DAYS = 180
+    NOTIF_RETENTION_MODE = "archive"  # archive | soft_delete
+    NOTIF_RETENTION_CHUNK = 500
+    NOTIF_RETENTION_PAUSE = 0.05
+    NOTIF_RETENTION_MAX_SECONDS = 300
+    NOTIF_RETENTION_HOUR = 2
+    NOTIF_RETENTION_MINUTE = 15
+
+    # Rotasi absensi ke tabel arsip: bulan berjalan + N bulan sebelumnya tetap di tabel panas
+    ATTENDANCE_HOT_MONTHS = 3
+    ATTENDANCE_ARCHIVE_CHUNK = 500
+    ATTENDANCE_ARCHIVE_MAX_SECONDS = 900
+    ATTENDANCE_ARCHIVE_PAUSE = 0.05
+
+    # TTL maksimum cache "today state" absensi per user (detik; selalu berakhir tengah malam)
+    TODAY_STATE_TTL = 900
+
+    # Endpoint hasil task check-in/out: umur catatan pemilik task, batas long-poll, SSE opsional
+    TASK_RESULT_TTL = 3600
+    TASK_RESULT_MAX_WAIT = 5
+    TASK_RESULT_SSE_ENABLED = False
+    TASK_RESULT_SSE_TIMEOUT = 60
+    TASK_RESULT_SSE_HEARTBEAT = 15
+
+    # Idempotency-Key: umur respons tersimpan & lock selama request pertama berjalan (detik)
+    IDEMPOTENCY_TTL = 86400
+    IDEMPOTENCY_LOCK_TTL = 60
+
+    # Roster harian (shift/pola kerja per user per tanggal) di Redis: jendela & jadwal rebuild
+    ROSTER_DAYS_AHEAD = 1
+    ROSTER_REFRESH_HOUR = 0
+    ROSTER_REFRESH_MINUTE = 5
+
+    # Export absensi (GET /api/absensi/export): rentang maksimum & ukuran batch cursor
+    EXPORT_MAX_DAYS = 366
+    EXPORT_BATCH_SIZE = 1000
+
+    # Rebuild harian rekap_absensi_bulanan (bulan milik "kemarin")
+    SUMMARY_REBUILD_HOUR = 1
+    SUMMARY_REBUILD_MINUTE = 30
+
+    # Interval job rekonsiliasi counter dashboard kehadiran dengan DB (menit)
+    PRESENCE_RECONCILE_MINUTES = 10
+
+    # Redis untuk state aplikasi (kosong = pakai CELERY_BROKER_URL)
+    REDIS_URL = ''
+    REDIS_SOCKET_TIMEOUT = 1.0
+
     # Placeholder untuk Firebase
     FIREBASE_PROJECT_ID = None
     FIREBASE_CLIENT_EMAIL = None
@@ -34,26 +167,139 @@ class DevConfig(BaseConfig):
 class ProdConfig(BaseConfig):
     DEBUG = False
 
+class TestConfig(BaseConfig):
+    # FLASK_ENV=testing (dipakai tests/conftest.py); DATABASE_URL diisi dari TEST_DATABASE_URL
+    TESTING = True
+    # Lazy load relationship di test = error, supaya N+1 ketahuan sebelum produksi
+    DB_STRICT_LOADING = True
+
 def load_config(app):
     """Memuat konfigurasi berdasarkan lingkungan dan variabel .env."""
     env = os.getenv("FLASK_ENV", "development").lower()
     if env == "production":
         app.config.from_object(ProdConfig)
+    elif env == "testing":
+        app.config.from_object(TestConfig)
     else:
         app.config.from_object(DevConfig)
     
+    role = os.getenv("APP_ROLE", "web").lower()
+    pool_defaults = DB_POOL_DEFAULTS.get(role, DB_POOL_DEFAULTS["web"])
+
     # Muat variabel dari .env secara eksplisit ke dalam app.config.
     # Ini menimpa nilai default di BaseConfig jika ada di .env.
     app.config.update(
         DATABASE_URL = os.getenv('DATABASE_URL', ''),
+        APP_ROLE = role,
+        DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE') or pool_defaults["DB_POOL_SIZE"]),
+        DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW') or pool_defaults["DB_MAX_OVERFLOW"]),
+        DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT') or pool_defaults["DB_POOL_TIMEOUT"]),
+        DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE') or 1800),
+        DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes'),
+        DATABASE_REPLICA_URLS = tuple(
+            u.strip() for u in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if u.strip()
+        ),
+        DB_REPLICA_COOLDOWN = float(os.getenv('DB_REPLICA_COOLDOWN', '30')),
+        # >0 mengaktifkan read-your-writes: baca user yang baru menulis diarahkan ke primary
+        DB_READ_YOUR_WRITES_SECONDS = int(os.getenv('DB_READ_YOUR_WRITES_SECONDS', '0')),
+        DB_SLOW_QUERY_MS = float(os.getenv('DB_SLOW_QUERY_MS', '200')),
+        DB_EXPLAIN_SLOW = os.getenv('DB_EXPLAIN_SLOW', 'true').lower() in ('1', 'true', 'yes'),
+        DB_NPLUS1_THRESHOLD = int(os.getenv('DB_NPLUS1_THRESHOLD', '10')),
+        DB_INSTRUMENT_HEADERS = os.getenv('DB_INSTRUMENT_HEADERS', 'false').lower() in ('1', 'true', 'yes'),
+        DB_STRICT_LOADING = os.getenv(
+            'DB_STRICT_LOADING', 'true' if app.config.get('DB_STRICT_LOADING') else 'false'
+        ).lower() in ('1', 'true', 'yes'),
         TIMEZONE = os.getenv('TIMEZONE', 'Asia/Makassar'),
         DEFAULT_GEOFENCE_RADIUS = int(os.getenv('DEFAULT_GEOFENCE_RADIUS', '100')),
         SUPABASE_URL = os.getenv("SUPABASE_URL", ""),
         SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY", ""),
+
+        # Variabel lampiran catatan
+        CATATAN_UPLOAD_URL_EXPIRES = int(os.getenv("CATATAN_UPLOAD_URL_EXPIRES", "600")),
+        CATATAN_LAMPIRAN_MAX_BYTES = int(os.getenv("CATATAN_LAMPIRAN_MAX_BYTES", str(10 * 1024 * 1024))),
+        CATATAN_LAMPIRAN_ALLOWED_TYPES = tuple(
+            t.strip().lower()
+            for t in os.getenv("CATATAN_LAMPIRAN_ALLOWED_TYPES", "image/jpeg,image/png,application/pdf").split(",")
+            if t.strip()
+        ),
+        CATATAN_FINALIZE_GRACE = int(os.getenv("CATATAN_FINALIZE_GRACE", "120")),
+        CATATAN_UPLOAD_CLEANUP_MINUTES = int(os.getenv("CATATAN_UPLOAD_CLEANUP_MINUTES", "30")),
+        CATATAN_UPLOAD_CLEANUP_CHUNK = int(os.getenv("CATATAN_UPLOAD_CLEANUP_CHUNK", "200")),
+
+        # Variabel baseline wajah
+        FACE_BASELINE_MAX_SIDE = int(os.getenv("FACE_BASELINE_MAX_SIDE", "640")),
+        FACE_BASELINE_JPEG_QUALITY = int(os.getenv("FACE_BASELINE_JPEG_QUALITY", "85")),
+        FACE_BASELINE_CROP_MARGIN = float(os.getenv("FACE_BASELINE_CROP_MARGIN", "0.35")),
+        FACE_THUMBNAIL_SIZE = int(os.getenv("FACE_THUMBNAIL_SIZE", "160")),
+        FACE_THUMBNAIL_JPEG_QUALITY = int(os.getenv("FACE_THUMBNAIL_JPEG_QUALITY", "75")),
+        FACE_BASELINE_KEEP_SETS = int(os.getenv("FACE_BASELINE_KEEP_SETS", "2")),
+        FACE_BASELINE_SET_GAP = int(os.getenv("FACE_BASELINE_SET_GAP", "120")),
+        FACE_BASELINE_PRUNE_HOUR = int(os.getenv("FACE_BASELINE_PRUNE_HOUR", "4")),
+        FACE_BASELINE_PRUNE_MINUTE = int(os.getenv("FACE_BASELINE_PRUNE_MINUTE", "0")),
+
+        # Variabel backend & pool storage
+        STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "supabase"),
+        STORAGE_LOCAL_ROOT = os.getenv("STORAGE_LOCAL_ROOT", ""),
+        STORAGE_LOCAL_SIGNING_KEY = os.getenv("STORAGE_LOCAL_SIGNING_KEY", ""),
+        STORAGE_LOCAL_BASE_URL = os.getenv("STORAGE_LOCAL_BASE_URL", "/api/storage"),
+        STORAGE_POOL_MAXSIZE = int(os.getenv("STORAGE_POOL_MAXSIZE", "20")),
+        STORAGE_POOL_KEEPALIVE = int(os.getenv("STORAGE_POOL_KEEPALIVE", "10")),
+        STORAGE_KEEPALIVE_EXPIRY = float(os.getenv("STORAGE_KEEPALIVE_EXPIRY", "30")),
+        STORAGE_CONNECT_TIMEOUT = float(os.getenv("STORAGE_CONNECT_TIMEOUT", "3")),
+        STORAGE_READ_TIMEOUT = float(os.getenv("STORAGE_READ_TIMEOUT", "15")),
+        STORAGE_DEADLINE_READ = float(os.getenv("STORAGE_DEADLINE_READ", "5")),
+        STORAGE_DEADLINE_WRITE = float(os.getenv("STORAGE_DEADLINE_WRITE", "15")),
+        STORAGE_RETRY_ATTEMPTS = int(os.getenv("STORAGE_RETRY_ATTEMPTS", "3")),
+        STORAGE_RETRY_BASE_DELAY = float(os.getenv("STORAGE_RETRY_BASE_DELAY", "0.1")),
+        STORAGE_BREAKER_FAILURES = int(os.getenv("STORAGE_BREAKER_FAILURES", "5")),
+        STORAGE_BREAKER_RESET = float(os.getenv("STORAGE_BREAKER_RESET", "30")),
+        SIGNED_URL_CACHE_MARGIN = int(os.getenv("SIGNED_URL_CACHE_MARGIN", "3600")),
+        SIGNED_URL_CACHE_SIZE = int(os.getenv("SIGNED_URL_CACHE_SIZE", "5000")),
+        STORAGE_CACHE_DIR = os.getenv("STORAGE_CACHE_DIR", ""),
+        STORAGE_CACHE_MAX_BYTES = int(os.getenv("STORAGE_CACHE_MAX_BYTES", str(512 * 1024 * 1024))),
+        # embedding.npy ditimpa saat enroll ulang (bisa dari host worker lain),
+        # jadi entri cache tetap diberi umur maksimum.
+        STORAGE_CACHE_MAX_AGE = int(os.getenv("STORAGE_CACHE_MAX_AGE", "3600")),
+        STORAGE_CACHE_PREFIXES = tuple(
+            p.strip() for p in os.getenv("STORAGE_CACHE_PREFIXES", "face_detection/").split(",") if p.strip()
+        ),
         
         # Variabel Celery
         CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0'),
         CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND', 'redis://localhost:6379/0'),
+        REDIS_URL = os.getenv('REDIS_URL', ''),
+        NOTIF_PAGE_SIZE = int(os.getenv('NOTIF_PAGE_SIZE', '20')),
+        NOTIF_PAGE_SIZE_MAX = int(os.getenv('NOTIF_PAGE_SIZE_MAX', '100')),
+        NOTIF_UNREAD_COUNTER_TTL = int(os.getenv('NOTIF_UNREAD_COUNTER_TTL', '300')),
+        NOTIF_BULK_MAX_IDS = int(os.getenv('NOTIF_BULK_MAX_IDS', '500')),
+        NOTIF_RETENTION_DAYS = int(os.getenv('NOTIF_RETENTION_DAYS', '180')),
+        NOTIF_RETENTION_MODE = os.getenv('NOTIF_RETENTION_MODE', 'archive'),
+        NOTIF_RETENTION_CHUNK = int(os.getenv('NOTIF_RETENTION_CHUNK', '500')),
+        NOTIF_RETENTION_PAUSE = float(os.getenv('NOTIF_RETENTION_PAUSE', '0.05')),
+        NOTIF_RETENTION_MAX_SECONDS = float(os.getenv('NOTIF_RETENTION_MAX_SECONDS', '300')),
+        NOTIF_RETENTION_HOUR = int(os.getenv('NOTIF_RETENTION_HOUR', '2')),
+        NOTIF_RETENTION_MINUTE = int(os.getenv('NOTIF_RETENTION_MINUTE', '15')),
+        ATTENDANCE_HOT_MONTHS = int(os.getenv('ATTENDANCE_HOT_MONTHS', '3')),
+        ATTENDANCE_ARCHIVE_CHUNK = int(os.getenv('ATTENDANCE_ARCHIVE_CHUNK', '500')),
+        ATTENDANCE_ARCHIVE_MAX_SECONDS = float(os.getenv('ATTENDANCE_ARCHIVE_MAX_SECONDS', '900')),
+        ATTENDANCE_ARCHIVE_PAUSE = float(os.getenv('ATTENDANCE_ARCHIVE_PAUSE', '0.05')),
+        REDIS_SOCKET_TIMEOUT = float(os.getenv('REDIS_SOCKET_TIMEOUT', '1.0')),
+        TODAY_STATE_TTL = int(os.getenv('TODAY_STATE_TTL', '900')),
+        TASK_RESULT_TTL = int(os.getenv('TASK_RESULT_TTL', '3600')),
+        TASK_RESULT_MAX_WAIT = float(os.getenv('TASK_RESULT_MAX_WAIT', '5')),
+        TASK_RESULT_SSE_ENABLED = os.getenv('TASK_RESULT_SSE_ENABLED', 'false').lower() in ('1', 'true', 'yes'),
+        TASK_RESULT_SSE_TIMEOUT = float(os.getenv('TASK_RESULT_SSE_TIMEOUT', '60')),
+        TASK_RESULT_SSE_HEARTBEAT = float(os.getenv('TASK_RESULT_SSE_HEARTBEAT', '15')),
+        IDEMPOTENCY_TTL = int(os.getenv('IDEMPOTENCY_TTL', '86400')),
+        IDEMPOTENCY_LOCK_TTL = int(os.getenv('IDEMPOTENCY_LOCK_TTL', '60')),
+        ROSTER_DAYS_AHEAD = int(os.getenv('ROSTER_DAYS_AHEAD', '1')),
+        ROSTER_REFRESH_HOUR = int(os.getenv('ROSTER_REFRESH_HOUR', '0')),
+        ROSTER_REFRESH_MINUTE = int(os.getenv('ROSTER_REFRESH_MINUTE', '5')),
+        EXPORT_MAX_DAYS = int(os.getenv('EXPORT_MAX_DAYS', '366')),
+        EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', '1000')),
+        SUMMARY_REBUILD_HOUR = int(os.getenv('SUMMARY_REBUILD_HOUR', '1')),
+        SUMMARY_REBUILD_MINUTE = int(os.getenv('SUMMARY_REBUILD_MINUTE', '30')),
+        PRESENCE_RECONCILE_MINUTES = int(os.getenv('PRESENCE_RECONCILE_MINUTES', '10')),
 
         # Variabel Firebase
         FIREBASE_PROJECT_ID=os.getenv('FIREBASE_PROJECT_ID'),
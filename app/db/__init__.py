@@ -1,3 +1,5 @@
+from __future__ import annotations
+
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from flask import current_app
@@ -5,6 +7,22 @@ from flask import current_app
 Base = declarative_base()
 _SessionFactory = None
 _engine = None
+_ReadSessionFactories = {}
+
+
+def _engine_options(config) -> dict:
+    """Opsi pool dari config (default berbeda untuk APP_ROLE web / worker, lihat config.py)."""
+    from .pool_metrics import InstrumentedQueuePool
+    return dict(
+        poolclass=InstrumentedQueuePool,
+        pool_size=int(config.get("DB_POOL_SIZE", 5)),
+        max_overflow=int(config.get("DB_MAX_OVERFLOW", 10)),
+        pool_recycle=int(config.get("DB_POOL_RECYCLE", 1800)),
+        pool_timeout=float(config.get("DB_POOL_TIMEOUT", 10)),
+        pool_pre_ping=bool(config.get("DB_POOL_PRE_PING", True)),
+        future=True,
+    )
+
 
 def get_engine():
     global _engine
@@ -12,11 +30,29 @@ def get_engine():
         url = current_app.config.get("DATABASE_URL", "")
         if not url:
             raise RuntimeError("DATABASE_URL not configured")
-        _engine = create_engine(url, pool_pre_ping=True, future=True)
+        from .pool_metrics import attach_pool_metrics
+        from .request_scope import attach_request_stats
+        _engine = create_engine(url, **_engine_options(current_app.config))
+        attach_pool_metrics(_engine, "primary")
+        attach_request_stats(_engine)
     return _engine
 
-def get_session():
+def get_session(readonly: bool = False, user_id: str | None = None):
+    """
+    readonly=True: session ke salah satu read replica (round-robin, lihat db/replicas.py).
+    Jatuh ke primary bila replica tidak dikonfigurasi/semuanya down, atau bila `user_id`
+    baru saja menulis (jendela read-your-writes).
+    """
     global _SessionFactory
+    if readonly:
+        from .replicas import pick_read_engine
+        engine = pick_read_engine(user_id)
+        if engine is not None:
+            factory = _ReadSessionFactories.get(id(engine))
+            if factory is None:
+                factory = sessionmaker(bind=engine, autocommit=False, autoflush=False, future=True)
+                _ReadSessionFactories[id(engine)] = factory
+            return factory()
     if _SessionFactory is None:
         _SessionFactory = sessionmaker(bind=get_engine(), autocommit=False, autoflush=False, future=True)
     return _SessionFactory()
@@ -0,0 +1,59 @@
+# app/db/archive.py
+"""
+Tabel arsip untuk data absensi bulan yang sudah tutup.
+
+Absensi tidak bisa dipartisi native di MySQL: tabel berpartisi tidak boleh punya foreign key
+(Absensi punya FK ke user/location dan direferensikan catatan, istirahat, agenda_kerja,
+absensi_report_recipients), dan setiap unique key harus memuat kolom partisi. Karena itu
+bulan lama dipindahkan ke tabel *_archive dengan kolom yang sama, tanpa FK.
+"""
+from __future__ import annotations
+
+from sqlalchemy import CHAR, Column, DateTime, Index, Table, func
+
+from . import Base
+from .models import Absensi, AbsensiReportRecipient, Catatan, Istirahat
+
+
+def _archive_of(source: Table, name: str, *indexes: tuple[str, ...]) -> Table:
+    cols = [
+        Column(c.name, c.type, primary_key=c.primary_key, nullable=c.nullable)
+        for c in source.columns
+    ]
+    cols.append(Column("archived_at", DateTime, nullable=False, default=func.now()))
+    idx = [Index(f"idx_{name}_{'_'.join(ix)}", *ix) for ix in indexes]
+    return Table(name, Base.metadata, *cols, *idx)
+
+
+absensi_archive = _archive_of(Absensi.__table__, "Absensi_archive", ("id_user", "tanggal"), ("tanggal",))
+istirahat_archive = _archive_of(Istirahat.__table__, "istirahat_archive", ("id_absensi",), ("id_user", "tanggal_istirahat"))
+catatan_archive = _archive_of(Catatan.__table__, "catatan_archive", ("id_absensi",))
+report_recipients_archive = _archive_of(
+    AbsensiReportRecipient.__table__, "absensi_report_recipients_archive", ("id_absensi",), ("id_user",)
+)
+
+# agenda_kerja tetap di tabel panas; FK-nya SET NULL saat Absensi dipindah,
+# jadi tautan lama disimpan di sini.
+agenda_absensi_archive = Table(
+    "agenda_kerja_absensi_archive",
+    Base.metadata,
+    Column("id_agenda_kerja", CHAR(36), primary_key=True),
+    Column("id_absensi", CHAR(36), nullable=False),
+    Column("archived_at", DateTime, nullable=False, default=func.now()),
+    Index("idx_akaa_id_absensi", "id_absensi"),
+)
+
+# (tabel sumber, tabel arsip) anak Absensi, dipindah sebelum induknya
+CHILD_ARCHIVES = [
+    (Catatan.__table__, catatan_archive),
+    (AbsensiReportRecipient.__table__, report_recipients_archive),
+    (Istirahat.__table__, istirahat_archive),
+]
+
+ARCHIVE_TABLES = [
+    absensi_archive,
+    istirahat_archive,
+    catatan_archive,
+    report_recipients_archive,
+    agenda_absensi_archive,
+]
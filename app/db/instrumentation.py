@@ -0,0 +1,148 @@
+# app/db/instrumentation.py
+from __future__ import annotations
+
+import re
+import time
+import logging
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from flask import current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import event
+
+from .request_scope import _scope_stats
+
+logger = logging.getLogger(__name__)
+
+_WS = re.compile(r"\s+")
+_IN_LIST = re.compile(r"IN \((?:%s|\?|%\(\w+\)s)(?:, (?:%s|\?|%\(\w+\)s))*\)", re.IGNORECASE)
+
+
+def _shape(statement: str) -> str:
+    """Bentuk statement: parameter sudah ter-bind, cukup rapikan spasi & panjang IN (...)."""
+    return _IN_LIST.sub("IN (...)", _WS.sub(" ", statement.strip()))
+
+
+def unit_of_work_name() -> str:
+    """Nama endpoint (request) atau nama task Celery untuk log."""
+    name = g.get("unit_of_work")
+    if name:
+        return name
+    if has_request_context():
+        return request.endpoint or request.path
+    return "app_context"
+
+
+def _cfg(key: str, default: Any) -> Any:
+    return current_app.config.get(key, default)
+
+
+def _explain(conn, statement: str, parameters) -> Optional[list]:
+    # Pakai cursor DBAPI langsung agar EXPLAIN tidak ikut terhitung/terinstrumentasi
+    try:
+        cur = conn.connection.cursor()
+        try:
+            cur.execute("EXPLAIN " + statement, parameters)
+            cols = [c[0] for c in cur.description or ()]
+            return [dict(zip(cols, row)) for row in cur.fetchall()]
+        finally:
+            cur.close()
+    except Exception as e:
+        logger.debug("EXPLAIN gagal: %s", e)
+        return None
+
+
+def attach_instrumentation(engine) -> None:
+    """
+    Hitung jumlah statement & waktu DB per request/task, log query lambat (dengan EXPLAIN),
+    dan peringatkan bila bentuk statement yang sama berulang (pola N+1).
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["_query_start"].pop()
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        if not has_app_context():
+            return
+
+        stats = _scope_stats()
+        stats["statements"] += 1
+        stats["db_time_ms"] += elapsed_ms
+        is_select = statement.lstrip()[:6].upper() == "SELECT"
+        if is_select:
+            stats["selects"] += 1
+
+        slow_ms = float(_cfg("DB_SLOW_QUERY_MS", 200))
+        if slow_ms and elapsed_ms >= slow_ms:
+            plan = None
+            if is_select and not executemany and _cfg("DB_EXPLAIN_SLOW", True):
+                plan = _explain(conn, statement, parameters)
+            logger.warning(
+                "[db.slow] %.1f ms di %s: %s | params=%r | explain=%s",
+                elapsed_ms, unit_of_work_name(), _shape(statement)[:1000], parameters, plan,
+            )
+
+        threshold = int(_cfg("DB_NPLUS1_THRESHOLD", 10))
+        if threshold > 0:
+            shapes: Dict[str, int] = g.setdefault("_db_shapes", {})
+            shape = _shape(statement)
+            n = shapes.get(shape, 0) + 1
+            shapes[shape] = n
+            if n == threshold:
+                stats["nplus1_warnings"] += 1
+                logger.warning(
+                    "[db.n+1] statement yang sama sudah %s kali di %s: %s",
+                    n, unit_of_work_name(), shape[:500],
+                )
+
+    @event.listens_for(engine, "handle_error")
+    def _on_error(ctx):
+        # Statement gagal tidak sampai ke after_cursor_execute; buang waktu mulainya
+        conn = ctx.connection
+        if conn is not None and conn.info.get("_query_start"):
+            conn.info["_query_start"].pop()
+
+
+def add_db_headers(response):
+    """after_request: header X-DB-* (aktif bila DB_INSTRUMENT_HEADERS)."""
+    stats = g.get("_db_stats")
+    if stats and _cfg("DB_INSTRUMENT_HEADERS", False):
+        response.headers["X-DB-Statements"] = str(stats["statements"])
+        response.headers["X-DB-Time-Ms"] = f"{stats['db_time_ms']:.1f}"
+    return response
+
+
+def log_scope_summary(stats: Dict[str, Any]) -> None:
+    logger.debug(
+        "[db.scope] %s statements=%s selects=%s db_time_ms=%.1f checkouts=%s",
+        unit_of_work_name(), stats["statements"], stats["selects"], stats["db_time_ms"], stats["checkouts"],
+    )
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def query_budget(max_statements: int, max_time_ms: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Helper untuk test/skrip: pastikan blok kode (mis. test_client.get(...) di dalam app context)
+    tidak melebihi jumlah statement / waktu DB tertentu.
+
+        with app.app_context(), query_budget(5):
+            client.get("/api/absensi/status?user_id=...")
+    """
+    stats = _scope_stats()
+    before_n, before_t = stats["statements"], stats["db_time_ms"]
+    used: Dict[str, Any] = {}
+    yield used
+    used["statements"] = stats["statements"] - before_n
+    used["db_time_ms"] = stats["db_time_ms"] - before_t
+    if used["statements"] > max_statements:
+        raise QueryBudgetExceeded(f"{used['statements']} statement > budget {max_statements}")
+    if max_time_ms is not None and used["db_time_ms"] > max_time_ms:
+        raise QueryBudgetExceeded(f"{used['db_time_ms']:.1f} ms > budget {max_time_ms} ms")
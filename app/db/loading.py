@@ -0,0 +1,91 @@
+# app/db/loading.py
+"""
+Profil loading untuk query di jalur panas.
+
+Setiap profil = load_only(kolom yang benar-benar dibaca) + raiseload("*"), sehingga:
+- hidrasi entity lebar (mis. User dengan puluhan relationship) hanya menyentuh kolom perlu,
+- lazy load relationship yang tidak disengaja langsung error alih-alih diam-diam menambah query.
+Kolom di luar load_only masih bisa di-load saat diakses (satu SELECT tambahan), jadi
+tambahkan kolom ke profil bila memang dipakai.
+
+DB_STRICT_LOADING=true (untuk test/dev) memasang raiseload("*") ke SEMUA query ORM.
+"""
+from __future__ import annotations
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, load_only, raiseload
+
+from .models import (
+    Absensi,
+    Istirahat,
+    Location,
+    Notification,
+    NotificationTemplate,
+    User,
+)
+
+
+def lean(*columns):
+    """Profil ad-hoc: hanya kolom tertentu, relationship tidak boleh lazy load."""
+    return (load_only(*columns), raiseload("*"))
+
+
+USER_BRIEF = lean(User.id_user, User.nama_pengguna, User.role, User.id_location, User.id_departement)
+
+LOCATION_GEO = lean(
+    Location.id_location,
+    Location.nama_kantor,
+    Location.latitude,
+    Location.longitude,
+    Location.radius,
+    Location.deleted_at,
+)
+
+# Cukup untuk status harian, istirahat, dan pengecekan checkout
+ABSENSI_TODAY = lean(
+    Absensi.id_absensi,
+    Absensi.id_user,
+    Absensi.tanggal,
+    Absensi.jam_masuk,
+    Absensi.jam_pulang,
+    Absensi.id_lokasi_datang,
+)
+
+ISTIRAHAT_ROW = lean(
+    Istirahat.id_istirahat,
+    Istirahat.id_absensi,
+    Istirahat.tanggal_istirahat,
+    Istirahat.start_istirahat,
+    Istirahat.start_istirahat_latitude,
+    Istirahat.start_istirahat_longitude,
+    Istirahat.end_istirahat,
+    Istirahat.end_istirahat_latitude,
+    Istirahat.end_istirahat_longitude,
+)
+
+NOTIFICATION_LIST = lean(
+    Notification.id_notification,
+    Notification.title,
+    Notification.body,
+    Notification.status,
+    Notification.created_at,
+    Notification.seen_at,
+    Notification.read_at,
+)
+
+TEMPLATE_RENDER = lean(
+    NotificationTemplate.id,
+    NotificationTemplate.title_template,
+    NotificationTemplate.body_template,
+)
+
+
+def init_strict_loading(app) -> None:
+    """Pasang raiseload('*') global bila DB_STRICT_LOADING aktif (lazy load = error)."""
+    if not app.config.get("DB_STRICT_LOADING"):
+        return
+
+    @event.listens_for(Session, "do_orm_execute")
+    def _strict(state):
+        if state.is_select and not state.is_relationship_load and not state.is_column_load:
+            state.statement = state.statement.options(raiseload("*"))
@@ -2,7 +2,7 @@
 from enum import Enum as PyEnum
 import uuid
 from sqlalchemy import (
-    CHAR, Column, String, DateTime, Date, Enum, Integer, Text, ForeignKey,
+    CHAR, Column, String, DateTime, Date, Enum, Integer, SmallInteger, BigInteger, Text, ForeignKey,
     Boolean, UniqueConstraint, Index, DECIMAL, func
 )
 from sqlalchemy.orm import relationship
@@ -101,6 +101,10 @@ class NotificationStatus(PyEnum):
     read = "read"
     archived = "archived"
 
+class UploadStatus(PyEnum):
+    pending = "pending"
+    finalized = "finalized"
+
 
 # ===== Models =====
 
@@ -586,11 +590,35 @@ class Absensi(Base):
     __table_args__ = (
         UniqueConstraint("id_user", "tanggal", name="uq_absensi_user_tanggal"),
         Index("idx_abs_id_user_tanggal", "id_user", "tanggal"),
+        Index("idx_abs_tanggal", "tanggal"),
         Index("idx_abs_id_lokasi_datang", "id_lokasi_datang"),
         Index("idx_abs_id_lokasi_pulang", "id_lokasi_pulang"),
     )
 
 
+class RekapAbsensiBulanan(Base):
+    """
+    Rekap bulanan per karyawan untuk payroll. Dijaga inkremental oleh task checkout & route
+    akhir istirahat, dan dihitung ulang penuh oleh job absensi.rebuild_monthly_summary.
+    """
+    __tablename__ = "rekap_absensi_bulanan"
+    id_user = Column(CHAR(36), ForeignKey("user.id_user", ondelete="CASCADE", onupdate="CASCADE"), primary_key=True)
+    tahun = Column(SmallInteger, primary_key=True, autoincrement=False)
+    bulan = Column(SmallInteger, primary_key=True, autoincrement=False)
+    hari_hadir = Column(Integer, nullable=False, default=0)
+    jumlah_terlambat = Column(Integer, nullable=False, default=0)
+    jumlah_pulang_cepat = Column(Integer, nullable=False, default=0)
+    total_kerja_detik = Column(BigInteger, nullable=False, default=0)
+    total_istirahat_detik = Column(BigInteger, nullable=False, default=0)
+
+    rebuilt_at = Column(DateTime)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        Index("idx_rab_tahun_bulan", "tahun", "bulan"),
+    )
+
+
 class AbsensiReportRecipient(Base):
     __tablename__ = "absensi_report_recipients"
     id_absensi_report_recipient = Column(CHAR(36), primary_key=True, default=lambda: str(uuid.uuid4()))
@@ -636,6 +664,28 @@ class Catatan(Base):
     )
 
 
+class LampiranUpload(Base):
+    """Jejak upload lampiran catatan yang dikirim langsung ke storage lewat signed URL."""
+    __tablename__ = "lampiran_upload"
+    id_lampiran_upload = Column(CHAR(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id_user = Column(CHAR(36), ForeignKey("user.id_user", ondelete="CASCADE", onupdate="CASCADE"), nullable=False)
+    path = Column(String(512), nullable=False)
+    content_type = Column(String(127))
+    size_bytes = Column(Integer)
+    status = Column(Enum(UploadStatus), nullable=False, default=UploadStatus.pending)
+    expires_at = Column(DateTime, nullable=False)
+    finalized_at = Column(DateTime)
+
+    created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("path", name="uq_lu_path"),
+        Index("idx_lu_id_user_created_at", "id_user", "created_at"),
+        Index("idx_lu_status_expires_at", "status", "expires_at"),
+    )
+
+
 class Notification(Base):
     __tablename__ = "notifications"
     id_notification = Column(CHAR(36), primary_key=True, default=lambda: str(uuid.uuid4()))
@@ -658,6 +708,31 @@ class Notification(Base):
     __table_args__ = (
         Index("idx_n_id_user_status_created_at", "id_user", "status", "created_at"),
         Index("idx_n_related_table_related_id", "related_table", "related_id"),
+        Index("idx_n_created_at_id_notification", "created_at", "id_notification"),
+    )
+
+
+class NotificationArchive(Base):
+    """Notifikasi lama yang dipindahkan oleh job retensi (tanpa FK agar tidak ikut terkunci/terhapus)."""
+    __tablename__ = "notifications_archive"
+    id_notification = Column(CHAR(36), primary_key=True)
+    id_user = Column(CHAR(36), nullable=False)
+    title = Column(String(255), nullable=False)
+    body = Column(Text, nullable=False)
+    data_json = Column(Text)
+    related_table = Column(String(64))
+    related_id = Column(CHAR(36))
+    status = Column(Enum(NotificationStatus), nullable=False)
+    seen_at = Column(DateTime)
+    read_at = Column(DateTime)
+
+    created_at = Column(DateTime)
+    updated_at = Column(DateTime)
+    deleted_at = Column(DateTime)
+    archived_at = Column(DateTime, nullable=False, default=func.now())
+
+    __table_args__ = (
+        Index("idx_na_id_user_created_at", "id_user", "created_at"),
     )
 
 
@@ -0,0 +1,124 @@
+# app/db/pool_metrics.py
+from __future__ import annotations
+
+import os
+import time
+import threading
+from typing import Any, Dict
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+
+class PoolStats:
+    """Counter & statistik waktu tunggu untuk satu pool (per proses)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.wait_count = 0
+        self.wait_total_ms = 0.0
+        self.wait_max_ms = 0.0
+
+    def incr(self, name: str, by: int = 1) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + by)
+
+    def observe_wait(self, ms: float) -> None:
+        with self._lock:
+            self.wait_count += 1
+            self.wait_total_ms += ms
+            if ms > self.wait_max_ms:
+                self.wait_max_ms = ms
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "connects_total": self.connects,
+                "checkouts_total": self.checkouts,
+                "checkins_total": self.checkins,
+                "invalidations_total": self.invalidations,
+                "timeouts_total": self.timeouts,
+                "wait_count": self.wait_count,
+                "wait_avg_ms": round(self.wait_total_ms / self.wait_count, 3) if self.wait_count else 0.0,
+                "wait_max_ms": round(self.wait_max_ms, 3),
+            }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool yang mengukur lama menunggu koneksi dari pool.
+    SQLAlchemy tidak punya event 'sebelum checkout', jadi waktu tunggu diukur di _do_get.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def recreate(self):
+        # engine.dispose() mengganti pool dengan pool baru; counter tetap berlanjut
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            self.stats.incr("timeouts")
+            raise
+        finally:
+            self.stats.observe_wait((time.perf_counter() - started) * 1000.0)
+
+
+_pools: Dict[str, Any] = {}
+
+
+def attach_pool_metrics(engine, name: str) -> None:
+    """Pasang listener pool events ke engine dan daftarkan untuk /metrics."""
+    pool = engine.pool
+    stats = getattr(pool, "stats", None)
+    if stats is None:
+        stats = PoolStats()
+        pool.stats = stats
+
+    @event.listens_for(pool, "connect")
+    def _on_connect(dbapi_conn, conn_record):
+        stats.incr("connects")
+
+    @event.listens_for(pool, "checkout")
+    def _on_checkout(dbapi_conn, conn_record, conn_proxy):
+        stats.incr("checkouts")
+
+    @event.listens_for(pool, "checkin")
+    def _on_checkin(dbapi_conn, conn_record):
+        stats.incr("checkins")
+
+    @event.listens_for(pool, "invalidate")
+    def _on_invalidate(dbapi_conn, conn_record, exception):
+        stats.incr("invalidations")
+
+    # Simpan engine, bukan pool: setelah dispose() engine.pool adalah objek baru
+    _pools[name] = engine
+
+
+def pool_metrics_snapshot() -> Dict[str, Any]:
+    out: Dict[str, Any] = {"pid": os.getpid(), "pools": {}}
+    for name, engine in _pools.items():
+        pool = engine.pool
+        gauges: Dict[str, Any] = {}
+        if isinstance(pool, QueuePool):
+            gauges = {
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": max(0, pool.overflow()),
+            }
+        out["pools"][name] = {**gauges, **pool.stats.as_dict()}
+    return out
@@ -0,0 +1,163 @@
+# app/db/replicas.py
+from __future__ import annotations
+
+import time
+import logging
+import itertools
+import threading
+from typing import Any, Dict, List, Optional
+
+from flask import current_app
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import OperationalError
+
+logger = logging.getLogger(__name__)
+
+
+class ReplicaSet:
+    """
+    Kumpulan engine read-replica dengan pemilihan round-robin.
+
+    Replica yang gagal (error koneksi saat query, atau probe `SELECT 1` gagal)
+    ditandai down selama `cooldown` detik. Setelah cooldown habis replica diprobe
+    sekali sebelum dipakai lagi. Bila semua down, pemanggil memakai primary.
+    """
+
+    def __init__(self, engines: List[Any], cooldown: float = 30.0):
+        self.engines = engines
+        self.cooldown = float(cooldown)
+        self._rr = itertools.count()
+        self._down_until: Dict[int, float] = {}
+        self._lock = threading.Lock()
+
+    def mark_down(self, idx: int, reason: Any = None) -> None:
+        with self._lock:
+            if idx not in self._down_until:
+                logger.warning("Read replica #%s ditandai down: %s", idx, reason)
+            self._down_until[idx] = time.monotonic() + self.cooldown
+
+    def _probe(self, idx: int) -> bool:
+        try:
+            with self.engines[idx].connect() as conn:
+                conn.execute(text("SELECT 1"))
+        except Exception as e:
+            self.mark_down(idx, e)
+            return False
+        with self._lock:
+            self._down_until.pop(idx, None)
+        logger.info("Read replica #%s kembali sehat", idx)
+        return True
+
+    def choose(self) -> Optional[Any]:
+        n = len(self.engines)
+        if not n:
+            return None
+        start = next(self._rr)
+        now = time.monotonic()
+        for i in range(n):
+            idx = (start + i) % n
+            with self._lock:
+                until = self._down_until.get(idx)
+            if until is None:
+                return self.engines[idx]
+            if now >= until and self._probe(idx):
+                return self.engines[idx]
+        return None
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    "replica": idx,
+                    "healthy": idx not in self._down_until,
+                    "retry_in_seconds": (
+                        max(0.0, round(self._down_until[idx] - now, 1)) if idx in self._down_until else None
+                    ),
+                }
+                for idx in range(len(self.engines))
+            ]
+
+
+_replicas: Optional[ReplicaSet] = None
+_replicas_lock = threading.Lock()
+
+
+def get_replica_set() -> ReplicaSet:
+    global _replicas
+    if _replicas is None:
+        with _replicas_lock:
+            if _replicas is None:
+                from . import _engine_options
+                from .pool_metrics import attach_pool_metrics
+                from .request_scope import attach_request_stats
+
+                cfg = current_app.config
+                urls = cfg.get("DATABASE_REPLICA_URLS") or ()
+                rs = ReplicaSet([], cooldown=float(cfg.get("DB_REPLICA_COOLDOWN", 30)))
+                for idx, url in enumerate(urls):
+                    engine = create_engine(url, **_engine_options(cfg))
+                    attach_pool_metrics(engine, f"replica-{idx}")
+                    attach_request_stats(engine)
+                    _watch_errors(rs, idx, engine)
+                    rs.engines.append(engine)
+                _replicas = rs
+    return _replicas
+
+
+def _watch_errors(rs: ReplicaSet, idx: int, engine) -> None:
+    @event.listens_for(engine, "handle_error")
+    def _on_error(ctx):
+        # Hanya error koneksi/server; error SQL biasa bukan tanda replica sakit
+        if ctx.is_disconnect or isinstance(ctx.sqlalchemy_exception, OperationalError):
+            rs.mark_down(idx, ctx.original_exception)
+
+
+# -------------------------
+# Read-your-writes
+# -------------------------
+def _ryw_key(user_id: str) -> str:
+    return f"db:ryw:{user_id}"
+
+
+def mark_user_write(user_id: Optional[str]) -> None:
+    """
+    Tandai user baru saja menulis. Selama DB_READ_YOUR_WRITES_SECONDS berikutnya,
+    sesi readonly untuk user ini diarahkan ke primary agar tidak membaca data basi dari replica.
+    """
+    window = int(current_app.config.get("DB_READ_YOUR_WRITES_SECONDS", 0))
+    if not user_id or window <= 0 or not current_app.config.get("DATABASE_REPLICA_URLS"):
+        return
+    try:
+        from ..extensions import get_redis
+        get_redis().set(_ryw_key(user_id), "1", ex=window)
+    except Exception as e:
+        logger.warning("Gagal menandai read-your-writes user %s: %s", user_id, e)
+
+
+def recently_wrote(user_id: Optional[str]) -> bool:
+    window = int(current_app.config.get("DB_READ_YOUR_WRITES_SECONDS", 0))
+    if not user_id or window <= 0:
+        return False
+    try:
+        from ..extensions import get_redis
+        return bool(get_redis().exists(_ryw_key(user_id)))
+    except Exception as e:
+        # Tidak bisa memastikan -> aman ke primary
+        logger.warning("Gagal cek read-your-writes user %s: %s", user_id, e)
+        return True
+
+
+def pick_read_engine(user_id: Optional[str] = None):
+    """Engine untuk sesi readonly, atau None bila harus memakai primary."""
+    if not current_app.config.get("DATABASE_REPLICA_URLS"):
+        return None
+    if recently_wrote(user_id):
+        return None
+    return get_replica_set().choose()
+
+
+def replicas_snapshot() -> List[Dict[str, Any]]:
+    if not current_app.config.get("DATABASE_REPLICA_URLS"):
+        return []
+    return get_replica_set().snapshot()
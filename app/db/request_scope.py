@@ -0,0 +1,208 @@
+# app/db/request_scope.py
+from __future__ import annotations
+
+import threading
+from contextlib import contextmanager
+from datetime import date
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from flask import Flask, g, has_app_context, has_request_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+_MISSING = object()
+
+
+# -------------------------
+# Session per app context
+# -------------------------
+def current_session() -> Session:
+    """
+    Session bersama untuk app context aktif: satu request HTTP, atau satu task Celery
+    (FlaskContextTask menjalankan tiap task di app_context sendiri).
+    Ditutup otomatis oleh teardown_appcontext.
+    """
+    s = g.get("_db_session")
+    if s is None:
+        from . import get_session
+        s = get_session()
+        g._db_session = s
+    return s
+
+
+def current_read_session(user_id: Optional[str] = None) -> Session:
+    """
+    Session readonly (replica) untuk app context aktif. Bila request ini sudah memakai
+    session primary, session itu yang dipakai agar tetap konsisten dengan tulisannya sendiri.
+    """
+    s = g.get("_db_session")
+    if s is not None:
+        return s
+    s = g.get("_db_read_session")
+    if s is None:
+        from . import get_session
+        s = get_session(readonly=True, user_id=user_id)
+        g._db_read_session = s
+    return s
+
+
+@contextmanager
+def request_session(readonly: bool = False, user_id: Optional[str] = None) -> Iterator[Session]:
+    """
+    Pengganti `with get_session() as s` yang TIDAK menutup session di akhir blok,
+    sehingga helper lain dalam request/task yang sama memakai identity map yang sama.
+    readonly=True hanya untuk endpoint baca: diarahkan ke read replica bila tersedia.
+    """
+    s = current_read_session(user_id) if readonly else current_session()
+    try:
+        yield s
+    except Exception:
+        s.rollback()
+        raise
+
+
+def remove_request_session(exc: Optional[BaseException] = None) -> None:
+    g.pop("_db_memo", None)
+    for key in ("_db_session", "_db_read_session"):
+        s = g.pop(key, None)
+        if s is None:
+            continue
+        try:
+            if exc is not None:
+                s.rollback()
+        finally:
+            s.close()
+    _record_scope_stats()
+
+
+# -------------------------
+# Memo per request
+# -------------------------
+def _lookup_session() -> Session:
+    # Pakai session yang sudah dibuka request ini (primary diutamakan), baru buka primary
+    return g.get("_db_session") or g.get("_db_read_session") or current_session()
+
+
+def memo(key: tuple, loader: Callable[[], Any]) -> Any:
+    """
+    Cache kecil per app context untuk lookup entity (termasuk hasil None,
+    yang tidak disimpan oleh identity map sehingga s.get() akan SELECT ulang).
+    """
+    cache: Dict[tuple, Any] = g.setdefault("_db_memo", {})
+    stats = _scope_stats()
+    val = cache.get(key, _MISSING)
+    if val is not _MISSING:
+        stats["memo_hits"] += 1
+        return val
+    stats["memo_misses"] += 1
+    val = loader()
+    cache[key] = val
+    return val
+
+
+def memo_forget(*key_prefix: Any) -> None:
+    """Buang entri memo yang diawali key_prefix (panggil setelah menulis entity terkait)."""
+    cache = g.get("_db_memo")
+    if not cache:
+        return
+    n = len(key_prefix)
+    for k in [k for k in cache if k[:n] == key_prefix]:
+        cache.pop(k, None)
+
+
+def get_user(user_id: str):
+    """User ringkas (lihat loading.USER_BRIEF); relationship tidak di-load."""
+    from .models import User
+    from .loading import USER_BRIEF
+    return memo(("user", user_id), lambda: _lookup_session().get(User, user_id, options=USER_BRIEF))
+
+
+def get_location(loc_id: str):
+    from .models import Location
+    from .loading import LOCATION_GEO
+    return memo(("location", loc_id), lambda: _lookup_session().get(Location, loc_id, options=LOCATION_GEO))
+
+
+def get_absensi_today(user_id: str, today: date):
+    from .models import Absensi
+    from .loading import ABSENSI_TODAY
+
+    def _load():
+        return (
+            _lookup_session()
+            .query(Absensi)
+            .options(*ABSENSI_TODAY)
+            .filter(Absensi.id_user == user_id, Absensi.tanggal == today)
+            .one_or_none()
+        )
+
+    return memo(("absensi", user_id, today), _load)
+
+
+# -------------------------
+# Statistik per request/task
+# -------------------------
+_totals_lock = threading.Lock()
+_totals: Dict[str, Dict[str, int]] = {}
+_COUNTERS = ("checkouts", "statements", "selects", "db_time_ms", "nplus1_warnings", "memo_hits", "memo_misses")
+
+
+def _scope_stats() -> Dict[str, Any]:
+    stats = g.get("_db_stats")
+    if stats is None:
+        stats = {k: 0 for k in _COUNTERS}
+        stats["kind"] = "request" if has_request_context() else "task"
+        g._db_stats = stats
+    return stats
+
+
+def _record_scope_stats() -> None:
+    stats = g.pop("_db_stats", None)
+    if not stats:
+        return
+    from .instrumentation import log_scope_summary
+    log_scope_summary(stats)
+    kind = stats.pop("kind")
+    with _totals_lock:
+        agg = _totals.setdefault(kind, {"scopes": 0, **{k: 0 for k in _COUNTERS}})
+        agg["scopes"] += 1
+        for k in _COUNTERS:
+            agg[k] += stats[k]
+
+
+def current_scope_stats() -> Dict[str, Any]:
+    """Counter DB untuk request/task yang sedang berjalan (untuk log/debug)."""
+    return dict(_scope_stats()) if has_app_context() else {}
+
+
+def request_stats_snapshot() -> Dict[str, Any]:
+    out: Dict[str, Any] = {}
+    with _totals_lock:
+        for kind, agg in _totals.items():
+            n = agg["scopes"] or 1
+            out[kind] = {
+                **agg,
+                "db_time_ms": round(agg["db_time_ms"], 3),
+                "avg_checkouts": round(agg["checkouts"] / n, 3),
+                "avg_selects": round(agg["selects"] / n, 3),
+                "avg_db_time_ms": round(agg["db_time_ms"] / n, 3),
+            }
+    return out
+
+
+def attach_request_stats(engine) -> None:
+    """Hitung checkout koneksi ke counter app context aktif (statement & waktu: db/instrumentation.py)."""
+    from .instrumentation import attach_instrumentation
+
+    @event.listens_for(engine.pool, "checkout")
+    def _on_checkout(dbapi_conn, conn_record, conn_proxy):
+        if has_app_context():
+            _scope_stats()["checkouts"] += 1
+
+    attach_instrumentation(engine)
+
+
+def init_request_scope(app: Flask) -> None:
+    from .instrumentation import add_db_headers
+    app.after_request(add_db_headers)
+    app.teardown_appcontext(remove_request_session)
@@ -11,8 +11,10 @@ from insightface.app import FaceAnalysis
 from flask import Flask, current_app
 from flask_cors import CORS
 from celery import Celery, Task
+from celery.schedules import crontab
 
 from supabase import create_client, Client
+import redis
 import firebase_admin
 from firebase_admin import credentials
 
@@ -25,6 +27,8 @@ celery: Celery = Celery(__name__)
 _face_engine: Optional[FaceAnalysis] = None # <-- Kita hanya akan pakai variabel ini
 _supabase: Optional[Client] = None
 _firebase_app: Optional[firebase_admin.App] = None
+_redis: Optional[redis.Redis] = None
+_redis_pid: Optional[int] = None
 log = logging.getLogger(__name__)
 
 # -------------------------
@@ -47,6 +51,8 @@ class FlaskContextTask(Task):
 
         if app_obj is not None:
             with app_obj.app_context():
+                from flask import g
+                g.unit_of_work = self.name  # label log instrumentasi DB
                 return self.run(*args, **kwargs)
         return self.run(*args, **kwargs)
 
@@ -66,6 +72,51 @@ def init_celery(app: Flask) -> None:
         enable_utc=False,
     )
 
+    # Jadwal celery beat (jalankan: celery -A celery_worker:app beat)
+    celery.conf.beat_schedule = {
+        "notifications-retention": {
+            "task": "notifications.retention",
+            "schedule": crontab(
+                hour=int(app.config.get("NOTIF_RETENTION_HOUR", 2)),
+                minute=int(app.config.get("NOTIF_RETENTION_MINUTE", 15)),
+            ),
+        },
+        "roster-refresh": {
+            "task": "roster.refresh",
+            "schedule": crontab(
+                hour=int(app.config.get("ROSTER_REFRESH_HOUR", 0)),
+                minute=int(app.config.get("ROSTER_REFRESH_MINUTE", 5)),
+            ),
+        },
+        "attendance-summary-rebuild": {
+            "task": "absensi.rebuild_monthly_summary",
+            "schedule": crontab(
+                hour=int(app.config.get("SUMMARY_REBUILD_HOUR", 1)),
+                minute=int(app.config.get("SUMMARY_REBUILD_MINUTE", 30)),
+            ),
+        },
+        "presence-reconcile": {
+            "task": "presence.reconcile",
+            "schedule": crontab(minute=f"*/{int(app.config.get('PRESENCE_RECONCILE_MINUTES', 10))}"),
+        },
+        "lampiran-cleanup": {
+            "task": "lampiran.cleanup_pending",
+            "schedule": crontab(minute=f"*/{int(app.config.get('CATATAN_UPLOAD_CLEANUP_MINUTES', 30))}"),
+        },
+        "face-baseline-prune": {
+            "task": "tasks.prune_face_baselines_task",
+            "schedule": crontab(
+                hour=int(app.config.get("FACE_BASELINE_PRUNE_HOUR", 4)),
+                minute=int(app.config.get("FACE_BASELINE_PRUNE_MINUTE", 0)),
+            ),
+        },
+        "attendance-archive": {
+            "task": "absensi.archive_closed_months",
+            # Awal bulan dini hari; bila belum selesai, dilanjutkan hari berikutnya
+            "schedule": crontab(hour=3, minute=0, day_of_month="1-3"),
+        },
+    }
+
     celery.Task = FlaskContextTask
     FlaskContextTask.flask_app = app
 
@@ -143,6 +194,28 @@ def get_supabase() -> Optional[Client]:
     return _supabase
 
 
+# -------------------------
+# Redis (state aplikasi; terpisah dari koneksi broker Celery)
+# -------------------------
+def get_redis() -> redis.Redis:
+    """
+    Client Redis per proses. Connection pool redis-py tidak aman dibawa melewati fork
+    (worker gunicorn/celery prefork), jadi dibuat ulang bila PID berubah.
+    """
+    global _redis, _redis_pid
+    if _redis is None or _redis_pid != os.getpid():
+        cfg = current_app.config
+        url = cfg.get("REDIS_URL") or cfg.get("CELERY_BROKER_URL")
+        _redis = redis.Redis.from_url(
+            url,
+            decode_responses=True,
+            socket_timeout=float(cfg.get("REDIS_SOCKET_TIMEOUT", 1.0)),
+            socket_connect_timeout=float(cfg.get("REDIS_SOCKET_TIMEOUT", 1.0)),
+        )
+        _redis_pid = os.getpid()
+    return _redis
+
+
 # -------------------------
 # Firebase Admin
 # -------------------------
@@ -0,0 +1,112 @@
+# app/services/attendance_archive.py
+"""
+Rotasi data absensi: pindahkan bulan yang sudah tutup dari Absensi/istirahat/catatan/
+absensi_report_recipients ke tabel *_archive (lihat app/db/archive.py).
+
+Tabel panas hanya berisi bulan berjalan + ATTENDANCE_HOT_MONTHS bulan sebelumnya, sehingga
+index untuk lookup "hari ini" (idx_abs_id_user_tanggal, uq_absensi_user_tanggal, ...) tetap
+berukuran konstan. Query di routes/tasks tidak berubah karena hanya menyentuh data terkini.
+"""
+from __future__ import annotations
+
+import time
+import logging
+from datetime import date
+from typing import Any, Dict
+
+from sqlalchemy import delete, func, insert, select, update
+
+from ..db.archive import CHILD_ARCHIVES, absensi_archive, agenda_absensi_archive
+from ..db.models import Absensi, AgendaKerja
+
+logger = logging.getLogger(__name__)
+
+
+def hot_window_start(today: date, hot_months: int) -> date:
+    """Tanggal 1 dari bulan tertua yang tetap di tabel panas."""
+    months = today.year * 12 + (today.month - 1) - max(0, int(hot_months))
+    return date(months // 12, months % 12 + 1, 1)
+
+
+def _copy(s, source, target, where) -> int:
+    cols = [c.name for c in source.columns]
+    src = select(*[source.c[c] for c in cols], func.now()).where(where)
+    return s.execute(insert(target).from_select([*cols, "archived_at"], src)).rowcount
+
+
+def archive_before(
+    s,
+    before: date,
+    chunk_size: int = 500,
+    max_seconds: float = 300.0,
+    pause: float = 0.05,
+    dry_run: bool = False,
+) -> Dict[str, Any]:
+    """
+    Pindahkan semua Absensi dengan tanggal < `before` (beserta anak-anaknya) ke arsip.
+    Per chunk id_absensi (urut primary key), satu transaksi pendek:
+      1. salin catatan / recipients / istirahat ke arsip, simpan tautan agenda_kerja
+      2. salin Absensi ke arsip
+      3. lepas tautan agenda_kerja, hapus anak lalu Absensi dari tabel panas
+    """
+    a = Absensi.__table__
+    started = time.monotonic()
+    last_id = ""
+    totals: Dict[str, int] = {"Absensi": 0}
+    chunks = 0
+    completed = False
+
+    if dry_run:
+        n = s.execute(select(func.count()).select_from(a).where(a.c.tanggal < before)).scalar_one()
+        return {"before": before.isoformat(), "dry_run": True, "Absensi": int(n)}
+
+    while time.monotonic() - started < max_seconds:
+        ids = list(
+            s.execute(
+                select(a.c.id_absensi)
+                .where(a.c.id_absensi > last_id, a.c.tanggal < before)
+                .order_by(a.c.id_absensi)
+                .limit(chunk_size)
+            ).scalars()
+        )
+        if not ids:
+            completed = True
+            break
+
+        for source, target in CHILD_ARCHIVES:
+            n = _copy(s, source, target, source.c.id_absensi.in_(ids))
+            totals[source.name] = totals.get(source.name, 0) + n
+
+        ag = AgendaKerja.__table__
+        s.execute(
+            insert(agenda_absensi_archive)
+            .from_select(
+                ["id_agenda_kerja", "id_absensi", "archived_at"],
+                select(ag.c.id_agenda_kerja, ag.c.id_absensi, func.now()).where(ag.c.id_absensi.in_(ids)),
+            )
+        )
+        totals["Absensi"] += _copy(s, a, absensi_archive, a.c.id_absensi.in_(ids))
+
+        s.execute(update(ag).where(ag.c.id_absensi.in_(ids)).values(id_absensi=None))
+        for source, _target in CHILD_ARCHIVES:
+            s.execute(delete(source).where(source.c.id_absensi.in_(ids)))
+        s.execute(delete(a).where(a.c.id_absensi.in_(ids)))
+        s.commit()
+
+        chunks += 1
+        last_id = ids[-1]
+        if pause:
+            time.sleep(pause)
+
+    elapsed = time.monotonic() - started
+    report = {
+        "before": before.isoformat(),
+        "chunks": chunks,
+        "rows": totals,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(totals["Absensi"] / elapsed, 1) if elapsed > 0 else None,
+        "completed": completed,
+    }
+    logger.info("[attendance.archive] %s", report)
+    return report
+
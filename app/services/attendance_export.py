@@ -0,0 +1,228 @@
+# app/services/attendance_export.py
+"""
+Export absensi per rentang tanggal sebagai stream (CSV, atau Parquet bila pyarrow terpasang).
+
+Satu SELECT Core per sumber (tabel arsip untuk bulan lama, lalu tabel panas) dengan
+stream_results (server-side cursor PyMySQL) + yield_per: baris diambil per batch dan langsung
+ditulis ke respons, jadi memori konstan berapa pun panjang rentangnya. Jumlah istirahat/catatan
+dihitung dengan subquery terkorelasi (index id_absensi), tanpa memuat relationship ORM.
+"""
+from __future__ import annotations
+
+import io
+import csv
+from datetime import date
+from typing import Any, Iterator, List, Tuple
+
+from sqlalchemy import and_, func, literal, literal_column, select
+from sqlalchemy.orm import aliased
+
+from ..db import get_engine
+from ..db.archive import absensi_archive, catatan_archive, istirahat_archive
+from ..db.models import Absensi, Catatan, Departement, Istirahat, Location, User
+from ..db.replicas import pick_read_engine
+
+# (nama kolom, tipe untuk skema Parquet)
+COLUMNS: List[Tuple[str, str]] = [
+    ("id_absensi", "string"),
+    ("id_user", "string"),
+    ("nama_pengguna", "string"),
+    ("departement", "string"),
+    ("tanggal", "date"),
+    ("jam_masuk", "timestamp"),
+    ("jam_pulang", "timestamp"),
+    ("status_masuk", "string"),
+    ("status_pulang", "string"),
+    ("lokasi_datang", "string"),
+    ("lokasi_pulang", "string"),
+    ("in_latitude", "float"),
+    ("in_longitude", "float"),
+    ("out_latitude", "float"),
+    ("out_longitude", "float"),
+    ("jumlah_istirahat", "int"),
+    ("total_istirahat_detik", "int"),
+    ("jumlah_catatan", "int"),
+    ("arsip", "bool"),
+]
+
+_FLOAT_COLS = {name for name, kind in COLUMNS if kind == "float"}
+
+
+def _query(absensi_t, istirahat_t, catatan_t, start: date, end: date, archived: bool):
+    a = absensi_t
+    loc_in = aliased(Location)
+    loc_out = aliased(Location)
+    u = User.__table__
+    d = Departement.__table__
+
+    n_break = (
+        select(func.count())
+        .where(istirahat_t.c.id_absensi == a.c.id_absensi)
+        .scalar_subquery()
+    )
+    break_seconds = (
+        select(
+            func.coalesce(
+                func.sum(
+                    func.timestampdiff(
+                        literal_column("SECOND"), istirahat_t.c.start_istirahat, istirahat_t.c.end_istirahat
+                    )
+                ),
+                0,
+            )
+        )
+        .where(istirahat_t.c.id_absensi == a.c.id_absensi, istirahat_t.c.end_istirahat.isnot(None))
+        .scalar_subquery()
+    )
+    n_catatan = (
+        select(func.count())
+        .where(catatan_t.c.id_absensi == a.c.id_absensi)
+        .scalar_subquery()
+    )
+
+    return (
+        select(
+            a.c.id_absensi,
+            a.c.id_user,
+            u.c.nama_pengguna,
+            d.c.nama_departement.label("departement"),
+            a.c.tanggal,
+            a.c.jam_masuk,
+            a.c.jam_pulang,
+            a.c.status_masuk,
+            a.c.status_pulang,
+            loc_in.nama_kantor.label("lokasi_datang"),
+            loc_out.nama_kantor.label("lokasi_pulang"),
+            a.c.in_latitude,
+            a.c.in_longitude,
+            a.c.out_latitude,
+            a.c.out_longitude,
+            n_break.label("jumlah_istirahat"),
+            break_seconds.label("total_istirahat_detik"),
+            n_catatan.label("jumlah_catatan"),
+            literal(archived).label("arsip"),
+        )
+        .select_from(a)
+        .join(u, u.c.id_user == a.c.id_user)
+        .outerjoin(d, d.c.id_departement == u.c.id_departement)
+        .outerjoin(loc_in, loc_in.id_location == a.c.id_lokasi_datang)
+        .outerjoin(loc_out, loc_out.id_location == a.c.id_lokasi_pulang)
+        .where(and_(a.c.tanggal >= start, a.c.tanggal <= end, a.c.deleted_at.is_(None)))
+        .order_by(a.c.tanggal, a.c.id_absensi)
+    )
+
+
+def _row(r) -> dict:
+    row = dict(r._mapping)
+    for k in ("status_masuk", "status_pulang"):
+        if row[k] is not None:
+            row[k] = row[k].value
+    for k in _FLOAT_COLS:
+        if row[k] is not None:
+            row[k] = float(row[k])
+    for k in ("jumlah_istirahat", "total_istirahat_detik", "jumlah_catatan"):
+        row[k] = int(row[k] or 0)
+    row["arsip"] = bool(row["arsip"])
+    return row
+
+
+def iter_batches(start: date, end: date, batch_size: int = 1000) -> Iterator[List[dict]]:
+    """
+    Batch baris export. Selalu membaca tabel arsip juga: index (tanggal) di kedua tabel
+    (idx_abs_tanggal, dipasang scripts/ensure_schema.py pada tabel inti) membuat rentang yang
+    belum dirotasi cukup satu index probe kosong, dan hasil tetap benar berapa pun posisi
+    jendela panas saat ini. Memakai read replica bila tersedia.
+    """
+    sources = (
+        (absensi_archive, istirahat_archive, catatan_archive, True),
+        (Absensi.__table__, Istirahat.__table__, Catatan.__table__, False),
+    )
+    engine = pick_read_engine() or get_engine()
+    with engine.connect() as conn:
+        conn = conn.execution_options(stream_results=True, yield_per=batch_size)
+        for absensi_t, istirahat_t, catatan_t, archived in sources:
+            result = conn.execute(_query(absensi_t, istirahat_t, catatan_t, start, end, archived))
+            for part in result.partitions():
+                yield [_row(r) for r in part]
+
+
+def _csv_value(v: Any) -> Any:
+    if v is None:
+        return ""
+    if hasattr(v, "isoformat"):
+        return v.isoformat()
+    return v
+
+
+def stream_csv(start: date, end: date, batch_size: int = 1000) -> Iterator[str]:
+    names = [name for name, _ in COLUMNS]
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    w.writerow(names)
+    yield buf.getvalue()
+    for batch in iter_batches(start, end, batch_size):
+        buf.seek(0)
+        buf.truncate()
+        for row in batch:
+            w.writerow([_csv_value(row[n]) for n in names])
+        yield buf.getvalue()
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow.parquet  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class _ChunkSink(io.RawIOBase):
+    """File tujuan ParquetWriter: menampung byte sampai di-drain, tell() tetap kumulatif."""
+
+    def __init__(self):
+        super().__init__()
+        self._buf = bytearray()
+        self._pos = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._buf += b
+        self._pos += len(b)
+        return len(b)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def drain(self) -> bytes:
+        out = bytes(self._buf)
+        self._buf.clear()
+        return out
+
+
+def stream_parquet(start: date, end: date, batch_size: int = 1000) -> Iterator[bytes]:
+    """Satu row group per batch; tiap row group dikirim begitu selesai ditulis."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {
+        "string": pa.string(),
+        "date": pa.date32(),
+        "timestamp": pa.timestamp("s"),
+        "float": pa.float64(),
+        "int": pa.int64(),
+        "bool": pa.bool_(),
+    }
+    schema = pa.schema([(name, types[kind]) for name, kind in COLUMNS])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema)
+    try:
+        for batch in iter_batches(start, end, batch_size):
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
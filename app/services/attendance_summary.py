@@ -0,0 +1,201 @@
+# app/services/attendance_summary.py
+"""
+Rekap absensi bulanan per karyawan (tabel rekap_absensi_bulanan, kunci id_user+tahun+bulan).
+
+- Inkremental: checkout menambah hari_hadir/terlambat/pulang_cepat/total_kerja_detik, akhir
+  istirahat menambah total_istirahat_detik. Satu INSERT .. ON DUPLICATE KEY UPDATE di transaksi
+  yang sama dengan perubahan absensinya, jadi rekap ikut commit/rollback.
+- Rebuild: satu bulan dihitung ulang dari data mentah (tabel panas + arsip) dengan numpy.
+  Data mentah dan rekap lama dibaca dalam satu snapshot REPEATABLE READ, lalu yang ditulis
+  adalah selisihnya (kolom = kolom + (hasil rebuild - rekap di snapshot)). Increment dari
+  checkout yang commit setelah snapshot tidak ada di kedua sisi, jadi tetap terjaga.
+  Dipakai job harian untuk mengoreksi drift (mis. data yang diubah langsung di DB) dan
+  untuk bulan yang belum pernah direkap.
+
+Definisi (sama di kedua jalur):
+- hadir = absensi yang sudah checkout; terlambat = status_masuk 'terlambat' di antaranya
+- total_kerja_detik = jam_pulang - jam_masuk
+- pulang_cepat = jam_pulang lebih awal dari jam_selesai pola kerja roster hari itu
+- total_istirahat_detik = durasi istirahat yang sudah selesai, menurut tanggal_istirahat
+"""
+from __future__ import annotations
+
+import logging
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, Optional
+
+import numpy as np
+from sqlalchemy import func, literal_column, select, union_all, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+
+from ..db.archive import absensi_archive, istirahat_archive
+from ..db.models import Absensi, AbsensiStatus, Istirahat, RekapAbsensiBulanan
+from ..utils.timez import now_local
+from .roster import resolve_from_db
+
+logger = logging.getLogger(__name__)
+
+_FIELDS = (
+    "hari_hadir",
+    "jumlah_terlambat",
+    "jumlah_pulang_cepat",
+    "total_kerja_detik",
+    "total_istirahat_detik",
+)
+
+
+def is_early_leave(jam_pulang: datetime, jam_selesai: Optional[time]) -> bool:
+    return jam_selesai is not None and jam_pulang.time() < jam_selesai
+
+
+def add_to_summary(s, user_id: str, day: date, **delta: int) -> None:
+    """Tambah delta ke rekap bulan `day`. Panggil SEBELUM commit perubahan absensinya."""
+    values = {k: int(v) for k, v in delta.items() if v}
+    if not values:
+        return
+    unknown = set(values) - set(_FIELDS)
+    if unknown:
+        raise ValueError(f"Kolom rekap tidak dikenal: {sorted(unknown)}")
+
+    t = RekapAbsensiBulanan.__table__
+    stmt = mysql_insert(t).values(id_user=user_id, tahun=day.year, bulan=day.month, **values)
+    stmt = stmt.on_duplicate_key_update(
+        **{k: t.c[k] + stmt.inserted[k] for k in values},
+        updated_at=func.now(),
+    )
+    s.execute(stmt)
+
+
+def get_summary(s, user_id: str, tahun: int, bulan: int) -> Dict[str, Any]:
+    row = s.get(RekapAbsensiBulanan, (user_id, tahun, bulan))
+    data: Dict[str, Any] = {"id_user": user_id, "tahun": tahun, "bulan": bulan}
+    for f in _FIELDS:
+        data[f] = int(getattr(row, f)) if row is not None else 0
+    data["rebuilt_at"] = row.rebuilt_at.isoformat() if row is not None and row.rebuilt_at else None
+    return data
+
+
+def _seconds_of_day(t: Optional[time]) -> int:
+    return -1 if t is None else t.hour * 3600 + t.minute * 60 + t.second
+
+
+def _month_bounds(tahun: int, bulan: int) -> tuple[date, date]:
+    first = date(tahun, bulan, 1)
+    nxt = date(tahun + (bulan == 12), bulan % 12 + 1, 1)
+    return first, nxt - timedelta(days=1)
+
+
+def _checkouts(s, first: date, last: date):
+    parts = [
+        select(t.c.id_user, t.c.tanggal, t.c.jam_masuk, t.c.jam_pulang, t.c.status_masuk).where(
+            t.c.tanggal >= first,
+            t.c.tanggal <= last,
+            t.c.jam_masuk.isnot(None),
+            t.c.jam_pulang.isnot(None),
+            t.c.deleted_at.is_(None),
+        )
+        for t in (Absensi.__table__, absensi_archive)
+    ]
+    return s.execute(union_all(*parts)).all()
+
+
+def _break_seconds(s, first: date, last: date) -> Dict[str, int]:
+    parts = [
+        select(
+            t.c.id_user,
+            func.timestampdiff(literal_column("SECOND"), t.c.start_istirahat, t.c.end_istirahat).label("detik"),
+        ).where(
+            t.c.tanggal_istirahat >= first,
+            t.c.tanggal_istirahat <= last,
+            t.c.end_istirahat.isnot(None),
+        )
+        for t in (Istirahat.__table__, istirahat_archive)
+    ]
+    u = union_all(*parts).subquery()
+    rows = s.execute(select(u.c.id_user, func.sum(u.c.detik)).group_by(u.c.id_user)).all()
+    return {uid: int(total or 0) for uid, total in rows}
+
+
+def _current(s, tahun: int, bulan: int) -> Dict[str, Dict[str, int]]:
+    t = RekapAbsensiBulanan.__table__
+    rows = s.execute(
+        select(t.c.id_user, *[t.c[f] for f in _FIELDS]).where(t.c.tahun == tahun, t.c.bulan == bulan)
+    ).all()
+    return {r.id_user: {f: int(getattr(r, f) or 0) for f in _FIELDS} for r in rows}
+
+
+def rebuild_month(s, tahun: int, bulan: int) -> Dict[str, Any]:
+    first, last = _month_bounds(tahun, bulan)
+    # Semua baca di bawah ini harus dari snapshot yang sama (lihat docstring modul)
+    s.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+    current = _current(s, tahun, bulan)
+    rows = _checkouts(s, first, last)
+    breaks = _break_seconds(s, first, last)
+
+    users = np.array([r.id_user for r in rows], dtype=object)
+    uniq, inv = np.unique(users, return_inverse=True)
+    masuk = np.array([r.jam_masuk for r in rows], dtype="datetime64[s]")
+    pulang = np.array([r.jam_pulang for r in rows], dtype="datetime64[s]")
+    worked = np.clip((pulang - masuk).astype(np.int64), 0, None)
+    late = np.array([r.status_masuk == AbsensiStatus.terlambat for r in rows], dtype=bool)
+
+    # jam_selesai roster per (user, tanggal) -> detik sejak tengah malam, -1 bila tanpa shift
+    roster: Dict[date, Dict[str, Any]] = {}
+    for day in sorted({r.tanggal for r in rows}):
+        roster[day] = resolve_from_db(s, day)
+    selesai = np.array(
+        [_seconds_of_day((roster[r.tanggal].get(r.id_user) or {}).get("jam_selesai")) for r in rows],
+        dtype=np.int64,
+    )
+    pulang_sod = (pulang - pulang.astype("datetime64[D]")).astype(np.int64)
+    early = (selesai >= 0) & (pulang_sod < selesai)
+
+    n = len(uniq)
+    hadir = np.bincount(inv, minlength=n)
+    terlambat = np.bincount(inv, weights=late, minlength=n)
+    pulang_cepat = np.bincount(inv, weights=early, minlength=n)
+    kerja = np.bincount(inv, weights=worked, minlength=n)
+
+    out: Dict[str, Dict[str, int]] = {}
+    for i, uid in enumerate(uniq):
+        out[uid] = {
+            "hari_hadir": int(hadir[i]),
+            "jumlah_terlambat": int(terlambat[i]),
+            "jumlah_pulang_cepat": int(pulang_cepat[i]),
+            "total_kerja_detik": int(kerja[i]),
+            "total_istirahat_detik": 0,
+        }
+    for uid, detik in breaks.items():
+        out.setdefault(uid, dict.fromkeys(_FIELDS, 0))["total_istirahat_detik"] = detik
+
+    # Upsert selisih per user; user yang hilang dari hasil rebuild dikoreksi ke 0
+    now = now_local().replace(tzinfo=None)
+    t = RekapAbsensiBulanan.__table__
+    zeros = dict.fromkeys(_FIELDS, 0)
+    corrected = 0
+    for uid in set(out) | set(current):
+        target = out.get(uid, zeros)
+        base = current.get(uid, zeros)
+        delta = {f: target[f] - base[f] for f in _FIELDS}
+        if not any(delta.values()):
+            continue
+        stmt = mysql_insert(t).values(id_user=uid, tahun=tahun, bulan=bulan, rebuilt_at=now, **target)
+        stmt = stmt.on_duplicate_key_update(
+            **{f: t.c[f] + d for f, d in delta.items() if d},
+            rebuilt_at=now,
+            updated_at=func.now(),
+        )
+        s.execute(stmt)
+        corrected += 1
+    s.execute(update(t).where(t.c.tahun == tahun, t.c.bulan == bulan).values(rebuilt_at=now))
+    s.commit()
+
+    report = {
+        "tahun": tahun,
+        "bulan": bulan,
+        "users": len(out),
+        "corrected": corrected,
+        "absensi": len(rows),
+    }
+    logger.info("[attendance.summary] rebuild %s", report)
+    return report
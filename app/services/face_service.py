@@ -3,17 +3,20 @@
 from __future__ import annotations
 
 import io
+import re
 import time
 import logging
 from typing import List, Union
 
 import numpy as np
 import cv2
+from flask import current_app
 from werkzeug.datastructures import FileStorage
 
 from ..extensions import get_face_engine, celery
-from .storage.supabase_storage import upload_bytes, signed_url, download, list_objects
-from ..db import get_session
+from .storage.supabase_storage import upload_bytes, signed_url, download, list_objects, iter_objects, delete_objects
+from .storage.resilience import StorageUnavailable
+from ..db.request_scope import request_session
 from ..db.models import User
 from .notification_service import send_notification
 
@@ -71,16 +74,58 @@ def decode_image(file_or_bytes: Union[FileStorage, bytes, bytearray, np.ndarray]
     return img
 
 
-def get_embedding(img: np.ndarray) -> np.ndarray | None:
-    """Ambil embedding wajah pertama yang terdeteksi. Return None jika tidak ada wajah."""
+def _bbox_area(face) -> float:
+    if not hasattr(face, "bbox"):
+        return 0.0
+    x1, y1, x2, y2 = face.bbox[:4]
+    return float(max(0.0, x2 - x1) * max(0.0, y2 - y1))
+
+
+def _largest_face(img: np.ndarray):
+    """Deteksi wajah dan kembalikan yang terbesar (bbox = x1, y1, x2, y2). None jika tidak ada."""
     # Pastikan engine ada; lazy init akan berjalan bila belum ada.
     engine = get_face_engine()
     faces = engine.get(img)  # insightface.FaceAnalysis
     if not faces:
         return None
-    # Ambil wajah terbesar / yang pertama
-    face = max(faces, key=lambda f: f.bbox[2] * f.bbox[3] if hasattr(f, "bbox") else 0)
-    return face.embedding
+    return max(faces, key=_bbox_area)
+
+
+def get_embedding(img: np.ndarray) -> np.ndarray | None:
+    """Ambil embedding wajah terbesar yang terdeteksi. Return None jika tidak ada wajah."""
+    face = _largest_face(img)
+    return None if face is None else face.embedding
+
+
+def _crop_face(img: np.ndarray, bbox, margin: float, max_side: int) -> np.ndarray:
+    """
+    Potong area wajah + margin (persegi, berpusat di wajah), lalu perkecil
+    sehingga sisi terpanjang <= max_side. Tidak pernah memperbesar.
+    """
+    h, w = img.shape[:2]
+    x1, y1, x2, y2 = [float(v) for v in bbox[:4]]
+    cx, cy = (x1 + x2) / 2.0, (y1 + y2) / 2.0
+    half = max(x2 - x1, y2 - y1) * (1.0 + 2.0 * margin) / 2.0
+    left, top = max(0, int(cx - half)), max(0, int(cy - half))
+    right, bottom = min(w, int(cx + half)), min(h, int(cy + half))
+    crop = img[top:bottom, left:right] if right > left and bottom > top else img
+    return _fit(crop, max_side)
+
+
+def _fit(img: np.ndarray, max_side: int) -> np.ndarray:
+    h, w = img.shape[:2]
+    longest = max(h, w)
+    if max_side <= 0 or longest <= max_side:
+        return img
+    scale = max_side / float(longest)
+    return cv2.resize(img, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+
+
+def _encode_jpeg(img: np.ndarray, quality: int) -> bytes | None:
+    ok, buf = cv2.imencode(
+        ".jpg", img, [int(cv2.IMWRITE_JPEG_QUALITY), int(quality), int(cv2.IMWRITE_JPEG_OPTIMIZE), 1]
+    )
+    return buf.tobytes() if ok else None
 
 
 def _user_root(user_id: str) -> str:
@@ -98,32 +143,46 @@ def enroll_user_task(user_id: str, user_name: str, images_data: List[bytes]):
     """
     logger.info(f"Memulai proses enroll wajah untuk user_id: {user_id}")
 
+    cfg = current_app.config
+    max_side = int(cfg.get("FACE_BASELINE_MAX_SIDE", 640))
+    quality = int(cfg.get("FACE_BASELINE_JPEG_QUALITY", 85))
+    margin = float(cfg.get("FACE_BASELINE_CROP_MARGIN", 0.35))
+    thumb_side = int(cfg.get("FACE_THUMBNAIL_SIZE", 160))
+    thumb_quality = int(cfg.get("FACE_THUMBNAIL_JPEG_QUALITY", 75))
+
     try:
         embeddings = []
         uploaded = []
+        # Satu timestamp per enrollment: semua baseline/thumbnail satu set berbagi <ts>
+        ts = _now_ts()
 
         for idx, img_bytes in enumerate(images_data, 1):
             logger.info(f"Memproses gambar #{idx} untuk user {user_id}")
             img = decode_image(img_bytes)
 
-            emb = get_embedding(img)  # <-- akan lazy init engine bila perlu
-            if emb is None:
+            face = _largest_face(img)  # <-- akan lazy init engine bila perlu
+            if face is None:
                 logger.warning(f"Wajah tidak terdeteksi pada gambar #{idx} untuk user {user_id}")
                 continue
 
-            emb = _normalize(emb.astype(np.float32))
+            emb = _normalize(face.embedding.astype(np.float32))
 
-            # Simpan baseline image
-            ok, buf = cv2.imencode(".jpg", img)
-            if not ok:
+            # Simpan baseline (crop wajah, resolusi dibatasi) + thumbnail untuk UI listing
+            crop = _crop_face(img, face.bbox, margin, max_side)
+            baseline = _encode_jpeg(crop, quality)
+            if baseline is None:
                 logger.warning(f"Gagal encode JPEG untuk gambar #{idx}")
                 continue
-            ts = _now_ts()
             key = f"{_user_root(user_id)}/baseline_{ts}_{idx}.jpg"
-            upload_bytes(key, buf.tobytes(), "image/jpeg")
+            upload_bytes(key, baseline, "image/jpeg")
+
+            thumb = _encode_jpeg(_fit(crop, thumb_side), thumb_quality)
+            if thumb is not None:
+                upload_bytes(f"{_user_root(user_id)}/thumb_{ts}_{idx}.jpg", thumb, "image/jpeg")
+
             uploaded.append({"path": key})
             embeddings.append(emb)
-            logger.info(f"Gambar #{idx} berhasil diunggah ke {key}")
+            logger.info(f"Gambar #{idx} berhasil diunggah ke {key} ({len(baseline)} bytes)")
 
         if not embeddings:
             logger.error(f"Pendaftaran wajah gagal untuk user {user_id}: Tidak ada wajah terdeteksi.")
@@ -136,9 +195,14 @@ def enroll_user_task(user_id: str, user_name: str, images_data: List[bytes]):
         upload_bytes(emb_key, emb_io.getvalue(), "application/octet-stream")
         logger.info(f"Embedding berhasil disimpan di {emb_key}")
 
+        try:
+            prune_baselines(user_id, int(cfg.get("FACE_BASELINE_KEEP_SETS", 2)))
+        except Exception as e:
+            logger.warning(f"Gagal membersihkan baseline lama user {user_id}: {e}", exc_info=True)
+
         # Kirim notifikasi sukses
         try:
-            with get_session() as s:
+            with request_session() as s:
                 send_notification(
                     event_trigger="FACE_REGISTRATION_SUCCESS",
                     user_id=user_id,
@@ -162,6 +226,71 @@ def enroll_user_task(user_id: str, user_name: str, images_data: List[bytes]):
         return {"status": "error", "message": str(e)}
 
 
+_BASELINE_RE = re.compile(r"^(?:baseline|thumb)_(\d+)_\d+\.jpg$")
+
+
+def _group_sets(timestamps, gap: int) -> list[list[int]]:
+    """
+    Kelompokkan <ts> menjadi set enrollment, urut terbaru dulu. Enrollment lama memberi
+    timestamp sendiri ke tiap gambar (detik berurutan), jadi <ts> yang berjarak <= `gap`
+    detik dari tetangganya dianggap satu enrollment. Enrollment baru (satu <ts> per set)
+    tetap satu grup; dua enrollment yang sangat berdekatan paling buruk ikut tersimpan.
+    """
+    groups: list[list[int]] = []
+    for ts in sorted(set(timestamps), reverse=True):
+        if groups and groups[-1][-1] - ts <= gap:
+            groups[-1].append(ts)
+        else:
+            groups.append([ts])
+    return groups
+
+
+def prune_baselines(user_id: str, keep_sets: int, set_gap: int | None = None) -> int:
+    """
+    Hapus baseline/thumbnail dari set enrollment lama; simpan `keep_sets` set terbaru.
+    Satu set = file dengan <ts> yang sama, atau berdekatan (<= set_gap detik) untuk
+    enrollment format lama. Return jumlah file yang dihapus.
+    """
+    keep_sets = max(1, int(keep_sets))
+    if set_gap is None:
+        set_gap = int(current_app.config.get("FACE_BASELINE_SET_GAP", 120))
+    root = _user_root(user_id)
+    by_ts: dict[int, list[str]] = {}
+    for it in iter_objects(root):
+        name = it.get("name") or ""
+        m = _BASELINE_RE.match(name)
+        if m:
+            by_ts.setdefault(int(m.group(1)), []).append(f"{root}/{name}")
+
+    stale = _group_sets(by_ts, set_gap)[keep_sets:]
+    paths = [p for group in stale for ts in group for p in by_ts[ts]]
+    if paths:
+        delete_objects(paths)
+        logger.info(f"Menghapus {len(paths)} file baseline lama untuk user {user_id}")
+    return len(paths)
+
+
+@celery.task(name="tasks.prune_face_baselines_task")
+def prune_face_baselines_task(user_id: str | None = None, keep_sets: int | None = None):
+    """
+    Job retensi baseline. Tanpa user_id: jalankan untuk semua folder di face_detection/.
+    """
+    if keep_sets is None:
+        keep_sets = int(current_app.config.get("FACE_BASELINE_KEEP_SETS", 2))
+    if user_id:
+        user_ids = [user_id]
+    else:
+        user_ids = [it.get("name") for it in iter_objects("face_detection") if it.get("name") and it.get("id") is None]
+
+    deleted = 0
+    for uid in user_ids:
+        try:
+            deleted += prune_baselines(uid, keep_sets)
+        except Exception as e:
+            logger.warning(f"Retensi baseline gagal untuk user {uid}: {e}", exc_info=True)
+    return {"status": "ok", "users": len(user_ids), "deleted": deleted}
+
+
 def verify_user(
     user_id: str,
     probe_file: Union[FileStorage, bytes, bytearray, np.ndarray],
@@ -181,18 +310,25 @@ def verify_user(
     try:
         emb_bytes = download(emb_key)
         ref = np.load(io.BytesIO(emb_bytes))
+    except StorageUnavailable:
+        # Storage down: jangan lanjut ke fallback yang juga butuh storage
+        raise
     except Exception:
         ref = None
 
     if ref is None:
-        # fallback: rata-rata 3 baseline pertama
-        items = list_objects(f"{_user_root(user_id)}")
-        baselines = [it for it in items if it.get("name", "").startswith("baseline_")]
+        # fallback: rata-rata 3 baseline terbaru
+        root = _user_root(user_id)
+        items = list_objects(root)
+        baselines = sorted(
+            (it.get("name", "") for it in items if it.get("name", "").startswith("baseline_")),
+            reverse=True,
+        )
         if not baselines:
             raise FileNotFoundError("Embedding & baseline user belum ada di storage")
         embs = []
-        for it in baselines[:3]:
-            data = download(it["path"])
+        for name in baselines[:3]:
+            data = download(f"{root}/{name}")
             img = decode_image(data)
             emb = get_embedding(img)
             if emb is not None:
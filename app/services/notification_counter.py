@@ -0,0 +1,119 @@
+# app/services/notification_counter.py
+"""
+Counter jumlah notifikasi unread per user di Redis.
+
+Key hanya di-INCR/DECR bila sudah ada; bila belum ada (atau Redis sempat hilang),
+pembacaan berikutnya menghitung ulang dengan COUNT(*) memakai index
+idx_n_id_user_status_created_at lalu menyimpannya dengan TTL pendek.
+
+Setiap penulis juga menaikkan key generasi `notif:unread:gen:<user>`. Pembaca mencatat
+generasi SEBELUM COUNT (di primary) dan hanya menyimpan hasilnya bila generasi belum
+berubah, sehingga hitungan yang sudah basi tidak menimpa perubahan yang terjadi di
+antara COUNT dan SET.
+"""
+from __future__ import annotations
+
+import logging
+from typing import Optional
+
+from flask import current_app
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from ..db.models import Notification, NotificationStatus
+from ..extensions import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Generasi selalu naik; INCRBY hanya untuk key yang sudah ada;
+# hasil negatif berarti counter tidak sinkron -> hapus
+_ADJUST_LUA = """
+redis.call('INCR', KEYS[2])
+redis.call('EXPIRE', KEYS[2], ARGV[2])
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    local v = redis.call('INCRBY', KEYS[1], ARGV[1])
+    if v < 0 then
+        redis.call('DEL', KEYS[1])
+        return nil
+    end
+    return v
+end
+return nil
+"""
+
+# Simpan hasil COUNT hanya bila tidak ada penulis sejak generasi dibaca
+_SEED_LUA = """
+if (redis.call('GET', KEYS[2]) or '0') == ARGV[1] then
+    return redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3], 'NX') and 1 or 0
+end
+return 0
+"""
+
+# Cukup panjang untuk menutup jendela COUNT -> SET; generasi yang hilang hanya membuat seed ditolak
+_GEN_TTL = 3600
+
+
+def _key(user_id: str) -> str:
+    return f"notif:unread:{user_id}"
+
+
+def _gen_key(user_id: str) -> str:
+    return f"notif:unread:gen:{user_id}"
+
+
+def count_unread_db(session: Session, user_id: str) -> int:
+    return int(
+        session.execute(
+            select(func.count())
+            .select_from(Notification)
+            .where(
+                Notification.id_user == user_id,
+                Notification.status == NotificationStatus.unread,
+                Notification.deleted_at.is_(None),
+            )
+        ).scalar_one()
+    )
+
+
+def get_unread_count(session: Session, user_id: str) -> int:
+    """`session` harus ke primary: hitungan dari replica yang tertinggal akan ikut disimpan."""
+    try:
+        r = get_redis()
+        cached, gen = r.mget(_key(user_id), _gen_key(user_id))
+        if cached is not None:
+            return int(cached)
+    except Exception as e:
+        logger.warning("Gagal membaca counter unread user %s: %s", user_id, e)
+        return count_unread_db(session, user_id)
+
+    n = count_unread_db(session, user_id)
+    try:
+        ttl = int(current_app.config.get("NOTIF_UNREAD_COUNTER_TTL", 300))
+        r.eval(_SEED_LUA, 2, _key(user_id), _gen_key(user_id), gen or "0", n, ttl)
+    except Exception as e:
+        logger.warning("Gagal menyimpan counter unread user %s: %s", user_id, e)
+    return n
+
+
+def adjust_unread(user_id: Optional[str], delta: int) -> None:
+    """Panggil SETELAH commit yang mengubah jumlah unread user."""
+    if not user_id or not delta:
+        return
+    try:
+        get_redis().eval(_ADJUST_LUA, 2, _key(user_id), _gen_key(user_id), int(delta), _GEN_TTL)
+    except Exception as e:
+        logger.warning("Gagal update counter unread user %s: %s", user_id, e)
+        invalidate_unread(user_id)
+
+
+def invalidate_unread(user_id: Optional[str]) -> None:
+    if not user_id:
+        return
+    try:
+        pipe = get_redis().pipeline(transaction=True)
+        pipe.delete(_key(user_id))
+        pipe.incr(_gen_key(user_id))
+        pipe.expire(_gen_key(user_id), _GEN_TTL)
+        pipe.execute()
+    except Exception as e:
+        logger.warning("Gagal menghapus counter unread user %s: %s", user_id, e)
@@ -8,6 +8,7 @@ from typing import Any, Dict, List
 import logging # <-- Ditambahkan
 
 from firebase_admin import messaging
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 # Coba impor initialize_firebase dari extensions; jika tidak ada, pakai app/firebase.py
@@ -17,6 +18,9 @@ except (ImportError, AttributeError):
     from ..firebase import initialize_firebase # fallback yang ada di repo kamu
 
 from ..db.models import NotificationTemplate, Device, Notification
+from ..db.replicas import mark_user_write
+from ..db.loading import TEMPLATE_RENDER
+from .notification_counter import adjust_unread
 
 logger = logging.getLogger(__name__)
 # ---------- Helpers ----------
@@ -124,6 +128,7 @@ def send_notification(event_trigger: str, user_id: str, dynamic_data: Dict[str,
     # Ambil template aktif
     template: NotificationTemplate | None = (
         session.query(NotificationTemplate)
+        .options(*TEMPLATE_RENDER)
         .filter(
             NotificationTemplate.event_trigger == event_trigger,
             NotificationTemplate.is_active.is_(True),
@@ -136,16 +141,17 @@ def send_notification(event_trigger: str, user_id: str, dynamic_data: Dict[str,
         return
 
     # Ambil token device aktif
-    devices = (
-        session.query(Device)
-        .filter(
-            Device.id_user == user_id,
-            Device.fcm_token.isnot(None),
-            Device.push_enabled.is_(True),
-        )
-        .all()
-    )
-    tokens = [d.fcm_token for d in devices if d.fcm_token]
+    tokens = [
+        t
+        for t in session.execute(
+            select(Device.fcm_token).where(
+                Device.id_user == user_id,
+                Device.fcm_token.isnot(None),
+                Device.push_enabled.is_(True),
+            )
+        ).scalars()
+        if t
+    ]
     if not tokens:
         # Ganti print dengan logger.warning
         logger.warning(f"Tidak ada device/token FCM aktif untuk user '{user_id}'.")
@@ -227,6 +233,8 @@ def send_notification(event_trigger: str, user_id: str, dynamic_data: Dict[str,
     # Commit perubahan DB (jika tidak di-rollback di atas)
     try:
         session.commit()
+        mark_user_write(user_id)
+        adjust_unread(user_id, +1)
     except Exception as e:
         session.rollback()
          # Ganti print dengan logger.error
@@ -0,0 +1,146 @@
+# app/services/presence.py
+"""
+Counter kehadiran real-time per (tanggal, kantor, departemen, state) untuk dashboard supervisor.
+
+Satu hash Redis per tanggal `presence:<YYYY-MM-DD>`, field `<id_location>|<id_departement>|<state>`:
+- in        : sudah check-in, belum checkout, tidak sedang istirahat
+- on_break  : sedang istirahat
+- out       : sudah checkout
+- late      : jumlah check-in terlambat hari itu (tidak berkurang saat pindah state)
+Kantor = lokasi check-in (id_lokasi_datang), sehingga setiap transisi user menyentuh field
+yang sama. Id kosong disimpan sebagai "-".
+
+Transisi di-HINCRBY setelah commit (check-in/out di task, mulai/akhir istirahat di route).
+Karena Redis di luar transaksi DB, job presence.reconcile menghitung ulang dari DB secara
+berkala dan mengganti hash secara atomik (RENAME).
+"""
+from __future__ import annotations
+
+import logging
+from datetime import date
+from typing import Any, Dict, Optional
+
+from sqlalchemy import and_, case, exists, func, select
+
+from ..db.models import Absensi, AbsensiStatus, Istirahat, User
+from ..db.request_scope import get_user
+from ..extensions import get_redis
+from ..utils.timez import now_local
+
+logger = logging.getLogger(__name__)
+
+STATES = ("in", "on_break", "out", "late")
+_NONE = "-"
+_RECONCILED_FIELD = "_reconciled_at"
+
+
+def _key(day: date) -> str:
+    return f"presence:{day.isoformat()}"
+
+
+def _field(location_id: Optional[str], departement_id: Optional[str], state: str) -> str:
+    return f"{location_id or _NONE}|{departement_id or _NONE}|{state}"
+
+
+def _ttl() -> int:
+    return 2 * 86400
+
+
+def record_transition(day: date, user_id: str, location_id: Optional[str], deltas: Dict[str, int]) -> None:
+    """Terapkan perubahan counter satu user (mis. {"in": -1, "on_break": 1}). Panggil SETELAH commit."""
+    user = get_user(user_id)
+    departement_id = getattr(user, "id_departement", None)
+    try:
+        pipe = get_redis().pipeline(transaction=True)
+        for state, delta in deltas.items():
+            if delta:
+                pipe.hincrby(_key(day), _field(location_id, departement_id, state), int(delta))
+        pipe.expire(_key(day), _ttl())
+        pipe.execute()
+    except Exception as e:
+        # Selisih akan dikoreksi oleh presence.reconcile
+        logger.warning("Gagal update counter presence user %s: %s", user_id, e)
+
+
+def dashboard(s, day: date, location_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Satu HGETALL -> {location: {departement: {state: n}}} plus total per kantor.
+    Redis bermasalah -> dihitung langsung dari DB (lebih berat, tapi dashboard tetap jalan).
+    """
+    try:
+        raw = get_redis().hgetall(_key(day))
+    except Exception as e:
+        logger.warning("Gagal membaca counter presence %s: %s", day, e)
+        raw = count_from_db(s, day)
+    offices: Dict[str, Dict[str, Any]] = {}
+    for field, value in raw.items():
+        if field == _RECONCILED_FIELD:
+            continue
+        loc, dept, state = field.split("|", 2)
+        if location_id and loc != location_id:
+            continue
+        office = offices.setdefault(loc, {"total": dict.fromkeys(STATES, 0), "departements": {}})
+        bucket = office["departements"].setdefault(dept, dict.fromkeys(STATES, 0))
+        n = max(0, int(value))
+        bucket[state] = n
+        office["total"][state] += n
+    return {
+        "tanggal": day.isoformat(),
+        "offices": offices,
+        "reconciled_at": raw.get(_RECONCILED_FIELD),
+    }
+
+
+def count_from_db(s, day: date) -> Dict[str, int]:
+    """Hitung counter dari Absensi + istirahat (satu GROUP BY)."""
+    open_break = exists().where(
+        and_(Istirahat.id_absensi == Absensi.id_absensi, Istirahat.end_istirahat.is_(None))
+    )
+    state = case(
+        (Absensi.jam_pulang.isnot(None), "out"),
+        (open_break, "on_break"),
+        else_="in",
+    ).label("state")
+    late = func.sum(case((Absensi.status_masuk == AbsensiStatus.terlambat, 1), else_=0)).label("late")
+
+    rows = s.execute(
+        select(Absensi.id_lokasi_datang, User.id_departement, state, func.count().label("n"), late)
+        .join(User, User.id_user == Absensi.id_user)
+        .where(Absensi.tanggal == day, Absensi.jam_masuk.isnot(None), Absensi.deleted_at.is_(None))
+        .group_by(Absensi.id_lokasi_datang, User.id_departement, state)
+    ).all()
+
+    counts: Dict[str, int] = {}
+    for loc, dept, st, n, n_late in rows:
+        counts[_field(loc, dept, st)] = counts.get(_field(loc, dept, st), 0) + int(n)
+        if n_late:
+            counts[_field(loc, dept, "late")] = counts.get(_field(loc, dept, "late"), 0) + int(n_late)
+    return counts
+
+
+def reconcile(s, day: date) -> Dict[str, Any]:
+    """
+    Ganti hash hari itu dengan hitungan dari DB. Transisi yang terjadi di antara query dan
+    RENAME bisa hilang sampai reconcile berikutnya (PRESENCE_RECONCILE_MINUTES).
+    """
+    counts = count_from_db(s, day)
+    r = get_redis()
+    before = r.hgetall(_key(day))
+    drift = sum(
+        abs(int(before.get(f, 0)) - counts.get(f, 0))
+        for f in set(before) | set(counts)
+        if f != _RECONCILED_FIELD
+    )
+
+    tmp = f"{_key(day)}:building"
+    pipe = r.pipeline(transaction=True)
+    pipe.delete(tmp)
+    pipe.hset(tmp, mapping={**counts, _RECONCILED_FIELD: now_local().replace(tzinfo=None).isoformat()})
+    pipe.expire(tmp, _ttl())
+    pipe.rename(tmp, _key(day))
+    pipe.execute()
+
+    report = {"tanggal": day.isoformat(), "fields": len(counts), "drift": drift}
+    log = logger.warning if drift else logger.info
+    log("[presence.reconcile] %s", report)
+    return report
@@ -0,0 +1,183 @@
+# app/services/roster.py
+"""
+Roster harian: (user, tanggal) -> shift & pola kerja yang berlaku, dimaterialisasi di Redis.
+
+- Satu hash per tanggal `roster:<YYYY-MM-DD>`, field = id_user, value = JSON ringkas entri
+  (atau "-" bila user tidak punya shift hari itu). Lookup di jalur check-in/istirahat = 1 HGET.
+- Diisi penuh tiap malam untuk hari ini + ROSTER_DAYS_AHEAD hari (task roster.refresh), dan
+  per user/rentang tanggal saat shift berubah (POST /api/absensi/roster/refresh).
+- Field yang belum ada (shift baru dibuat setelah rebuild, Redis sempat kosong) dihitung dari DB
+  lalu disimpan; Redis bermasalah -> langsung dari DB.
+
+Resolusi bila beberapa ShiftKerja (tidak terhapus, punya pola) mencakup tanggal yang sama:
+tanggal_mulai terbaru menang, lalu updated_at terbaru, lalu id_shift_kerja terbesar.
+Dengan begitu penugasan yang lebih spesifik/baru menimpa penugasan rentang panjang, dan
+hasilnya sama di semua proses.
+"""
+from __future__ import annotations
+
+import json
+import logging
+from datetime import date, time, timedelta
+from typing import Any, Dict, Iterable, Optional
+
+from flask import current_app
+from sqlalchemy import select
+
+from ..db.models import PolaKerja, ShiftKerja
+from ..db.request_scope import memo
+from ..extensions import get_redis
+
+logger = logging.getLogger(__name__)
+
+_NONE = "-"
+_TIME_FIELDS = ("jam_mulai", "jam_selesai", "jam_istirahat_mulai", "jam_istirahat_selesai")
+
+
+def _key(day: date) -> str:
+    return f"roster:{day.isoformat()}"
+
+
+def _ttl() -> int:
+    # Cukup untuk jendela materialisasi + 1 hari; key lama hilang sendiri
+    return (int(current_app.config.get("ROSTER_DAYS_AHEAD", 1)) + 2) * 86400
+
+
+def _encode(entry: Optional[Dict[str, Any]]) -> str:
+    if entry is None:
+        return _NONE
+    return json.dumps({k: (v.strftime("%H:%M:%S") if isinstance(v, time) else v) for k, v in entry.items()})
+
+
+def _decode(raw: str) -> Optional[Dict[str, Any]]:
+    if raw == _NONE:
+        return None
+    entry = json.loads(raw)
+    for f in _TIME_FIELDS:
+        if entry.get(f):
+            entry[f] = time.fromisoformat(entry[f])
+    return entry
+
+
+def resolve_from_db(s, day: date, user_ids: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Bulk resolve satu tanggal dalam satu query. user_ids=None -> semua user yang punya shift.
+    User tanpa shift tidak muncul di hasil.
+    """
+    q = (
+        select(
+            ShiftKerja.id_user,
+            ShiftKerja.id_shift_kerja,
+            ShiftKerja.id_pola_kerja,
+            ShiftKerja.status,
+            *[getattr(PolaKerja, f) for f in _TIME_FIELDS],
+        )
+        .join(PolaKerja, PolaKerja.id_pola_kerja == ShiftKerja.id_pola_kerja)
+        .where(
+            ShiftKerja.tanggal_mulai <= day,
+            ShiftKerja.tanggal_selesai >= day,
+            ShiftKerja.deleted_at.is_(None),
+        )
+        .order_by(
+            ShiftKerja.id_user,
+            ShiftKerja.tanggal_mulai.desc(),
+            ShiftKerja.updated_at.desc(),
+            ShiftKerja.id_shift_kerja.desc(),
+        )
+    )
+    if user_ids is not None:
+        q = q.where(ShiftKerja.id_user.in_(list(user_ids)))
+
+    out: Dict[str, Dict[str, Any]] = {}
+    for row in s.execute(q):
+        if row.id_user in out:
+            continue  # sudah ada pemenang menurut urutan di atas
+        entry = {
+            "id_shift_kerja": row.id_shift_kerja,
+            "id_pola_kerja": row.id_pola_kerja,
+            "status": row.status.value if row.status is not None else None,
+        }
+        for f in _TIME_FIELDS:
+            v = getattr(row, f)
+            entry[f] = v.time() if v is not None else None
+        out[row.id_user] = entry
+    return out
+
+
+def resolve_many(s, user_ids: Iterable[str], day: date) -> Dict[str, Optional[Dict[str, Any]]]:
+    """Roster sekumpulan user: satu HMGET, lalu satu query DB untuk yang belum termaterialisasi."""
+    ids = list(dict.fromkeys(user_ids))
+    if not ids:
+        return {}
+    result: Dict[str, Optional[Dict[str, Any]]] = {}
+    missing = ids
+    try:
+        raws = get_redis().hmget(_key(day), ids)
+        missing = []
+        for uid, raw in zip(ids, raws):
+            if raw is None:
+                missing.append(uid)
+            else:
+                result[uid] = _decode(raw)
+    except Exception as e:
+        logger.warning("Gagal membaca roster %s: %s", day, e)
+        return _fill(resolve_from_db(s, day, ids), ids)
+
+    if missing:
+        resolved = _fill(resolve_from_db(s, day, missing), missing)
+        result.update(resolved)
+        _store(day, resolved)
+    return result
+
+
+def get_roster(s, user_id: str, day: date) -> Optional[Dict[str, Any]]:
+    """Entri roster user pada tanggal tsb (None = tidak ada shift), di-memo per request/task."""
+    return memo(("roster", user_id, day), lambda: resolve_many(s, [user_id], day)[user_id])
+
+
+def _fill(found: Dict[str, Dict[str, Any]], ids: Iterable[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+    return {uid: found.get(uid) for uid in ids}
+
+
+def _store(day: date, entries: Dict[str, Optional[Dict[str, Any]]]) -> None:
+    if not entries:
+        return
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.hset(_key(day), mapping={uid: _encode(e) for uid, e in entries.items()})
+        pipe.expire(_key(day), _ttl())
+        pipe.execute()
+    except Exception as e:
+        logger.warning("Gagal menyimpan roster %s: %s", day, e)
+
+
+def rebuild_day(s, day: date) -> int:
+    """
+    Materialisasi penuh satu tanggal. Ditulis ke key sementara lalu RENAME, sehingga pembaca
+    tidak pernah melihat hash setengah jadi. User tanpa shift tetap lewat jalur miss -> "-".
+    """
+    entries = resolve_from_db(s, day)
+    r = get_redis()
+    if not entries:
+        r.delete(_key(day))
+        return 0
+    tmp = f"{_key(day)}:building"
+    pipe = r.pipeline(transaction=True)
+    pipe.delete(tmp)
+    pipe.hset(tmp, mapping={uid: _encode(e) for uid, e in entries.items()})
+    pipe.expire(tmp, _ttl())
+    pipe.rename(tmp, _key(day))
+    pipe.execute()
+    return len(entries)
+
+
+def refresh_users(s, user_ids: Iterable[str], start: date, end: date) -> int:
+    """Hitung ulang roster beberapa user untuk rentang tanggal (setelah shift mereka berubah)."""
+    ids = list(dict.fromkeys(user_ids))
+    days = 0
+    day = start
+    while day <= end:
+        _store(day, _fill(resolve_from_db(s, day, ids), ids))
+        days += 1
+        day += timedelta(days=1)
+    return days
@@ -0,0 +1,87 @@
+# app/services/storage/backend.py
+
+from __future__ import annotations
+
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterator, List, Optional
+
+from flask import current_app
+
+
+class StorageBackend(ABC):
+    """
+    Antarmuka backend storage object; backend yang belum mengimplementasi semua method
+    gagal saat dibuat (TypeError), bukan saat method tsb pertama kali dipanggil.
+
+    Semua path relatif terhadap bucket/root backend, mis. 'face_detection/<user>/embedding.npy'.
+    Bentuk hasil list() mengikuti Supabase: list dict dengan 'name' relatif terhadap prefix
+    dan 'metadata' (size, mimetype) untuk file.
+    """
+
+    name = "base"
+    bucket = ""
+
+    @abstractmethod
+    def upload(self, path: str, data: bytes, content_type: str) -> None:
+        ...
+
+    @abstractmethod
+    def download(self, path: str) -> bytes:
+        ...
+
+    @abstractmethod
+    def list(self, prefix: str, limit: int = 1000, offset: int = 0) -> List[Dict[str, Any]]:
+        """Satu halaman isi prefix, urut nama; halaman < limit berarti sudah habis."""
+        ...
+
+    @abstractmethod
+    def sign(self, paths: List[str], expires_in: int) -> Dict[str, str]:
+        ...
+
+    @abstractmethod
+    def sign_upload(self, path: str, expires_in: int) -> str:
+        """URL untuk PUT langsung ke storage (tanpa lewat worker web)."""
+        ...
+
+    @abstractmethod
+    def stat(self, path: str) -> Optional[Dict[str, Any]]:
+        """{'size', 'content_type', ...} atau None bila object tidak ada."""
+        ...
+
+    @abstractmethod
+    def delete(self, paths: List[str]) -> None:
+        ...
+
+    @abstractmethod
+    def stream(self, path: str, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        ...
+
+
+_backend: Optional[StorageBackend] = None
+_backend_name: Optional[str] = None
+_backend_lock = threading.Lock()
+
+
+def _build_backend(config) -> StorageBackend:
+    kind = (config.get("STORAGE_BACKEND") or "supabase").lower()
+    if kind == "local":
+        from .local_backend import LocalBackend
+        return LocalBackend.from_config(config)
+    if kind == "supabase":
+        from .supabase_backend import SupabaseBackend
+        return SupabaseBackend()
+    raise ValueError(f"STORAGE_BACKEND tidak dikenal: {kind}")
+
+
+def get_storage_backend() -> StorageBackend:
+    """Backend dipilih lewat config STORAGE_BACKEND ('supabase' | 'local')."""
+    global _backend, _backend_name
+    kind = (current_app.config.get("STORAGE_BACKEND") or "supabase").lower()
+    if _backend is not None and _backend_name == kind:
+        return _backend
+    with _backend_lock:
+        if _backend is None or _backend_name != kind:
+            _backend = _build_backend(current_app.config)
+            _backend_name = kind
+        return _backend
@@ -0,0 +1,273 @@
+# app/services/storage/client.py
+
+from __future__ import annotations
+
+import os
+import time
+import threading
+import logging
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+from urllib.parse import quote
+
+import httpx
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+
+class StorageError(RuntimeError):
+    """Error dari Supabase Storage (HTTP non-2xx atau storage belum dikonfigurasi)."""
+
+    def __init__(self, message: str, status_code: int | None = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+_deadline = threading.local()
+
+
+@contextmanager
+def request_deadline(deadline: float):
+    """Batasi semua request storage di thread ini sampai time.monotonic() == deadline."""
+    prev = getattr(_deadline, "value", None)
+    _deadline.value = deadline if prev is None else min(prev, deadline)
+    try:
+        yield
+    finally:
+        _deadline.value = prev
+
+
+def _remaining_timeout() -> Optional[float]:
+    deadline = getattr(_deadline, "value", None)
+    if deadline is None:
+        return None
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise StorageError("Deadline storage terlampaui")
+    return remaining
+
+
+class StorageClient:
+    """
+    Klien tipis ke REST API Supabase Storage di atas satu httpx.Client.
+
+    httpx.Client memegang pool koneksi keep-alive dan aman dipakai lintas thread,
+    jadi handshake TLS cukup sekali per koneksi, bukan sekali per panggilan storage.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        service_key: str,
+        bucket: str,
+        *,
+        max_connections: int = 20,
+        max_keepalive: int = 10,
+        keepalive_expiry: float = 30.0,
+        connect_timeout: float = 3.0,
+        read_timeout: float = 15.0,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.bucket = bucket
+        self._http = httpx.Client(
+            base_url=f"{self.base_url}/storage/v1",
+            headers={
+                "apikey": service_key,
+                "Authorization": f"Bearer {service_key}",
+            },
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+        )
+
+    # ---------- helpers ----------
+
+    @staticmethod
+    def _quote(path: str) -> str:
+        return quote(path.lstrip("/"), safe="/")
+
+    def _timeout(self) -> httpx.Timeout:
+        remaining = _remaining_timeout()
+        base = self._http.timeout
+        if remaining is None:
+            return base
+        return httpx.Timeout(
+            min(base.read or remaining, remaining),
+            connect=min(base.connect or remaining, remaining),
+            write=min(base.write or remaining, remaining),
+            pool=min(base.pool or remaining, remaining),
+        )
+
+    def _request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        kwargs.setdefault("timeout", self._timeout())
+        try:
+            res = self._http.request(method, url, **kwargs)
+        except httpx.HTTPError as e:
+            raise StorageError(f"Storage {method} {url} gagal: {e}") from e
+        if res.status_code >= 400:
+            raise StorageError(
+                f"Storage {method} {url} -> {res.status_code}: {res.text[:200]}",
+                status_code=res.status_code,
+            )
+        return res
+
+    def public_url(self, relative: str) -> str:
+        """Ubah URL relatif dari API (mis. '/object/sign/...') menjadi URL absolut."""
+        if relative.startswith("http"):
+            return relative
+        return f"{self.base_url}/storage/v1/{relative.lstrip('/')}"
+
+    # ---------- operasi object ----------
+
+    def upload(self, path: str, data: bytes, content_type: str, upsert: bool = True) -> None:
+        self._request(
+            "POST",
+            f"/object/{self.bucket}/{self._quote(path)}",
+            content=data,
+            headers={"content-type": content_type, "x-upsert": "true" if upsert else "false"},
+        )
+
+    def download(self, path: str) -> bytes:
+        return self._request("GET", f"/object/{self.bucket}/{self._quote(path)}").content
+
+    def list(self, prefix: str, limit: int = 1000, offset: int = 0) -> List[Dict[str, Any]]:
+        res = self._request(
+            "POST",
+            f"/object/list/{self.bucket}",
+            json={
+                "prefix": prefix,
+                "limit": limit,
+                "offset": offset,
+                "sortBy": {"column": "name", "order": "asc"},
+            },
+        )
+        return res.json() or []
+
+    def create_signed_url(self, path: str, expires_in: int) -> str:
+        res = self._request(
+            "POST",
+            f"/object/sign/{self.bucket}/{self._quote(path)}",
+            json={"expiresIn": int(expires_in)},
+        ).json()
+        return self.public_url(res.get("signedURL") or res.get("signedUrl") or "")
+
+    def create_signed_urls(self, paths: List[str], expires_in: int) -> Dict[str, str]:
+        """Bulk signing: satu request untuk banyak path. Return {path: url}."""
+        if not paths:
+            return {}
+        res = self._request(
+            "POST",
+            f"/object/sign/{self.bucket}",
+            json={"expiresIn": int(expires_in), "paths": list(paths)},
+        ).json() or []
+        out: Dict[str, str] = {}
+        for item in res:
+            signed = item.get("signedURL") or item.get("signedUrl")
+            if item.get("error") or not signed:
+                logger.warning("Signed URL gagal untuk %s: %s", item.get("path"), item.get("error"))
+                continue
+            out[item.get("path")] = self.public_url(signed)
+        return out
+
+    def create_signed_upload_url(self, path: str) -> str:
+        """URL PUT sekali pakai (berlaku ~2 jam di Supabase) untuk upload langsung dari klien."""
+        res = self._request("POST", f"/object/upload/sign/{self.bucket}/{self._quote(path)}").json()
+        return self.public_url(res.get("url") or "")
+
+    def stat(self, path: str) -> Optional[Dict[str, Any]]:
+        """Metadata object via HEAD; None bila object tidak ada."""
+        try:
+            res = self._request("HEAD", f"/object/{self.bucket}/{self._quote(path)}")
+        except StorageError as e:
+            # Supabase mengembalikan 400 untuk object yang tidak ada di beberapa versi
+            if e.status_code in (400, 404):
+                return None
+            raise
+        return {
+            "size": int(res.headers.get("content-length") or 0),
+            "content_type": res.headers.get("content-type"),
+            "etag": res.headers.get("etag"),
+        }
+
+    def remove(self, paths: List[str]) -> None:
+        if paths:
+            self._request("DELETE", f"/object/{self.bucket}", json={"prefixes": list(paths)})
+
+    def stream(self, path: str, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        """Download bertahap tanpa menampung seluruh object di memori."""
+        url = f"/object/{self.bucket}/{self._quote(path)}"
+        try:
+            with self._http.stream("GET", url, timeout=self._timeout()) as res:
+                if res.status_code >= 400:
+                    res.read()
+                    raise StorageError(
+                        f"Storage GET {url} -> {res.status_code}: {res.text[:200]}",
+                        status_code=res.status_code,
+                    )
+                for chunk in res.iter_bytes(chunk_size):
+                    yield chunk
+        except httpx.HTTPError as e:
+            raise StorageError(f"Storage GET {url} gagal: {e}") from e
+
+    def close(self) -> None:
+        self._http.close()
+
+
+# -------------------------
+# Klien per-proses (fork safe)
+# -------------------------
+_client: Optional[StorageClient] = None
+_client_pid: Optional[int] = None
+_client_lock = threading.Lock()
+
+
+def _reset_after_fork() -> None:
+    # Socket milik parent tidak boleh dipakai bersama oleh child (gunicorn/Celery prefork).
+    global _client, _client_pid, _client_lock
+    _client = None
+    _client_pid = None
+    _client_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _build_client(config) -> StorageClient:
+    url = config.get("SUPABASE_URL")
+    key = config.get("SUPABASE_SERVICE_ROLE_KEY")
+    if not url or not key:
+        raise StorageError("Supabase not configured")
+    return StorageClient(
+        url,
+        key,
+        config.get("SUPABASE_BUCKET", "e-hrm"),
+        max_connections=int(config.get("STORAGE_POOL_MAXSIZE", 20)),
+        max_keepalive=int(config.get("STORAGE_POOL_KEEPALIVE", 10)),
+        keepalive_expiry=float(config.get("STORAGE_KEEPALIVE_EXPIRY", 30.0)),
+        connect_timeout=float(config.get("STORAGE_CONNECT_TIMEOUT", 3.0)),
+        read_timeout=float(config.get("STORAGE_READ_TIMEOUT", 15.0)),
+    )
+
+
+def get_storage_client() -> StorageClient:
+    """
+    Lazy getter: klien dibuat saat pertama dipakai di proses ini (setelah fork),
+    lalu dipakai bersama oleh semua thread di proses yang sama.
+    """
+    global _client, _client_pid
+    pid = os.getpid()
+    client = _client
+    if client is not None and _client_pid == pid:
+        return client
+
+    with _client_lock:
+        if _client is None or _client_pid != pid:
+            _client = _build_client(current_app.config)
+            _client_pid = pid
+            logger.info("Storage client dibuat untuk pid=%s", pid)
+        return _client
@@ -0,0 +1,168 @@
+# app/services/storage/disk_cache.py
+
+from __future__ import annotations
+
+import os
+import time
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+def _digest(*parts: str) -> str:
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+class DiskCache:
+    """
+    Cache read-through di disk lokal untuk hasil download storage.
+
+    Layout: <root>/<aa>/<sha(bucket,path)>/current
+    - Satu direktori per (bucket, path), sehingga invalidasi cukup menghapus direktori itu
+      (berlaku juga untuk proses lain di host yang sama karena direktorinya dipakai bersama).
+      Kesegaran dijaga invalidasi saat upload/delete lewat layanan ini ditambah max_age,
+      bukan versi object (etag butuh HEAD ke storage di setiap baca).
+    - Penulisan atomik: tulis ke file sementara di direktori yang sama lalu os.replace.
+    - LRU: atime di-set manual saat hit (tidak bergantung pada opsi mount noatime),
+      mtime menyimpan waktu tulis untuk pengecekan umur maksimum.
+    """
+
+    def __init__(self, root: str, max_bytes: int, max_age: int = 0):
+        self.root = root
+        self.max_bytes = int(max_bytes)
+        self.max_age = int(max_age)
+        self._lock = threading.Lock()
+        self._approx_bytes: Optional[int] = None
+        os.makedirs(self.root, exist_ok=True)
+
+    # ---------- helpers ----------
+
+    def _entry_dir(self, bucket: str, path: str) -> str:
+        key = _digest(bucket, path)
+        return os.path.join(self.root, key[:2], key)
+
+    def _entry_file(self, bucket: str, path: str) -> str:
+        return os.path.join(self._entry_dir(bucket, path), "current")
+
+    def _scan(self) -> list[tuple[float, int, str]]:
+        entries = []
+        for dirpath, _dirs, files in os.walk(self.root):
+            for name in files:
+                if name.startswith(".tmp-"):
+                    continue
+                fp = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(fp)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_atime, st.st_size, fp))
+        return entries
+
+    # ---------- API ----------
+
+    def get(self, bucket: str, path: str, allow_stale: bool = False) -> Optional[bytes]:
+        """allow_stale=True mengabaikan max_age (mode cache-only saat storage down)."""
+        fp = self._entry_file(bucket, path)
+        try:
+            st = os.stat(fp)
+            if not allow_stale and self.max_age and time.time() - st.st_mtime > self.max_age:
+                # File dibiarkan: masih berguna untuk mode cache-only dan akan ditimpa oleh put()
+                return None
+            with open(fp, "rb") as fh:
+                data = fh.read()
+            os.utime(fp, (time.time(), st.st_mtime))
+            return data
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.warning("Gagal membaca cache storage %s: %s", fp, e)
+            return None
+
+    def put(self, bucket: str, path: str, data: bytes) -> None:
+        if len(data) > self.max_bytes:
+            return
+        fp = self._entry_file(bucket, path)
+        entry_dir = os.path.dirname(fp)
+        try:
+            os.makedirs(entry_dir, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(prefix=".tmp-", dir=entry_dir)
+            try:
+                with os.fdopen(fd, "wb") as fh:
+                    fh.write(data)
+                os.replace(tmp, fp)
+            except BaseException:
+                try:
+                    os.unlink(tmp)
+                except OSError:
+                    pass
+                raise
+        except OSError as e:
+            logger.warning("Gagal menulis cache storage %s: %s", fp, e)
+            return
+
+        with self._lock:
+            if self._approx_bytes is not None:
+                self._approx_bytes += len(data)
+        self._maybe_evict()
+
+    def invalidate(self, bucket: str, path: str) -> None:
+        """Hapus semua versi (bucket, path) dari cache."""
+        entry_dir = self._entry_dir(bucket, path)
+        if os.path.isdir(entry_dir):
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            with self._lock:
+                self._approx_bytes = None
+
+    def _maybe_evict(self) -> None:
+        with self._lock:
+            if self._approx_bytes is not None and self._approx_bytes <= self.max_bytes:
+                return
+            entries = self._scan()
+            total = sum(size for _, size, _ in entries)
+            if total > self.max_bytes:
+                # Buang yang paling lama tidak diakses sampai turun ke 90% budget
+                target = int(self.max_bytes * 0.9)
+                for _atime, size, fp in sorted(entries):
+                    if total <= target:
+                        break
+                    try:
+                        os.unlink(fp)
+                        total -= size
+                    except FileNotFoundError:
+                        total -= size
+                    except OSError as e:
+                        logger.warning("Gagal evict cache storage %s: %s", fp, e)
+            self._approx_bytes = total
+
+
+# -------------------------
+# Instance per proses
+# -------------------------
+_cache: Optional[DiskCache] = None
+_cache_root: Optional[str] = None
+
+
+def get_disk_cache(config) -> Optional[DiskCache]:
+    """Return DiskCache bila STORAGE_CACHE_DIR di-set; None berarti cache nonaktif."""
+    global _cache, _cache_root
+    root = config.get("STORAGE_CACHE_DIR") or ""
+    if not root:
+        return None
+    if _cache is None or _cache_root != root:
+        _cache = DiskCache(
+            root,
+            max_bytes=int(config.get("STORAGE_CACHE_MAX_BYTES", 512 * 1024 * 1024)),
+            max_age=int(config.get("STORAGE_CACHE_MAX_AGE", 0)),
+        )
+        _cache_root = root
+    return _cache
+
+
+def is_cacheable(config, path: str) -> bool:
+    prefixes = config.get("STORAGE_CACHE_PREFIXES") or ()
+    return any(path.startswith(p) for p in prefixes)
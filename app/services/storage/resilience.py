@@ -0,0 +1,163 @@
+# app/services/storage/resilience.py
+
+from __future__ import annotations
+
+import time
+import random
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from .client import StorageError, request_deadline
+
+logger = logging.getLogger(__name__)
+
+
+class StorageUnavailable(StorageError):
+    """Storage dianggap down (circuit breaker terbuka atau deadline habis); gagal cepat."""
+
+    def __init__(self, message: str):
+        super().__init__(message, status_code=503)
+
+
+def _is_transient(e: Exception) -> bool:
+    # Error jaringan/timeout (status None), 5xx, dan 429 dianggap gangguan storage.
+    # 4xx lain (mis. object tidak ada) adalah jawaban valid, bukan kegagalan.
+    if isinstance(e, StorageError):
+        return e.status_code is None or e.status_code >= 500 or e.status_code == 429
+    # File tidak ada / tanpa izin di backend lokal juga jawaban valid, bukan gangguan
+    if isinstance(e, (FileNotFoundError, PermissionError, IsADirectoryError, NotADirectoryError)):
+        return False
+    return isinstance(e, (OSError, TimeoutError))
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker per proses.
+
+    closed    -> panggilan normal; `failure_threshold` kegagalan beruntun -> open
+    open      -> semua panggilan langsung ditolak selama `reset_timeout` detik
+    half_open -> satu panggilan percobaan; sukses -> closed, gagal -> open lagi
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.reset_timeout = float(reset_timeout)
+        self._state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._trips = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = "half_open"
+            self._probe_in_flight = False
+        return self._state
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self._current_state()
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != "closed":
+                logger.info("Storage circuit breaker kembali closed")
+            self._state = "closed"
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == "half_open" or self._failures >= self.failure_threshold:
+                if self._state != "open":
+                    self._trips += 1
+                    logger.warning("Storage circuit breaker OPEN setelah %s kegagalan", self._failures)
+                self._state = "open"
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            state = self._current_state()
+            retry_in = None
+            if state == "open":
+                retry_in = max(0.0, round(self.reset_timeout - (time.monotonic() - self._opened_at), 1))
+            return {
+                "state": state,
+                "consecutive_failures": self._failures,
+                "trips": self._trips,
+                "retry_in_seconds": retry_in,
+            }
+
+
+_breaker: Optional[CircuitBreaker] = None
+_breaker_lock = threading.Lock()
+
+
+def get_breaker(config) -> CircuitBreaker:
+    global _breaker
+    if _breaker is None:
+        with _breaker_lock:
+            if _breaker is None:
+                _breaker = CircuitBreaker(
+                    failure_threshold=int(config.get("STORAGE_BREAKER_FAILURES", 5)),
+                    reset_timeout=float(config.get("STORAGE_BREAKER_RESET", 30)),
+                )
+    return _breaker
+
+
+def guarded(config, op: str, fn: Callable[[], Any], *, idempotent: bool) -> Any:
+    """
+    Jalankan operasi storage dengan:
+    - deadline total per operasi (STORAGE_DEADLINE_READ / STORAGE_DEADLINE_WRITE),
+    - retry exponential backoff + full jitter untuk operasi idempoten (baca),
+    - circuit breaker: bila terbuka, langsung StorageUnavailable tanpa menyentuh jaringan.
+    """
+    breaker = get_breaker(config)
+    if not breaker.allow():
+        raise StorageUnavailable(f"Storage tidak tersedia (circuit open), operasi {op} dibatalkan")
+
+    budget = float(config.get("STORAGE_DEADLINE_READ" if idempotent else "STORAGE_DEADLINE_WRITE", 5.0))
+    attempts = int(config.get("STORAGE_RETRY_ATTEMPTS", 3)) if idempotent else 1
+    base_delay = float(config.get("STORAGE_RETRY_BASE_DELAY", 0.1))
+    deadline = time.monotonic() + budget
+
+    last_exc: Optional[Exception] = None
+    for attempt in range(max(1, attempts)):
+        try:
+            with request_deadline(deadline):
+                result = fn()
+            breaker.record_success()
+            return result
+        except Exception as e:
+            if not _is_transient(e):
+                # Jawaban valid dari storage (mis. 404) -> storage sehat
+                breaker.record_success()
+                raise
+            last_exc = e
+            delay = random.uniform(0, base_delay * (2 ** attempt))
+            if attempt + 1 >= attempts or time.monotonic() + delay >= deadline:
+                break
+            logger.info("Storage %s gagal (percobaan %s), retry dalam %.2fs: %s", op, attempt + 1, delay, e)
+            time.sleep(delay)
+
+    breaker.record_failure()
+    # Gangguan sementara yang tetap gagal setelah semua retry = storage tidak tersedia,
+    # sehingga pemanggil bisa memakai fallback (mis. cache stale di download()).
+    if time.monotonic() >= deadline:
+        raise StorageUnavailable(f"Deadline storage {op} ({budget}s) terlampaui: {last_exc}") from last_exc
+    raise StorageUnavailable(f"Storage {op} gagal setelah {attempt + 1} percobaan: {last_exc}") from last_exc
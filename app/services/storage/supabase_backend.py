@@ -0,0 +1,43 @@
+# app/services/storage/supabase_backend.py
+
+from __future__ import annotations
+
+from typing import Any, Dict, Iterator, List, Optional
+
+from .backend import StorageBackend
+from .client import get_storage_client
+
+
+class SupabaseBackend(StorageBackend):
+    """Backend Supabase Storage; koneksi HTTP dikelola per proses oleh get_storage_client()."""
+
+    name = "supabase"
+
+    @property
+    def bucket(self) -> str:  # type: ignore[override]
+        return get_storage_client().bucket
+
+    def upload(self, path: str, data: bytes, content_type: str) -> None:
+        get_storage_client().upload(path, data, content_type, upsert=True)
+
+    def download(self, path: str) -> bytes:
+        return get_storage_client().download(path)
+
+    def list(self, prefix: str, limit: int = 1000, offset: int = 0) -> List[Dict[str, Any]]:
+        return get_storage_client().list(prefix, limit=limit, offset=offset)
+
+    def sign(self, paths: List[str], expires_in: int) -> Dict[str, str]:
+        return get_storage_client().create_signed_urls(paths, expires_in)
+
+    def sign_upload(self, path: str, expires_in: int) -> str:
+        # Masa berlaku URL upload ditentukan Supabase; batas waktu kita dijaga di record upload.
+        return get_storage_client().create_signed_upload_url(path)
+
+    def stat(self, path: str) -> Optional[Dict[str, Any]]:
+        return get_storage_client().stat(path)
+
+    def delete(self, paths: List[str]) -> None:
+        get_storage_client().remove(paths)
+
+    def stream(self, path: str, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        return get_storage_client().stream(path, chunk_size)
@@ -1,36 +1,117 @@
-from ...extensions import get_supabase
+# app/services/storage/supabase_storage.py
+# Fasad storage yang dipakai seluruh aplikasi. Nama modul dipertahankan demi
+# kompatibilitas impor lama; backend sebenarnya (Supabase / filesystem lokal)
+# dipilih lewat config STORAGE_BACKEND di backend.get_storage_backend().
+
 from flask import current_app
 import os
 import re
+import time
 from datetime import datetime
 from uuid import uuid4
 
+from .backend import get_storage_backend
+from .disk_cache import get_disk_cache, is_cacheable
+from .url_cache import get_url_cache
+from .resilience import guarded, get_breaker, StorageUnavailable
+
 def upload_bytes(path: str, data: bytes, content_type: str) -> str:
-    sb = get_supabase()
-    assert sb is not None, "Supabase not configured"
-    sb.storage.from_(current_app.config["SUPABASE_BUCKET"]).upload(path, data, {
-        "content-type": content_type,
-        "x-upsert": "true"
-    })
+    backend = get_storage_backend()
+    guarded(current_app.config, "upload", lambda: backend.upload(path, data, content_type), idempotent=False)
+    cache = get_disk_cache(current_app.config)
+    if cache is not None:
+        cache.invalidate(backend.bucket, path)
     return path
 
 def signed_url(path: str, expires_in: int = None) -> str:
-    sb = get_supabase()
-    assert sb is not None, "Supabase not configured"
+    return signed_urls([path], expires_in).get(path, "")
+
+def signed_urls(paths: list, expires_in: int = None) -> dict:
+    """
+    Signed URL untuk banyak path sekaligus: ambil dari cache dulu,
+    sisanya ditandatangani dalam SATU panggilan bulk ke storage.
+    Return {path: url}; path yang gagal ditandatangani tidak ada di hasil.
+    """
     if expires_in is None:
         expires_in = current_app.config["SIGNED_URL_EXPIRES"]
-    res = sb.storage.from_(current_app.config["SUPABASE_BUCKET"]).create_signed_url(path, expires_in)
-    return res["signedURL"] if isinstance(res, dict) and "signedURL" in res else str(res)
+    cache = get_url_cache(current_app.config)
+    out = cache.get_many(paths, expires_in)
+    missing = [p for p in dict.fromkeys(paths) if p not in out]
+    if missing:
+        issued_at = time.time()
+        backend = get_storage_backend()
+        fresh = guarded(current_app.config, "sign", lambda: backend.sign(missing, expires_in), idempotent=True)
+        cache.put_many(fresh, expires_in, issued_at=issued_at)
+        out.update(fresh)
+    return out
 
 def download(path: str) -> bytes:
-    sb = get_supabase()
-    assert sb is not None, "Supabase not configured"
-    return sb.storage.from_(current_app.config["SUPABASE_BUCKET"]).download(path)
-
-def list_objects(prefix: str):
-    sb = get_supabase()
-    assert sb is not None, "Supabase not configured"
-    return sb.storage.from_(current_app.config["SUPABASE_BUCKET"]).list(path=prefix)
+    """
+    Download object; lewat cache disk lokal bila path termasuk STORAGE_CACHE_PREFIXES.
+    Saat circuit breaker storage terbuka, cache dipakai walau sudah melewati max_age
+    (mode cache-only); tanpa salinan lokal langsung StorageUnavailable.
+    """
+    backend = get_storage_backend()
+    cfg = current_app.config
+    # Backend lokal sudah membaca dari disk; cache hanya menambah salinan.
+    cache = get_disk_cache(cfg) if backend.name != "local" and is_cacheable(cfg, path) else None
+    fetch = lambda: backend.download(path)
+    if cache is None:
+        return guarded(cfg, "download", fetch, idempotent=True)
+
+    data = cache.get(backend.bucket, path)
+    if data is not None:
+        return data
+    try:
+        data = guarded(cfg, "download", fetch, idempotent=True)
+    except StorageUnavailable:
+        data = cache.get(backend.bucket, path, allow_stale=True)
+        if data is None:
+            raise
+        return data
+    cache.put(backend.bucket, path, data)
+    return data
+
+def list_objects(prefix: str, limit: int = 1000, offset: int = 0):
+    """Satu halaman (maks `limit` entri); untuk folder besar pakai iter_objects()."""
+    backend = get_storage_backend()
+    return guarded(current_app.config, "list", lambda: backend.list(prefix, limit, offset), idempotent=True)
+
+def iter_objects(prefix: str, page_size: int = 1000):
+    """Semua entri di bawah prefix, halaman demi halaman (list Supabase dibatasi per request)."""
+    offset = 0
+    while True:
+        page = list_objects(prefix, page_size, offset)
+        yield from page
+        if len(page) < page_size:
+            return
+        offset += len(page)
+
+def signed_upload_url(path: str, expires_in: int) -> str:
+    backend = get_storage_backend()
+    return guarded(current_app.config, "sign_upload", lambda: backend.sign_upload(path, expires_in), idempotent=True)
+
+def stat_object(path: str):
+    backend = get_storage_backend()
+    return guarded(current_app.config, "stat", lambda: backend.stat(path), idempotent=True)
+
+def delete_objects(paths: list) -> None:
+    if not paths:
+        return
+    backend = get_storage_backend()
+    guarded(current_app.config, "delete", lambda: backend.delete(paths), idempotent=False)
+    disk = get_disk_cache(current_app.config)
+    urls = get_url_cache(current_app.config)
+    for p in paths:
+        urls.invalidate(p)
+        if disk is not None:
+            disk.invalidate(backend.bucket, p)
+
+def storage_health() -> dict:
+    return get_breaker(current_app.config).snapshot()
+
+def stream(path: str, chunk_size: int = 64 * 1024):
+    return get_storage_backend().stream(path, chunk_size)
 
 def _sanitize_filename(filename: str) -> str:
     """Sanitize filename keeping extension, ensure safe value."""
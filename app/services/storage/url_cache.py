@@ -0,0 +1,68 @@
+# app/services/storage/url_cache.py
+
+from __future__ import annotations
+
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+
+class SignedUrlCache:
+    """
+    Cache in-process untuk signed URL.
+
+    URL dipakai ulang sampai `margin` detik sebelum kedaluwarsa, supaya klien
+    tidak menerima URL yang mati di tengah jalan. Ukuran dibatasi (LRU).
+    """
+
+    def __init__(self, max_entries: int = 5000, margin: int = 3600):
+        self.max_entries = int(max_entries)
+        self.margin = int(margin)
+        self._items: "OrderedDict[tuple[str, int], tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, paths: Iterable[str], expires_in: int) -> Dict[str, str]:
+        now = time.time()
+        out: Dict[str, str] = {}
+        with self._lock:
+            for path in paths:
+                key = (path, expires_in)
+                hit = self._items.get(key)
+                if hit is None:
+                    continue
+                url, expires_at = hit
+                if expires_at - self.margin <= now:
+                    del self._items[key]
+                    continue
+                self._items.move_to_end(key)
+                out[path] = url
+        return out
+
+    def put_many(self, urls: Dict[str, str], expires_in: int, issued_at: Optional[float] = None) -> None:
+        expires_at = (issued_at or time.time()) + expires_in
+        with self._lock:
+            for path, url in urls.items():
+                key = (path, expires_in)
+                self._items[key] = (url, expires_at)
+                self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def invalidate(self, path: str) -> None:
+        with self._lock:
+            for key in [k for k in self._items if k[0] == path]:
+                del self._items[key]
+
+
+_url_cache: Optional[SignedUrlCache] = None
+
+
+def get_url_cache(config) -> SignedUrlCache:
+    global _url_cache
+    if _url_cache is None:
+        _url_cache = SignedUrlCache(
+            max_entries=int(config.get("SIGNED_URL_CACHE_SIZE", 5000)),
+            margin=int(config.get("SIGNED_URL_CACHE_MARGIN", 3600)),
+        )
+    return _url_cache
@@ -0,0 +1,91 @@
+# app/services/task_results.py
+"""
+Hasil task Celery check-in/check-out untuk klien (GET /api/absensi/task/<task_id>).
+
+- Saat enqueue, pemilik task dicatat di Redis (absensi:task:<task_id> -> user_id) sehingga
+  endpoint hanya melayani task absensi milik user tersebut, bukan sembarang task_id.
+- Status dibaca dari result backend (Redis), tanpa menyentuh DB.
+- Long-poll memakai AsyncResult.get(timeout=...): backend Redis menunggu lewat pub/sub,
+  jadi satu request klien menunggu sampai task selesai alih-alih polling berulang.
+  Selama menunggu, satu worker sync gunicorn tertahan, karena itu batasnya pendek
+  (TASK_RESULT_MAX_WAIT, default 5 detik); klien mengulang bila ready=false.
+"""
+from __future__ import annotations
+
+import json
+import time
+import logging
+from typing import Any, Dict, Iterator, Optional
+
+from celery.exceptions import TimeoutError as CeleryTimeoutError
+from celery.result import AsyncResult
+from flask import current_app
+
+from ..extensions import celery, get_redis
+
+logger = logging.getLogger(__name__)
+
+
+def _key(task_id: str) -> str:
+    return f"absensi:task:{task_id}"
+
+
+def remember_task(task_id: str, user_id: str) -> bool:
+    """Catat pemilik task; False bila Redis gagal (task jangan di-enqueue, hasilnya tak bisa diambil)."""
+    try:
+        ttl = int(current_app.config.get("TASK_RESULT_TTL", 3600))
+        get_redis().set(_key(task_id), user_id, ex=ttl)
+        return True
+    except Exception as e:
+        logger.warning("Gagal mencatat task %s: %s", task_id, e)
+        return False
+
+
+def task_owner(task_id: str) -> Optional[str]:
+    """user_id pemilik task, None bila tidak dikenal/kedaluwarsa. Error Redis diteruskan."""
+    return get_redis().get(_key(task_id))
+
+
+def describe(res: AsyncResult) -> Dict[str, Any]:
+    state = res.state
+    data: Dict[str, Any] = {"task_id": res.id, "state": state, "ready": state in ("SUCCESS", "FAILURE", "REVOKED")}
+    if state == "SUCCESS":
+        data["result"] = res.result
+    elif data["ready"]:
+        data["result"] = {"status": "error", "message": str(res.result)}
+    else:
+        data["result"] = None
+    return data
+
+
+def wait_for_task(task_id: str, timeout: float = 0.0) -> Dict[str, Any]:
+    """Tunggu maksimal `timeout` detik (0 = baca sekali) lalu kembalikan status task."""
+    res = AsyncResult(task_id, app=celery)
+    if timeout > 0 and not res.ready():
+        try:
+            res.get(timeout=timeout, propagate=False, interval=0.5)
+        except CeleryTimeoutError:
+            pass
+    return describe(res)
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def stream_task(task_id: str, timeout: float, heartbeat: float) -> Iterator[str]:
+    """
+    Event stream SSE: komentar heartbeat tiap `heartbeat` detik (menjaga proxy tetap terbuka),
+    lalu satu event "result" saat task selesai atau "timeout" bila `timeout` habis.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            yield _sse("timeout", wait_for_task(task_id))
+            return
+        data = wait_for_task(task_id, min(heartbeat, remaining))
+        if data["ready"]:
+            yield _sse("result", data)
+            return
+        yield ": ping\n\n"
@@ -0,0 +1,145 @@
+# app/services/today_state.py
+"""
+Ringkasan status absensi harian per user di Redis ("today state").
+
+Satu key JSON per (user, tanggal) berisi semua yang dibutuhkan /api/absensi/status dan
+/api/absensi/istirahat/status, sehingga polling cukup satu GET Redis.
+- Penulis (task check-in/out, route istirahat) membangun ulang record dari DB setelah commit
+  lalu SET (write-through).
+- Pembaca yang miss membangun dari DB lalu SET NX: bila penulis sudah lebih dulu menyimpan
+  state baru, hasil baca yang mungkin basi tidak menimpanya.
+- Redis bermasalah -> langsung dari DB.
+"""
+from __future__ import annotations
+
+import json
+import logging
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Optional
+
+from flask import current_app
+from sqlalchemy import select
+
+from ..db.models import AgendaKerja, Istirahat
+from ..db.loading import ISTIRAHAT_ROW
+from ..db.request_scope import get_absensi_today
+from ..extensions import get_redis
+from ..utils.timez import now_local
+
+logger = logging.getLogger(__name__)
+
+
+def _key(user_id: str, today: date) -> str:
+    return f"absensi:today:{user_id}:{today.isoformat()}"
+
+
+def _ttl(today: date) -> int:
+    """Sampai tengah malam lokal (key hari ini tak berguna besok), dibatasi TODAY_STATE_TTL."""
+    cap = int(current_app.config.get("TODAY_STATE_TTL", 900))
+    midnight = datetime.combine(today + timedelta(days=1), datetime.min.time())
+    left = int((midnight - now_local().replace(tzinfo=None)).total_seconds())
+    return max(60, min(cap, left))
+
+
+def serialize_istirahat(b: Istirahat) -> Dict[str, Any]:
+    data = {
+        "id_istirahat": b.id_istirahat,
+        "tanggal_istirahat": b.tanggal_istirahat.isoformat(),
+        "start_istirahat": b.start_istirahat.isoformat(),
+        "start_istirahat_latitude": float(b.start_istirahat_latitude) if b.start_istirahat_latitude is not None else None,
+        "start_istirahat_longitude": float(b.start_istirahat_longitude) if b.start_istirahat_longitude is not None else None,
+        "end_istirahat": None,
+        "end_istirahat_latitude": None,
+        "end_istirahat_longitude": None,
+        "duration_seconds": None,
+    }
+    if b.end_istirahat:
+        data["end_istirahat"] = b.end_istirahat.isoformat()
+        data["end_istirahat_latitude"] = float(b.end_istirahat_latitude) if b.end_istirahat_latitude is not None else None
+        data["end_istirahat_longitude"] = float(b.end_istirahat_longitude) if b.end_istirahat_longitude is not None else None
+        data["duration_seconds"] = int((b.end_istirahat - b.start_istirahat).total_seconds())
+    return data
+
+
+def build_today_state(s, user_id: str, today: date) -> Dict[str, Any]:
+    """Bangun state dari DB (maksimal 3 query; 1 bila belum check-in)."""
+    rec = get_absensi_today(user_id, today)
+    state: Dict[str, Any] = {
+        "today": today.isoformat(),
+        "mode": "checkin",
+        "id_absensi": None,
+        "jam_masuk": None,
+        "jam_pulang": None,
+        "linked_agenda_ids": [],
+        "active_break": None,
+        "breaks": [],
+        "total_break_seconds": 0,
+    }
+    if rec is None:
+        return state
+
+    state.update(
+        mode="checkout" if rec.jam_pulang is None else "done",
+        id_absensi=rec.id_absensi,
+        jam_masuk=rec.jam_masuk.isoformat() if rec.jam_masuk else None,
+        jam_pulang=rec.jam_pulang.isoformat() if rec.jam_pulang else None,
+    )
+    state["linked_agenda_ids"] = list(
+        s.execute(
+            select(AgendaKerja.id_agenda_kerja)
+            .where(AgendaKerja.id_absensi == rec.id_absensi)
+            .order_by(AgendaKerja.created_at.asc())
+        ).scalars()
+    )
+
+    breaks = (
+        s.query(Istirahat)
+        .options(*ISTIRAHAT_ROW)
+        .filter(Istirahat.id_absensi == rec.id_absensi, Istirahat.tanggal_istirahat == today)
+        .order_by(Istirahat.start_istirahat.asc())
+        .all()
+    )
+    for b in breaks:
+        item = serialize_istirahat(b)
+        state["breaks"].append(item)
+        if b.end_istirahat is None:
+            state["active_break"] = item
+        else:
+            state["total_break_seconds"] += item["duration_seconds"]
+    return state
+
+
+def get_today_state(s, user_id: str, today: date) -> Dict[str, Any]:
+    try:
+        raw = get_redis().get(_key(user_id, today))
+        if raw:
+            return json.loads(raw)
+    except Exception as e:
+        logger.warning("Gagal membaca today state user %s: %s", user_id, e)
+        return build_today_state(s, user_id, today)
+
+    state = build_today_state(s, user_id, today)
+    try:
+        get_redis().set(_key(user_id, today), json.dumps(state), ex=_ttl(today), nx=True)
+    except Exception as e:
+        logger.warning("Gagal menyimpan today state user %s: %s", user_id, e)
+    return state
+
+
+def refresh_today_state(s, user_id: Optional[str], today: date) -> None:
+    """Write-through: panggil SETELAH commit perubahan absensi/istirahat/agenda user."""
+    if not user_id:
+        return
+    try:
+        state = build_today_state(s, user_id, today)
+        get_redis().set(_key(user_id, today), json.dumps(state), ex=_ttl(today))
+    except Exception as e:
+        logger.warning("Gagal memperbarui today state user %s: %s", user_id, e)
+        invalidate_today_state(user_id, today)
+
+
+def invalidate_today_state(user_id: str, today: date) -> None:
+    try:
+        get_redis().delete(_key(user_id, today))
+    except Exception as e:
+        logger.warning("Gagal menghapus today state user %s: %s", user_id, e)
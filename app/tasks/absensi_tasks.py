@@ -1,12 +1,18 @@
 # app/tasks/absensi_tasks.py
 from __future__ import annotations
 
+import uuid
 import logging
 from typing import Any, Dict, Optional
 from datetime import date, datetime
 
+from sqlalchemy import case, exists, func, insert, literal, null, select
+from sqlalchemy.exc import IntegrityError
+
 from app.extensions import celery
-from app.db import get_session
+from app.db.archive import agenda_absensi_archive
+from app.db.request_scope import request_session, memo_forget
+from app.db.replicas import mark_user_write
 from app.db.models import (
     Absensi,
     User,
@@ -14,29 +20,102 @@ from app.db.models import (
     AgendaKerja,
     AbsensiReportRecipient,
     Catatan,
-    ShiftKerja,
-    PolaKerja,
+    Istirahat,
     AbsensiStatus,
     ReportStatus,
     Role,
-    AtasanRole,
 )
 from app.services.notification_service import send_notification
+from app.services.today_state import refresh_today_state
+from app.services.roster import get_roster
+from app.services.attendance_summary import add_to_summary, is_early_leave
+from app.services.presence import record_transition
 from app.utils.timez import now_local, today_local_date
 
 logger = logging.getLogger(__name__)
 logger.info("[absensi.tasks] loaded from %s", __file__)
 
-def _map_to_atasan_role(user_role: Role) -> AtasanRole | None:
-    if not user_role:
-        return None
-    if user_role == Role.HR:
-        return AtasanRole.HR
-    if user_role == Role.OPERASIONAL:
-        return AtasanRole.OPERASIONAL
-    if user_role == Role.DIREKTUR:
-        return AtasanRole.DIREKTUR
-    return None
+def _is_duplicate_checkin(e: IntegrityError) -> bool:
+    """
+    Error 1062 (ER_DUP_ENTRY) pada INSERT Absensi check-in. PK-nya UUID baru, jadi satu-satunya
+    unique key yang bisa bentrok adalah (id_user, tanggal); nama key tidak dicek karena tabel
+    inti milik aplikasi utama dan ensure_schema menerima unique key apa pun di kolom tsb.
+    """
+    orig = getattr(e, "orig", None)
+    args = getattr(orig, "args", ()) or ()
+    return bool(args) and args[0] == 1062
+
+
+def _link_agendas(s, user_id: str, absensi_id: str, agenda_ids: list[str]) -> int:
+    """
+    Tautkan agenda milik user yang belum tertaut. Agenda dari absensi yang sudah diarsip
+    juga id_absensi-nya NULL (lihat attendance_archive), jadi yang tercatat di
+    agenda_kerja_absensi_archive dikecualikan supaya tidak pindah ke absensi baru.
+    """
+    if not agenda_ids:
+        return 0
+    archived = exists().where(agenda_absensi_archive.c.id_agenda_kerja == AgendaKerja.id_agenda_kerja)
+    return s.query(AgendaKerja).filter(
+        AgendaKerja.id_user == user_id,
+        AgendaKerja.id_agenda_kerja.in_(agenda_ids),
+        AgendaKerja.id_absensi.is_(None),
+        ~archived,
+    ).update({"id_absensi": absensi_id}, synchronize_session=False)
+
+
+def _insert_catatan(s, absensi_id: str, entries: list[dict]) -> int:
+    """Semua catatan dalam satu INSERT multi-row (id dibuat di Python, timestamp default DB)."""
+    rows = [
+        {
+            "id_catatan": str(uuid.uuid4()),
+            "id_absensi": absensi_id,
+            "deskripsi_catatan": e["deskripsi_catatan"],
+            "lampiran_url": e.get("lampiran_url"),
+        }
+        for e in entries
+    ]
+    if rows:
+        s.execute(insert(Catatan).values(rows))
+    return len(rows)
+
+
+def _insert_recipients(s, absensi_id: str, recipient_ids: list[str]) -> int:
+    """
+    INSERT ... SELECT dari tabel user dalam satu statement:
+    - snapshot nama & role diambil langsung dari user (role selain HR/OPERASIONAL/DIREKTUR -> NULL),
+    - penerima yang sudah tercatat untuk absensi ini dilewati via NOT EXISTS.
+    """
+    if not recipient_ids:
+        return 0
+    u = User.__table__
+    arr = AbsensiReportRecipient.__table__
+    atasan_roles = [Role.HR, Role.OPERASIONAL, Role.DIREKTUR]
+    src = select(
+        func.uuid(),
+        literal(absensi_id),
+        u.c.id_user,
+        u.c.nama_pengguna,
+        case((u.c.role.in_(atasan_roles), u.c.role), else_=null()),
+        literal(ReportStatus.terkirim, arr.c.status.type),
+    ).where(
+        u.c.id_user.in_(recipient_ids),
+        ~exists().where(arr.c.id_absensi == absensi_id, arr.c.id_user == u.c.id_user),
+    )
+    res = s.execute(
+        insert(arr).from_select(
+            [
+                arr.c.id_absensi_report_recipient,
+                arr.c.id_absensi,
+                arr.c.id_user,
+                arr.c.recipient_nama_snapshot,
+                arr.c.recipient_role_snapshot,
+                arr.c.status,
+            ],
+            src,
+        )
+    )
+    return res.rowcount
+
 
 @celery.task(name="absensi.healthcheck", bind=True)
 def healthcheck(self) -> Dict[str, Any]:
@@ -55,13 +134,9 @@ def process_checkin_task_v2(self, payload: Dict[str, Any]) -> Dict[str, Any]:
     now_dt = datetime.fromisoformat(payload["now_local_iso"]).replace(tzinfo=None)
     location = payload.get("location", {})
     
-    with get_session() as s:
+    with request_session() as s:
         try:
-            jadwal_kerja = s.query(ShiftKerja).join(PolaKerja).filter(
-                ShiftKerja.id_user == user_id,
-                ShiftKerja.tanggal_mulai <= today,
-                ShiftKerja.tanggal_selesai >= today,
-            ).first()
+            jadwal_kerja = get_roster(s, user_id, today)
 
             # Variabel untuk Absensi Record
             status_kehadiran = AbsensiStatus.tepat
@@ -70,54 +145,60 @@ def process_checkin_task_v2(self, payload: Dict[str, Any]) -> Dict[str, Any]:
             status_absensi_str = "Tepat Waktu"
             jam_masuk_str = now_dt.strftime("%H:%M")
 
-            if jadwal_kerja and jadwal_kerja.polaKerja and jadwal_kerja.polaKerja.jam_mulai:
-                jam_masuk_seharusnya = jadwal_kerja.polaKerja.jam_mulai.time()
+            if jadwal_kerja and jadwal_kerja["jam_mulai"]:
+                jam_masuk_seharusnya = jadwal_kerja["jam_mulai"]
                 jam_checkin_aktual = now_dt.time()
                 if jam_checkin_aktual > jam_masuk_seharusnya:
                     status_kehadiran = AbsensiStatus.terlambat
                     status_absensi_str = "Terlambat" # Update status string untuk notifikasi
 
-            rec = Absensi(
-                id_user=user_id,
-                tanggal=today,
-                jam_masuk=now_dt,
-                status_masuk=status_kehadiran,
-                id_lokasi_datang=location.get("id"),
-                in_latitude=location.get("lat"),
-                in_longitude=location.get("lng"),
-                face_verified_masuk=True,
-                face_verified_pulang=False,
-            )
-            s.add(rec)
-            s.flush()
-            
-            absensi_id = rec.id_absensi
+            # Satu INSERT; duplikat ditolak oleh unique key (id_user, tanggal)
+            # (tanpa SELECT precheck yang bisa lolos bersamaan saat double-submit).
+            absensi_id = str(uuid.uuid4())
+            try:
+                s.execute(
+                    insert(Absensi).values(
+                        id_absensi=absensi_id,
+                        id_user=user_id,
+                        tanggal=today,
+                        jam_masuk=now_dt,
+                        status_masuk=status_kehadiran,
+                        id_lokasi_datang=location.get("id"),
+                        in_latitude=location.get("lat"),
+                        in_longitude=location.get("lng"),
+                        face_verified_masuk=True,
+                        face_verified_pulang=False,
+                    )
+                )
+            except IntegrityError as e:
+                if not _is_duplicate_checkin(e):
+                    raise
+                s.rollback()
+                existing_id = s.query(Absensi.id_absensi).filter(
+                    Absensi.id_user == user_id, Absensi.tanggal == today
+                ).scalar()
+                logger.info(f"[process_checkin_task_v2] user_id={user_id} sudah check-in ({existing_id})")
+                return {
+                    "status": "already_checked_in",
+                    "message": "Check-in duplikat untuk tanggal ini (sudah check-in).",
+                    "absensi_id": existing_id,
+                }
+            memo_forget("absensi", user_id)
+
             logger.info(f"Absensi record created with id: {absensi_id}")
 
-            agenda_ids = payload.get("agenda_ids", [])
-            if agenda_ids:
-                s.query(AgendaKerja).filter(
-                    AgendaKerja.id_user == user_id,
-                    AgendaKerja.id_agenda_kerja.in_(agenda_ids),
-                    AgendaKerja.id_absensi.is_(None)
-                ).update({"id_absensi": absensi_id}, synchronize_session=False)
-
-            for entry in payload.get("catatan_entries", []):
-                s.add(Catatan(id_absensi=absensi_id, **entry))
-
-            recipient_ids = payload.get("recipients", [])
-            if recipient_ids:
-                recipients = s.query(User).filter(User.id_user.in_(recipient_ids)).all()
-                for u in recipients:
-                    s.add(AbsensiReportRecipient(
-                        id_absensi=absensi_id,
-                        id_user=u.id_user,
-                        recipient_nama_snapshot=u.nama_pengguna,
-                        recipient_role_snapshot=_map_to_atasan_role(u.role),
-                        status=ReportStatus.terkirim,
-                    ))
+            _link_agendas(s, user_id, absensi_id, payload.get("agenda_ids", []))
+
+            _insert_catatan(s, absensi_id, payload.get("catatan_entries", []))
+            _insert_recipients(s, absensi_id, payload.get("recipients", []))
 
             s.commit()
+            mark_user_write(user_id)
+            refresh_today_state(s, user_id, today)
+            record_transition(
+                today, user_id, location.get("id"),
+                {"in": 1, "late": int(status_kehadiran == AbsensiStatus.terlambat)},
+            )
             logger.info(f"[process_checkin_task_v2] SUCCESS for user_id={user_id}")
             
             # --- LOGIKA NOTIFIKASI CHECK-IN BERHASIL ---
@@ -153,7 +234,7 @@ def process_checkout_task_v2(self, payload: Dict[str, Any]) -> Dict[str, Any]:
     now_dt = datetime.fromisoformat(payload["now_local_iso"]).replace(tzinfo=None)
     location = payload.get("location", {})
 
-    with get_session() as s:
+    with request_session() as s:
         try:
             # 1. Ambil record absensi yang sudah ada
             rec = s.get(Absensi, absensi_id)
@@ -161,7 +242,8 @@ def process_checkout_task_v2(self, payload: Dict[str, Any]) -> Dict[str, Any]:
                 logger.error(f"Absensi record with id {absensi_id} not found for checkout.")
                 return {"status": "error", "message": f"Absensi record {absensi_id} not found."}
 
-            # 2. Update data checkout
+            # 2. Update data checkout (retry task tidak boleh menambah rekap dua kali)
+            first_checkout = rec.jam_pulang is None
             rec.jam_pulang = now_dt
             rec.id_lokasi_pulang = location.get("id")
             rec.out_latitude = location.get("lat")
@@ -172,38 +254,41 @@ def process_checkout_task_v2(self, payload: Dict[str, Any]) -> Dict[str, Any]:
             rec.status_pulang = AbsensiStatus.tepat
 
             # 3. Tautkan Agenda Kerja (jika ada yang baru)
-            agenda_ids = payload.get("agenda_ids", [])
-            if agenda_ids:
-                s.query(AgendaKerja).filter(
-                    AgendaKerja.id_user == user_id,
-                    AgendaKerja.id_agenda_kerja.in_(agenda_ids),
-                    AgendaKerja.id_absensi.is_(None)
-                ).update({"id_absensi": absensi_id}, synchronize_session=False)
+            _link_agendas(s, user_id, absensi_id, payload.get("agenda_ids", []))
 
             # 4. Tambahkan Catatan baru
-            for entry in payload.get("catatan_entries", []):
-                s.add(Catatan(id_absensi=absensi_id, **entry))
-
-            # 5. Tambahkan Penerima Laporan baru (jika ada)
-            recipient_ids = payload.get("recipients", [])
-            if recipient_ids:
-                # Hindari duplikasi
-                existing_recipients = s.query(AbsensiReportRecipient.id_user).filter_by(id_absensi=absensi_id).all()
-                existing_ids = {r[0] for r in existing_recipients}
-                new_ids = set(recipient_ids) - existing_ids
-                
-                if new_ids:
-                    recipients = s.query(User).filter(User.id_user.in_(new_ids)).all()
-                    for u in recipients:
-                        s.add(AbsensiReportRecipient(
-                            id_absensi=absensi_id,
-                            id_user=u.id_user,
-                            recipient_nama_snapshot=u.nama_pengguna,
-                            recipient_role_snapshot=_map_to_atasan_role(u.role),
-                            status=ReportStatus.terkirim,
-                        ))
+            _insert_catatan(s, absensi_id, payload.get("catatan_entries", []))
+
+            # 5. Tambahkan Penerima Laporan baru (duplikat dilewati di SQL)
+            _insert_recipients(s, absensi_id, payload.get("recipients", []))
+
+            # Counter presence: checkout dari istirahat yang belum ditutup keluar dari "on_break"
+            on_break = first_checkout and s.query(
+                exists().where(Istirahat.id_absensi == absensi_id, Istirahat.end_istirahat.is_(None))
+            ).scalar()
+            lokasi_datang = rec.id_lokasi_datang
+
+            # 6. Rekap bulanan (ikut transaksi checkout)
+            if first_checkout and rec.jam_masuk:
+                jadwal_kerja = get_roster(s, user_id, rec.tanggal)
+                add_to_summary(
+                    s,
+                    user_id,
+                    rec.tanggal,
+                    hari_hadir=1,
+                    jumlah_terlambat=int(rec.status_masuk == AbsensiStatus.terlambat),
+                    jumlah_pulang_cepat=int(is_early_leave(now_dt, jadwal_kerja["jam_selesai"] if jadwal_kerja else None)),
+                    total_kerja_detik=max(0, int((now_dt - rec.jam_masuk).total_seconds())),
+                )
 
             s.commit()
+            mark_user_write(user_id)
+            refresh_today_state(s, user_id, rec.tanggal)
+            if first_checkout:
+                record_transition(
+                    rec.tanggal, user_id, lokasi_datang,
+                    {"on_break" if on_break else "in": -1, "out": 1},
+                )
             logger.info(f"[process_checkout_task_v2] SUCCESS for user_id={user_id}")
             
             # --- LOGIKA NOTIFIKASI CHECK-OUT BERHASIL (BARU) ---
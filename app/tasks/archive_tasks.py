@@ -0,0 +1,37 @@
+# app/tasks/archive_tasks.py
+from __future__ import annotations
+
+import logging
+from datetime import date
+from typing import Any, Dict, Optional
+
+from flask import current_app
+
+from app.extensions import celery
+from app.db.request_scope import request_session
+from app.services.attendance_archive import archive_before, hot_window_start
+from app.utils.timez import today_local_date
+
+logger = logging.getLogger(__name__)
+
+
+@celery.task(name="absensi.archive_closed_months")
+def archive_closed_months_task(before_iso: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Rotasi bulanan: pindahkan absensi sebelum jendela panas (ATTENDANCE_HOT_MONTHS) ke tabel arsip.
+    Bila waktu habis sebelum selesai, sisa diproses pada run berikutnya.
+    """
+    cfg = current_app.config
+    before = (
+        date.fromisoformat(before_iso)
+        if before_iso
+        else hot_window_start(today_local_date(), int(cfg.get("ATTENDANCE_HOT_MONTHS", 3)))
+    )
+    with request_session() as s:
+        return archive_before(
+            s,
+            before,
+            chunk_size=int(cfg.get("ATTENDANCE_ARCHIVE_CHUNK", 500)),
+            max_seconds=float(cfg.get("ATTENDANCE_ARCHIVE_MAX_SECONDS", 900)),
+            pause=float(cfg.get("ATTENDANCE_ARCHIVE_PAUSE", 0.05)),
+        )
@@ -0,0 +1,64 @@
+# app/tasks/lampiran_tasks.py
+from __future__ import annotations
+
+import logging
+from datetime import timedelta
+from typing import Any, Dict, Optional
+
+from flask import current_app
+from sqlalchemy import delete, select
+
+from app.extensions import celery
+from app.db.request_scope import request_session
+from app.db.models import LampiranUpload, UploadStatus
+from app.services.storage.supabase_storage import delete_objects
+from app.utils.timez import now_local
+
+logger = logging.getLogger(__name__)
+
+
+@celery.task(name="lampiran.cleanup_pending")
+def cleanup_pending_uploads_task(chunk_size: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Hapus upload lampiran yang tidak pernah di-finalize dan sudah tidak bisa di-finalize lagi
+    (signed URL kedaluwarsa lebih dari CATATAN_FINALIZE_GRACE detik). Object (bila sempat
+    di-PUT) dihapus dari storage dulu, baru barisnya; gagal hapus object -> baris dibiarkan
+    untuk run berikutnya.
+    """
+    cfg = current_app.config
+    chunk_size = int(chunk_size or cfg.get("CATATAN_UPLOAD_CLEANUP_CHUNK", 200))
+    grace = int(cfg.get("CATATAN_FINALIZE_GRACE", 120))
+    # Margin ekstra supaya tidak balapan dengan finalize yang masuk tepat di batas waktu
+    cutoff = now_local().replace(tzinfo=None) - timedelta(seconds=grace + 300)
+    removed, failed = 0, 0
+
+    with request_session() as s:
+        while True:
+            rows = s.execute(
+                select(LampiranUpload.id_lampiran_upload, LampiranUpload.path)
+                .where(LampiranUpload.status == UploadStatus.pending, LampiranUpload.expires_at < cutoff)
+                .order_by(LampiranUpload.expires_at)
+                .limit(chunk_size)
+            ).all()
+            if not rows:
+                break
+            try:
+                delete_objects([r.path for r in rows])
+            except Exception as e:
+                logger.warning("[lampiran.cleanup_pending] gagal menghapus object: %s", e)
+                failed += len(rows)
+                break
+            s.execute(
+                delete(LampiranUpload).where(
+                    LampiranUpload.id_lampiran_upload.in_([r.id_lampiran_upload for r in rows]),
+                    LampiranUpload.status == UploadStatus.pending,
+                )
+            )
+            s.commit()
+            removed += len(rows)
+            if len(rows) < chunk_size:
+                break
+
+    report = {"removed": removed, "failed": failed}
+    logger.info("[lampiran.cleanup_pending] %s", report)
+    return report
@@ -0,0 +1,154 @@
+# app/tasks/notification_tasks.py
+from __future__ import annotations
+
+import time
+import logging
+from datetime import timedelta
+from typing import Any, Dict, Optional
+
+from flask import current_app
+from sqlalchemy import func, insert, select, tuple_, update, delete
+
+from app.extensions import celery, get_redis
+from app.db.request_scope import request_session
+from app.db.models import Notification, NotificationArchive, NotificationStatus
+from app.services.notification_counter import invalidate_unread
+from app.utils.timez import now_local
+
+logger = logging.getLogger(__name__)
+
+_LAST_PASS_KEY = "notif:retention:last_complete"
+
+_ARCHIVE_COLUMNS = [
+    "id_notification",
+    "id_user",
+    "title",
+    "body",
+    "data_json",
+    "related_table",
+    "related_id",
+    "status",
+    "seen_at",
+    "read_at",
+    "created_at",
+    "updated_at",
+    "deleted_at",
+]
+
+
+def _archive_chunk(s, ids: list[str]) -> None:
+    n = Notification.__table__
+    a = NotificationArchive.__table__
+    src = select(*[n.c[c] for c in _ARCHIVE_COLUMNS], func.now()).where(n.c.id_notification.in_(ids))
+    s.execute(insert(a).from_select([*_ARCHIVE_COLUMNS, "archived_at"], src))
+    s.execute(delete(n).where(n.c.id_notification.in_(ids)))
+
+
+def _soft_delete_chunk(s, ids: list[str]) -> None:
+    s.execute(
+        update(Notification)
+        .where(Notification.id_notification.in_(ids), Notification.deleted_at.is_(None))
+        .values(deleted_at=func.now())
+        .execution_options(synchronize_session=False)
+    )
+
+
+@celery.task(name="notifications.retention")
+def notification_retention_task(
+    days: Optional[int] = None,
+    mode: Optional[str] = None,
+    chunk_size: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Pindahkan (mode=archive) atau soft-delete (mode=soft_delete) notifikasi yang lebih tua dari
+    NOTIF_RETENTION_DAYS, per chunk kecil berurutan (created_at, id_notification):
+    - tiap chunk = transaksi pendek sendiri (lock baris hanya sebanyak chunk),
+    - keyset pada index idx_n_created_at_id_notification: hanya baris lebih tua dari cutoff
+      yang dibaca (PK UUID acak tidak berurutan waktu), tanpa OFFSET,
+    - berhenti bila NOTIF_RETENTION_MAX_SECONDS habis; sisa diproses pada jadwal berikutnya.
+    """
+    cfg = current_app.config
+    days = int(days if days is not None else cfg.get("NOTIF_RETENTION_DAYS", 180))
+    mode = (mode or cfg.get("NOTIF_RETENTION_MODE", "archive")).lower()
+    chunk_size = int(chunk_size or cfg.get("NOTIF_RETENTION_CHUNK", 500))
+    pause = float(cfg.get("NOTIF_RETENTION_PAUSE", 0.05))
+    budget = float(cfg.get("NOTIF_RETENTION_MAX_SECONDS", 300))
+    if mode not in ("archive", "soft_delete"):
+        raise ValueError(f"NOTIF_RETENTION_MODE tidak dikenal: {mode}")
+
+    cutoff = now_local().replace(tzinfo=None) - timedelta(days=days)
+    started = time.monotonic()
+    last_key = None  # (created_at, id_notification) baris terakhir yang diproses
+    moved, chunks = 0, 0
+    completed = False
+
+    with request_session() as s:
+        while True:
+            if time.monotonic() - started >= budget:
+                break
+            cond = [Notification.created_at < cutoff]
+            if last_key is not None:
+                cond.append(tuple_(Notification.created_at, Notification.id_notification) > last_key)
+            if mode == "soft_delete":
+                cond.append(Notification.deleted_at.is_(None))
+            rows = s.execute(
+                select(
+                    Notification.id_notification,
+                    Notification.id_user,
+                    Notification.status,
+                    Notification.created_at,
+                )
+                .where(*cond)
+                .order_by(Notification.created_at, Notification.id_notification)
+                .limit(chunk_size)
+            ).all()
+            if not rows:
+                completed = True
+                break
+
+            ids = [r.id_notification for r in rows]
+            if mode == "archive":
+                _archive_chunk(s, ids)
+            else:
+                _soft_delete_chunk(s, ids)
+            s.commit()
+
+            # Notifikasi unread yang hilang dari tabel panas mengubah badge user
+            for uid in {r.id_user for r in rows if r.status == NotificationStatus.unread}:
+                invalidate_unread(uid)
+
+            moved += len(ids)
+            chunks += 1
+            last_key = (rows[-1].created_at, rows[-1].id_notification)
+            if pause:
+                time.sleep(pause)
+
+    elapsed = time.monotonic() - started
+
+    # Lag = sejak kapan pass penuh terakhir selesai; baris di tabel panas bisa berumur
+    # hingga (days + lag). Disimpan di Redis karena tiap run bisa jatuh ke worker berbeda.
+    lag_seconds = None
+    try:
+        r = get_redis()
+        if completed:
+            r.set(_LAST_PASS_KEY, int(time.time()))
+            lag_seconds = 0
+        else:
+            last = r.get(_LAST_PASS_KEY)
+            lag_seconds = int(time.time()) - int(last) if last else None
+    except Exception as e:
+        logger.warning("[notifications.retention] gagal mencatat lag di Redis: %s", e)
+
+    report = {
+        "mode": mode,
+        "cutoff": cutoff.isoformat(),
+        "rows": moved,
+        "chunks": chunks,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(moved / elapsed, 1) if elapsed > 0 else None,
+        "completed": completed,
+        "lag_seconds": lag_seconds,
+    }
+    log = logger.info if completed else logger.warning
+    log("[notifications.retention] %s", report)
+    return report
@@ -0,0 +1,22 @@
+# app/tasks/presence_tasks.py
+from __future__ import annotations
+
+import logging
+from datetime import date
+from typing import Any, Dict, Optional
+
+from app.extensions import celery
+from app.db.request_scope import request_session
+from app.services.presence import reconcile
+from app.utils.timez import today_local_date
+
+logger = logging.getLogger(__name__)
+
+
+@celery.task(name="presence.reconcile")
+def presence_reconcile_task(day_iso: Optional[str] = None) -> Dict[str, Any]:
+    """Samakan counter presence hari ini (atau day_iso) dengan isi DB."""
+    day = date.fromisoformat(day_iso) if day_iso else today_local_date()
+    # Primary, bukan replica: lag replika akan langsung terbaca sebagai drift
+    with request_session() as s:
+        return reconcile(s, day)
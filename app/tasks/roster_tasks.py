@@ -0,0 +1,48 @@
+# app/tasks/roster_tasks.py
+from __future__ import annotations
+
+import logging
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+
+from flask import current_app
+
+from app.extensions import celery
+from app.db.request_scope import request_session
+from app.services.roster import rebuild_day, refresh_users
+from app.utils.timez import today_local_date
+
+logger = logging.getLogger(__name__)
+
+
+@celery.task(name="roster.refresh")
+def roster_refresh_task(
+    user_ids: Optional[List[str]] = None,
+    start_iso: Optional[str] = None,
+    end_iso: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Tanpa user_ids: materialisasi penuh hari ini s/d ROSTER_DAYS_AHEAD hari ke depan (job malam).
+    Dengan user_ids: hitung ulang roster user tsb untuk rentang tanggal, dipotong ke jendela
+    yang dimaterialisasi (kemarin s/d hari ini + ROSTER_DAYS_AHEAD); tanggal di luar jendela
+    memang tidak di-cache.
+    """
+    today = today_local_date()
+    window_end = today + timedelta(days=int(current_app.config.get("ROSTER_DAYS_AHEAD", 1)))
+
+    with request_session() as s:
+        if not user_ids:
+            rows = {}
+            day = today
+            while day <= window_end:
+                rows[day.isoformat()] = rebuild_day(s, day)
+                day += timedelta(days=1)
+            report = {"mode": "full", "users_per_day": rows}
+        else:
+            start = max(date.fromisoformat(start_iso) if start_iso else today, today - timedelta(days=1))
+            end = min(date.fromisoformat(end_iso) if end_iso else window_end, window_end)
+            days = refresh_users(s, user_ids, start, end) if start <= end else 0
+            report = {"mode": "users", "users": len(user_ids), "days": days}
+
+    logger.info("[roster.refresh] %s", report)
+    return report
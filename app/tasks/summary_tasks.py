@@ -0,0 +1,27 @@
+# app/tasks/summary_tasks.py
+from __future__ import annotations
+
+import logging
+from datetime import timedelta
+from typing import Any, Dict, Optional
+
+from app.extensions import celery
+from app.db.request_scope import request_session
+from app.services.attendance_summary import rebuild_month
+from app.utils.timez import today_local_date
+
+logger = logging.getLogger(__name__)
+
+
+@celery.task(name="absensi.rebuild_monthly_summary")
+def rebuild_monthly_summary_task(tahun: Optional[int] = None, bulan: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Hitung ulang rekap_absensi_bulanan satu bulan dari data mentah.
+    Default = bulan milik "kemarin": job dini hari mengoreksi bulan berjalan, dan pada
+    tanggal 1 menutup bulan sebelumnya.
+    """
+    if tahun is None or bulan is None:
+        ref = today_local_date() - timedelta(days=1)
+        tahun, bulan = ref.year, ref.month
+    with request_session() as s:
+        return rebuild_month(s, int(tahun), int(bulan))
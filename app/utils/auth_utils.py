@@ -1,6 +1,8 @@
 from functools import wraps
 from flask import request, jsonify
 
+from .responses import error
+
 # Ini adalah implementasi placeholder. Anda harus menggantinya dengan logika
 # otentikasi token yang sesungguhnya (misalnya, menggunakan JWT).
 def token_required(f):
@@ -15,4 +17,22 @@ def token_required(f):
 def get_user_id_from_auth():
     # Ini adalah fungsi dummy. Kembalikan ID pengguna statis untuk pengujian.
     # Di implementasi nyata, Anda akan mengekstrak ID pengguna dari token.
-    return "user-id-statis-dari-auth"
\ No newline at end of file
+    return "user-id-statis-dari-auth"
+
+
+def roles_required(*roles):
+    """
+    Endpoint admin: token wajib valid dan role user yang login harus salah satu dari `roles`
+    (mis. roles_required(Role.HR, Role.SUPERADMIN)).
+    """
+    def decorator(f):
+        @wraps(f)
+        @token_required
+        def decorated(*args, **kwargs):
+            from ..db.request_scope import get_user
+            user = get_user(get_user_id_from_auth())
+            if user is None or user.role not in roles:
+                return error("Tidak punya akses ke endpoint ini", 403)
+            return f(*args, **kwargs)
+        return decorated
+    return decorator
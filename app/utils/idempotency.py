@@ -0,0 +1,125 @@
+# app/utils/idempotency.py
+"""
+Header `Idempotency-Key` untuk POST yang mahal (verifikasi wajah, enqueue task).
+
+Klien mengirim key yang sama saat retry. Respons sukses (2xx) pertama disimpan di Redis
+dan diputar ulang untuk key yang sama; selama permintaan pertama masih berjalan, duplikat
+mendapat 409 + Retry-After. Respons gagal (4xx/5xx) tidak disimpan sehingga retry dengan
+key yang sama dieksekusi ulang (mis. foto wajah diambil ulang).
+
+Key di-scope per endpoint + user_id; key yang sama dengan isi request berbeda ditolak 422.
+Tanpa header, atau bila Redis tidak tersedia, endpoint berjalan seperti biasa.
+"""
+from __future__ import annotations
+
+import json
+import hashlib
+import logging
+from functools import wraps
+
+from flask import current_app, make_response, request
+
+from .responses import error
+from ..extensions import get_redis
+
+logger = logging.getLogger(__name__)
+
+HEADER = "Idempotency-Key"
+_MAX_KEY_LEN = 128
+
+
+def _user_id() -> str:
+    payload = request.get_json(silent=True) if request.is_json else None
+    src = payload if isinstance(payload, dict) else request.form
+    return str(src.get("user_id") or "").strip()
+
+
+def _fingerprint() -> str:
+    h = hashlib.sha256()
+    h.update(request.get_data(cache=True) if request.is_json else b"")
+    for k, v in sorted(request.form.items(multi=True)):
+        h.update(f"{k}={v}\n".encode())
+    for k, f in sorted(request.files.items(multi=True), key=lambda kv: kv[0]):
+        h.update(f"{k}:{f.filename}\n".encode())
+        for chunk in iter(lambda: f.stream.read(65536), b""):
+            h.update(chunk)
+        f.stream.seek(0)
+    return h.hexdigest()
+
+
+def _redis_key(scope: str, key: str) -> str:
+    raw = f"{scope}|{_user_id()}|{key}".encode()
+    return f"idem:{hashlib.sha256(raw).hexdigest()}"
+
+
+def _replay(record: dict, fp: str):
+    if record.get("fp") != fp:
+        return error("Idempotency-Key sudah dipakai untuk request yang berbeda", 422)
+    if record.get("state") != "done":
+        resp = make_response(error("Request dengan Idempotency-Key ini masih diproses", 409))
+        resp.headers["Retry-After"] = "1"
+        return resp
+    resp = current_app.response_class(
+        record["body"], status=record["status"], mimetype=record.get("mimetype") or "application/json"
+    )
+    resp.headers["Idempotent-Replayed"] = "true"
+    return resp
+
+
+def idempotent(scope: str):
+    """Dekorator view: `scope` membedakan endpoint (mis. "absensi.checkin")."""
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = (request.headers.get(HEADER) or "").strip()
+            if not key:
+                return view(*args, **kwargs)
+            if len(key) > _MAX_KEY_LEN:
+                return error(f"{HEADER} maksimal {_MAX_KEY_LEN} karakter", 400)
+
+            cfg = current_app.config
+            rkey = _redis_key(scope, key)
+            fp = _fingerprint()
+            try:
+                r = get_redis()
+                pending = json.dumps({"state": "pending", "fp": fp})
+                if not r.set(rkey, pending, nx=True, ex=int(cfg.get("IDEMPOTENCY_LOCK_TTL", 60))):
+                    # Key sempat hilang di antara SET dan GET -> perlakukan sebagai masih diproses
+                    return _replay(json.loads(r.get(rkey) or pending), fp)
+            except Exception as e:
+                logger.warning("Idempotency Redis tidak tersedia (%s); request diproses tanpa dedup", e)
+                return view(*args, **kwargs)
+
+            try:
+                resp = make_response(view(*args, **kwargs))
+            except Exception:
+                _release(rkey)
+                raise
+
+            if 200 <= resp.status_code < 300 and not resp.is_streamed:
+                record = {
+                    "state": "done",
+                    "fp": fp,
+                    "status": resp.status_code,
+                    "mimetype": resp.mimetype,
+                    "body": resp.get_data(as_text=True),
+                }
+                try:
+                    r.set(rkey, json.dumps(record), ex=int(cfg.get("IDEMPOTENCY_TTL", 86400)))
+                except Exception as e:
+                    logger.warning("Gagal menyimpan respons idempotent %s: %s", scope, e)
+            else:
+                _release(rkey)
+            return resp
+
+        return wrapper
+
+    return decorator
+
+
+def _release(rkey: str) -> None:
+    try:
+        get_redis().delete(rkey)
+    except Exception as e:
+        logger.warning("Gagal melepas lock idempotency: %s", e)
@@ -1,11 +1,25 @@
 # celery_worker.py
 # Jalankan:
 #   celery -A celery_worker:app worker --loglevel=INFO --pool=solo
+#   celery -A celery_worker:app beat --loglevel=INFO     (job terjadwal, satu instance saja)
 
+import os
 import logging
+
+# Default pool DB & peran proses untuk worker (lihat DB_POOL_DEFAULTS di app/config.py)
+os.environ.setdefault("APP_ROLE", "worker")
+
 from app import create_app
 from app.extensions import celery
 
+# Modul task yang tidak ikut ter-import lewat blueprint
+import app.tasks.notification_tasks  # noqa: F401
+import app.tasks.archive_tasks  # noqa: F401
+import app.tasks.roster_tasks  # noqa: F401
+import app.tasks.summary_tasks  # noqa: F401
+import app.tasks.presence_tasks  # noqa: F401
+import app.tasks.lampiran_tasks  # noqa: F401
+
 # Siapkan Flask app dari factory
 flask_app = create_app()
 logger = logging.getLogger(__name__)
@@ -0,0 +1,46 @@
+# scripts/archive_attendance.py
+"""
+Pindahkan absensi bulan yang sudah tutup ke tabel arsip.
+
+  python -m scripts.archive_attendance                 # sebelum jendela panas (ATTENDANCE_HOT_MONTHS)
+  python -m scripts.archive_attendance --before 2025-01-01
+  python -m scripts.archive_attendance --dry-run
+"""
+
+import argparse
+from datetime import date
+
+from app import create_app
+from app.db import get_session
+from app.services.attendance_archive import archive_before, hot_window_start
+from app.utils.timez import today_local_date
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--before", help="Batas tanggal (YYYY-MM-DD), eksklusif")
+    parser.add_argument("--dry-run", action="store_true", help="Hanya hitung baris Absensi yang akan dipindah")
+    parser.add_argument("--max-seconds", type=float, default=3600.0)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        before = (
+            date.fromisoformat(args.before)
+            if args.before
+            else hot_window_start(today_local_date(), int(app.config.get("ATTENDANCE_HOT_MONTHS", 3)))
+        )
+        print(f"Arsip absensi dengan tanggal < {before.isoformat()} ...")
+        with get_session() as session:
+            report = archive_before(
+                session,
+                before,
+                chunk_size=int(app.config.get("ATTENDANCE_ARCHIVE_CHUNK", 500)),
+                max_seconds=args.max_seconds,
+                dry_run=args.dry_run,
+            )
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
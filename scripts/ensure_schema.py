@@ -0,0 +1,94 @@
+# scripts/ensure_schema.py
+"""Buat tabel milik layanan ini yang belum ada (tabel inti dikelola aplikasi utama)."""
+
+from sqlalchemy import inspect, text
+
+from app import create_app
+from app.db import get_session
+from app.db.models import LampiranUpload, NotificationArchive, RekapAbsensiBulanan
+from app.db.archive import ARCHIVE_TABLES
+
+
+# Tabel yang dibuat & dikelola oleh api-absensi sendiri
+OWNED_TABLES = [
+    LampiranUpload.__table__,
+    NotificationArchive.__table__,
+    RekapAbsensiBulanan.__table__,
+    *ARCHIVE_TABLES,
+]
+
+
+# Unique key pada tabel inti yang diandalkan jalur tulis layanan ini: (tabel, nama, kolom)
+REQUIRED_UNIQUE_KEYS = [
+    ("Absensi", "uq_absensi_user_tanggal", ("id_user", "tanggal")),
+]
+
+
+# Index yang perlu dipasang pada tabel yang sudah ada (export, retensi, cleanup): (tabel, nama, kolom)
+REQUIRED_INDEXES = [
+    ("Absensi", "idx_abs_tanggal", ("tanggal",)),
+    ("notifications", "idx_n_created_at_id_notification", ("created_at", "id_notification")),
+    # lampiran_upload sudah ada sebelum index cleanup ditambahkan; create(checkfirst) tidak menambahnya
+    ("lampiran_upload", "idx_lu_status_expires_at", ("status", "expires_at")),
+]
+
+
+def _has_unique(inspector, table: str, columns: tuple) -> bool:
+    for uc in inspector.get_unique_constraints(table):
+        if tuple(uc["column_names"]) == columns:
+            return True
+    for ix in inspector.get_indexes(table):
+        if ix.get("unique") and tuple(ix["column_names"]) == columns:
+            return True
+    return False
+
+
+def ensure_unique_keys(session) -> None:
+    inspector = inspect(session.bind)
+    for table, name, columns in REQUIRED_UNIQUE_KEYS:
+        if _has_unique(inspector, table, columns):
+            print(f"Unique key siap: {table}({', '.join(columns)})")
+            continue
+
+        cols = ", ".join(f"`{c}`" for c in columns)
+        dupes = session.execute(
+            text(f"SELECT {cols}, COUNT(*) AS n FROM `{table}` GROUP BY {cols} HAVING COUNT(*) > 1 LIMIT 20")
+        ).all()
+        if dupes:
+            print(f"GAGAL menambah {name}: {table} masih punya baris duplikat, bereskan dulu:")
+            for row in dupes:
+                print(f"  {tuple(row)}")
+            raise SystemExit(1)
+
+        session.execute(text(f"ALTER TABLE `{table}` ADD UNIQUE KEY `{name}` ({cols})"))
+        print(f"Unique key ditambahkan: {table}.{name}")
+
+
+def ensure_indexes(session) -> None:
+    inspector = inspect(session.bind)
+    for table, name, columns in REQUIRED_INDEXES:
+        # Index apa pun yang diawali kolom-kolom ini sudah cukup untuk range scan
+        if any(tuple(ix["column_names"][: len(columns)]) == columns for ix in inspector.get_indexes(table)):
+            print(f"Index siap: {table}({', '.join(columns)})")
+            continue
+        cols = ", ".join(f"`{c}`" for c in columns)
+        session.execute(text(f"ALTER TABLE `{table}` ADD INDEX `{name}` ({cols})"))
+        print(f"Index ditambahkan: {table}.{name}")
+
+
+def ensure_schema() -> None:
+    print("Memeriksa skema tabel milik api-absensi...")
+    with get_session() as session:
+        for table in OWNED_TABLES:
+            table.create(session.bind, checkfirst=True)
+            print(f"Tabel siap: {table.name}")
+        ensure_unique_keys(session)
+        ensure_indexes(session)
+        session.commit()
+    print("Pemeriksaan skema selesai.")
+
+
+if __name__ == "__main__":
+    app = create_app()
+    with app.app_context():
+        ensure_schema()
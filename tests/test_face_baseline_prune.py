@@ -0,0 +1,59 @@
+# tests/test_face_baseline_prune.py
+import pytest
+
+from app.services import face_service
+
+
+@pytest.fixture
+def storage(monkeypatch):
+    """Folder user palsu: daftar nama file + path yang dihapus prune_baselines."""
+    state = {"names": [], "deleted": []}
+    monkeypatch.setattr(face_service, "iter_objects", lambda prefix: [{"name": n} for n in state["names"]])
+    monkeypatch.setattr(face_service, "delete_objects", lambda paths: state["deleted"].extend(paths))
+    return state
+
+
+def _legacy_enrollment(start_ts, n):
+    # Format lama: tiap gambar punya timestamp sendiri, berurutan beberapa detik
+    return [f"baseline_{start_ts + i * 2}_{i + 1}.jpg" for i in range(n)]
+
+
+def _enrollment(ts, n):
+    return [f"baseline_{ts}_{i}.jpg" for i in range(1, n + 1)] + [f"thumb_{ts}_{i}.jpg" for i in range(1, n + 1)]
+
+
+def test_legacy_enrollment_is_kept_whole(storage):
+    storage["names"] = _legacy_enrollment(1_700_000_000, 5)
+
+    deleted = face_service.prune_baselines("u1", keep_sets=2, set_gap=120)
+
+    assert deleted == 0
+    assert storage["deleted"] == []
+
+
+def test_legacy_enrollments_grouped_by_gap(storage):
+    old = _legacy_enrollment(1_700_000_000, 5)
+    mid = _legacy_enrollment(1_700_100_000, 5)
+    new = _legacy_enrollment(1_700_200_000, 5)
+    storage["names"] = old + mid + new
+
+    deleted = face_service.prune_baselines("u1", keep_sets=2, set_gap=120)
+
+    assert deleted == 5
+    assert sorted(storage["deleted"]) == sorted(f"face_detection/u1/{n}" for n in old)
+
+
+def test_new_set_after_legacy_enrollment(storage):
+    legacy = _legacy_enrollment(1_700_000_000, 5)
+    storage["names"] = legacy + _enrollment(1_700_500_000, 3) + ["embedding.npy"]
+
+    assert face_service.prune_baselines("u1", keep_sets=2, set_gap=120) == 0
+
+    storage["names"] += _enrollment(1_700_900_000, 3)
+    assert face_service.prune_baselines("u1", keep_sets=2, set_gap=120) == 5
+    assert sorted(storage["deleted"]) == sorted(f"face_detection/u1/{n}" for n in legacy)
+
+
+def test_group_sets_newest_first():
+    groups = face_service._group_sets([10, 12, 14, 500, 1000], gap=120)
+    assert groups == [[1000], [500], [14, 12, 10]]
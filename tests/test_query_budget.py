@@ -0,0 +1,76 @@
+# tests/test_query_budget.py
+"""
+Budget query endpoint panas (jalur DB, Redis mati; lihat fixture no_redis).
+Naikkan angka di sini hanya dengan alasan yang jelas: setiap statement tambahan
+dibayar di setiap check-in / polling aplikasi.
+"""
+import io
+
+import pytest
+
+from app.db.instrumentation import QueryBudgetExceeded, query_budget
+
+CHECKIN_BUDGET = 1  # lokasi (geofence); duplikat & insert ada di worker
+STATUS_BUDGET = 3  # absensi hari ini + agenda tertaut + istirahat
+UNREAD_COUNT_BUDGET = 1  # COUNT(*) di idx_n_id_user_status_created_at
+
+
+@pytest.fixture
+def fast_checkin(monkeypatch):
+    """Wajah & antrian bukan bagian budget DB: verifikasi selalu cocok, task tidak dikirim."""
+    import app.blueprints.absensi.routes as routes
+
+    monkeypatch.setattr(routes, "verify_user", lambda *a, **kw: {"match": True, "score": 0.9})
+    monkeypatch.setattr(routes, "remember_task", lambda task_id, user_id: True)
+    monkeypatch.setattr(routes.process_checkin_task_v2, "apply_async", lambda *a, **kw: None)
+
+
+def test_checkin_budget(app, client, seed, no_redis, fast_checkin):
+    with app.app_context(), query_budget(CHECKIN_BUDGET) as used:
+        resp = client.post(
+            "/api/absensi/checkin",
+            data={
+                "user_id": seed["user_id"],
+                "location_id": seed["location_id"],
+                "lat": "-8.65",
+                "lng": "115.21",
+                "image": (io.BytesIO(b"jpeg"), "probe.jpg"),
+            },
+            content_type="multipart/form-data",
+        )
+    assert resp.status_code == 202, resp.get_json()
+    assert used["statements"] == CHECKIN_BUDGET
+
+
+def test_status_budget(app, client, checked_in, no_redis):
+    with app.app_context(), query_budget(STATUS_BUDGET) as used:
+        resp = client.get(f"/api/absensi/status?user_id={checked_in['user_id']}")
+    body = resp.get_json()
+    assert resp.status_code == 200, body
+    assert body["mode"] == "checkout"
+    assert used["statements"] == STATUS_BUDGET
+
+
+def test_status_budget_before_checkin(app, client, seed, no_redis):
+    with app.app_context(), query_budget(1) as used:
+        resp = client.get(f"/api/absensi/status?user_id={seed['user_id']}")
+    assert resp.get_json()["mode"] == "checkin"
+    assert used["statements"] == 1
+
+
+def test_unread_count_budget(app, client, seed, no_redis, monkeypatch):
+    import app.blueprints.notifications.routes as notif_routes
+
+    # auth_utils masih placeholder (user statis); pakai user seed
+    monkeypatch.setattr(notif_routes, "get_user_id_from_auth", lambda: seed["user_id"])
+    with app.app_context(), query_budget(UNREAD_COUNT_BUDGET) as used:
+        resp = client.get("/api/notifications/unread-count")
+    assert resp.status_code == 200, resp.get_json()
+    assert resp.get_json()["unread"] == 0
+    assert used["statements"] == UNREAD_COUNT_BUDGET
+
+
+def test_budget_exceeded_raises(app, client, checked_in, no_redis):
+    with pytest.raises(QueryBudgetExceeded):
+        with app.app_context(), query_budget(STATUS_BUDGET - 1):
+            client.get(f"/api/absensi/status?user_id={checked_in['user_id']}")
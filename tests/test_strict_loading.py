@@ -0,0 +1,44 @@
+# tests/test_strict_loading.py
+"""TestConfig menyalakan DB_STRICT_LOADING: lazy load relationship harus gagal, bukan diam-diam query."""
+import pytest
+from sqlalchemy.exc import InvalidRequestError
+
+from app.db.loading import ABSENSI_TODAY
+from app.db.request_scope import get_absensi_today, request_session
+from app.utils.timez import today_local_date
+
+
+def test_strict_loading_enabled_in_tests(app):
+    assert app.config["DB_STRICT_LOADING"] is True
+
+
+def test_lean_profile_raises_on_unloaded_relationship(app, checked_in):
+    with app.app_context():
+        rec = get_absensi_today(checked_in["user_id"], today_local_date())
+        assert rec.id_absensi == checked_in["absensi_id"]
+        with pytest.raises(InvalidRequestError):
+            rec.istirahat  # noqa: B018 - relationship tidak ada di ABSENSI_TODAY
+
+
+def test_plain_query_raises_on_lazy_relationship(app, checked_in):
+    from app.db.models import Absensi
+
+    with app.app_context(), request_session() as s:
+        rec = s.get(Absensi, checked_in["absensi_id"])
+        with pytest.raises(InvalidRequestError):
+            rec.user  # noqa: B018 - tanpa lean(), raiseload global dari DB_STRICT_LOADING
+
+
+def test_explicit_eager_load_still_works(app, checked_in):
+    from sqlalchemy.orm import selectinload
+
+    from app.db.models import Absensi
+
+    with app.app_context(), request_session() as s:
+        rec = (
+            s.query(Absensi)
+            .options(*ABSENSI_TODAY, selectinload(Absensi.istirahat))
+            .filter(Absensi.id_absensi == checked_in["absensi_id"])
+            .one()
+        )
+        assert len(rec.istirahat) == 1